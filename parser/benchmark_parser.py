@@ -0,0 +1,153 @@
+"""Benchmarks of the parser pipeline, run with pytest-benchmark (see requirements-dev.txt):
+
+    pytest benchmark_parser.py --benchmark-json=benchmark.json
+
+Compare against a saved run with --benchmark-compare. Everything runs offline on the HTML snapshot in
+test_data. Its speed table is repeated to get to about the size of the speed table on the wiki. The
+hash of the speed grammar and the versions of the dependencies are recorded in the extra_info of each
+benchmark, so results can be matched to the changes that caused them."""
+import json
+import os
+import runpy
+import sys
+
+import pytest
+
+try:
+    from importlib import metadata
+except ImportError:  # Python < 3.8
+    import importlib_metadata as metadata
+
+pytest.importorskip("pytest_benchmark")
+
+from parsers.country_index import CountryIndex  # noqa: E402
+from parsers.html_tables import read_tables  # noqa: E402
+from parsers.osm_restrictions import parse_speed_definitions  # noqa: E402
+from parsers.osm_restrictions import parse_speeds  # noqa: E402
+from parsers.parse_cache import parser_hash  # noqa: E402
+from parsers.parse_utils import country_codes  # noqa: E402
+from parsers.parse_utils import get_country_code  # noqa: E402
+from parsers.parse_utils import parse_road_types_table  # noqa: E402
+from parsers.parse_utils import parse_speed_table  # noqa: E402
+from parsers.parse_utils import speed_table_rows  # noqa: E402
+
+# the speed table on the wiki has about 1200 rows, the one in the snapshot 27
+SPEED_TABLE_REPETITIONS = 45
+DEPENDENCIES = ["lark-parser", "beautifulsoup4", "pycountry", "requests"]
+
+
+def read_wiki_snapshot_html(repetitions: int = 1) -> str:
+    with open(os.path.join(os.path.dirname(__file__), "test_data", "default_speed_limits.html"), encoding="utf8") as fp:
+        html = fp.read()
+    # repeat the data rows (those after the header) of the first table
+    speed_table_end = html.index("</tbody></table>")
+    rows_start = html.rindex("<tr>", 0, html.index("<td", html.index("<table")))
+    return html[:rows_start] + html[rows_start:speed_table_end] * repetitions + html[speed_table_end:]
+
+
+def dependency_version(name: str):
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+@pytest.fixture
+def benchmark(benchmark):
+    benchmark.extra_info["parserHash"] = parser_hash()
+    benchmark.extra_info["dependencies"] = {name: dependency_version(name) for name in DEPENDENCIES}
+    return benchmark
+
+
+@pytest.fixture(scope="module")
+def html():
+    return read_wiki_snapshot_html(SPEED_TABLE_REPETITIONS)
+
+
+@pytest.fixture(scope="module")
+def speed_table(html):
+    return list(next(read_tables(html)))
+
+
+@pytest.fixture(scope="module")
+def road_types_table(html):
+    tables = read_tables(html)
+    next(tables)
+    return list(next(tables))
+
+
+@pytest.fixture(scope="module")
+def speed_cells():
+    """The distinct strings in the cells of the speed table"""
+    return list(dict.fromkeys(
+        td_speeds
+        for _, _, speeds in speed_table_rows(next(read_tables(read_wiki_snapshot_html())))
+        for _, td_speeds in speeds
+    ))
+
+
+def test_parse_speeds(benchmark, speed_cells):
+    benchmark.extra_info["strings"] = len(speed_cells)
+    benchmark(lambda: [parse_speeds(s) for s in speed_cells])
+
+
+def test_read_tables(benchmark, html):
+    benchmark.extra_info["htmlLength"] = len(html)
+    benchmark(lambda: [list(table) for table in read_tables(html)])
+
+
+def test_parse_speed_table(benchmark, speed_table):
+    benchmark.extra_info["rows"] = len(speed_table)
+    result = benchmark(parse_speed_table, speed_table, parse_speed_definitions)
+    assert result["speedLimitsByCountryCode"]
+
+
+def test_parse_road_types_table(benchmark, road_types_table):
+    benchmark.extra_info["rows"] = len(road_types_table)
+    benchmark(parse_road_types_table, road_types_table)
+
+
+def test_get_country_code(benchmark, speed_table):
+    names = list(dict.fromkeys(country for country, _, _ in speed_table_rows(speed_table))) + list(country_codes)
+    names += ["United States:California", "Canada:Ontario", "Germany", "Atlantis"]
+    benchmark.extra_info["names"] = len(names)
+    benchmark(lambda: [get_country_code(name) for name in names])
+
+
+def test_country_index(benchmark, speed_table):
+    """Resolving the country names from scratch, i.e. including the indexing of the countries"""
+    names = list(dict.fromkeys(country for country, _, _ in speed_table_rows(speed_table)))
+    names += ["United States:California", "Canada:Ontario", "Germany", "Atlantis"]
+    benchmark.extra_info["names"] = len(names)
+
+    def resolve_names():
+        country_index = CountryIndex()
+        return [country_index.get(name) for name in names]
+
+    benchmark(resolve_names)
+
+
+class FakeResponse:
+    def __init__(self, data: dict):
+        self.data = data
+
+    def json(self) -> dict:
+        return self.data
+
+    def raise_for_status(self):
+        pass
+
+
+def test_main(benchmark, html, tmp_path, monkeypatch):
+    """main.py from downloading (stubbed) the wiki page to writing the JSON"""
+    import requests
+
+    response = FakeResponse({"parse": {"text": {"*": html}, "revid": 1}})
+    monkeypatch.setattr(requests.Session, "get", lambda session, url, params, timeout: response)
+    output_file_name = str(tmp_path / "legal_default_speeds.json")
+    monkeypatch.setattr(sys, "argv", ["main.py", output_file_name])
+    main_file_name = os.path.join(os.path.dirname(__file__), "main.py")
+
+    benchmark(runpy.run_path, main_file_name, run_name="__main__")
+    with open(output_file_name, encoding="utf8") as file:
+        assert json.load(file)["speedLimitsByCountryCode"]
@@ -0,0 +1,220 @@
+"""Compares two legal_default_speeds.json, or the results for two revisions of the wiki page, and
+outputs what changed as JSON:
+
+    python diff.py old.json new.json
+    python diff.py --revisions 2391456 2400000 --wiki-cache wiki_cache
+
+The change set lists the changed road classes per country with their changed tags and the changed
+road types with their changed filters, e.g.
+
+    {
+      "affectedCountryCodes": ["DE"],
+      "affectedRoadTypeNames": ["motorway", "rural"],
+      "roadTypesByName": {"rural": {
+        "status": "changed", "filters": {"changed": {"filter": {"old": "...", "new": "..."}}}
+      }},
+      "speedLimitsByCountryCode": {"DE": {"status": "changed", "roadClasses": {"motorway": {
+        "status": "changed", "tags": {"changed": {"maxspeed": {"old": "130", "new": "120"}}}
+      }}}}
+    }
+
+Unnamed road classes have the name "", a further road class with the same name in a country is named
+"<name>#2" etc. A changed road type affects also all road types that refer to it via placeholders, and
+all countries that have road classes of any of these road types. The exit status is 0 if nothing
+changed, 1 otherwise."""
+import argparse
+import json
+import sys
+from collections import defaultdict
+from itertools import chain
+
+from legal_default_speeds.tag_filter import TagFilterExpression
+from legal_default_speeds.tag_filter import TagFilterParseError
+from main import WIKI_PAGE
+from main import generate
+from parsers.osm_restrictions import parse_speed_definitions
+from parsers.parse_cache import ParseCache
+from parsers.wiki_client import WikiClient
+
+ROAD_TYPE_FILTERS = ("filter", "fuzzyFilter", "relationFilter")
+
+
+def diff_values(old: dict, new: dict):
+    """Returns which keys have been added, removed and changed in new compared to old, or None if
+    nothing changed"""
+    result = {}
+    added = {k: v for k, v in new.items() if k not in old}
+    removed = {k: v for k, v in old.items() if k not in new}
+    changed = {k: {"old": v, "new": new[k]} for k, v in old.items() if k in new and new[k] != v}
+    if added:
+        result["added"] = added
+    if removed:
+        result["removed"] = removed
+    if changed:
+        result["changed"] = changed
+    return result or None
+
+
+def status(old, new) -> str:
+    if old is None:
+        return "added"
+    if new is None:
+        return "removed"
+    return "changed"
+
+
+def road_classes_by_name(road_classes: list) -> dict:
+    """Road classes by name, a further road class with the same name is named "<name>#2" etc."""
+    result = {}
+    for road_class in road_classes:
+        name = road_class.get("name") or ""
+        key = name
+        n = 1
+        while key in result:
+            n += 1
+            key = f"{name}#{n}"
+        result[key] = road_class
+    return result
+
+
+def diff_road_classes(old_road_classes: list, new_road_classes: list):
+    """Returns the changes of the road classes of one country, or None if nothing changed"""
+    old_by_name = road_classes_by_name(old_road_classes or [])
+    new_by_name = road_classes_by_name(new_road_classes or [])
+    result = {}
+    changes = {}
+    for name in chain(old_by_name, (name for name in new_by_name if name not in old_by_name)):
+        old, new = old_by_name.get(name), new_by_name.get(name)
+        tags = diff_values(old["tags"] if old else {}, new["tags"] if new else {})
+        if tags or old is None or new is None:
+            changes[name] = {"status": status(old, new), "tags": tags or {}}
+    if changes:
+        result["roadClasses"] = changes
+
+    # the road classes are matched in order, so a change of order changes the result
+    common_names = [name for name in new_by_name if name in old_by_name]
+    if common_names != [name for name in old_by_name if name in new_by_name]:
+        result["orderChanged"] = True
+
+    if not result:
+        return None
+    return {"status": status(old_road_classes, new_road_classes), **result}
+
+
+def diff_road_types(old_road_types: dict, new_road_types: dict) -> dict:
+    result = {}
+    for name in chain(old_road_types, (name for name in new_road_types if name not in old_road_types)):
+        old, new = old_road_types.get(name), new_road_types.get(name)
+        filters = diff_values(
+            {f: old[f] for f in ROAD_TYPE_FILTERS if old and f in old},
+            {f: new[f] for f in ROAD_TYPE_FILTERS if new and f in new}
+        )
+        if filters or old is None or new is None:
+            result[name] = {"status": status(old, new), "filters": filters or {}}
+    return result
+
+
+def placeholders(road_type: dict) -> set:
+    result = set()
+    for f in ROAD_TYPE_FILTERS:
+        if f in road_type:
+            try:
+                result |= TagFilterExpression(road_type[f]).placeholders()
+            except TagFilterParseError:
+                # reported as a warning in the result already
+                pass
+    return result
+
+
+def road_types_referring_to(names: set, *road_types_by_name: dict) -> set:
+    """Returns the given road type names and those of all road types that refer to them via
+    placeholders, also indirectly"""
+    referrers_by_name = defaultdict(set)
+    for road_types in road_types_by_name:
+        for name, road_type in road_types.items():
+            for placeholder in placeholders(road_type):
+                referrers_by_name[placeholder].add(name)
+
+    result = set(names)
+    stack = list(names)
+    while stack:
+        for referrer in referrers_by_name[stack.pop()]:
+            if referrer not in result:
+                result.add(referrer)
+                stack.append(referrer)
+    return result
+
+
+def diff_results(old: dict, new: dict) -> dict:
+    """Returns the change set between two results, i.e. contents of legal_default_speeds.json"""
+    old_speeds, new_speeds = old["speedLimitsByCountryCode"], new["speedLimitsByCountryCode"]
+    speed_limits_changes = {}
+    for country_code in chain(old_speeds, (cc for cc in new_speeds if cc not in old_speeds)):
+        changes = diff_road_classes(old_speeds.get(country_code), new_speeds.get(country_code))
+        if changes:
+            speed_limits_changes[country_code] = changes
+
+    road_types_changes = diff_road_types(old["roadTypesByName"], new["roadTypesByName"])
+    affected_road_type_names = road_types_referring_to(
+        set(road_types_changes), old["roadTypesByName"], new["roadTypesByName"]
+    )
+
+    affected_country_codes = set(speed_limits_changes)
+    for speeds in (old_speeds, new_speeds):
+        for country_code, road_classes in speeds.items():
+            if any(road_class.get("name") in affected_road_type_names for road_class in road_classes):
+                affected_country_codes.add(country_code)
+    for country_code, changes in speed_limits_changes.items():
+        # the keys are the names in road_classes_by_name, e.g. "motorway#2"
+        road_classes = {
+            **road_classes_by_name(old_speeds.get(country_code) or []),
+            **road_classes_by_name(new_speeds.get(country_code) or []),
+        }
+        affected_road_type_names.update(
+            road_classes[key]["name"] for key in changes.get("roadClasses", {}) if "name" in road_classes[key]
+        )
+
+    return {
+        "old": {"revisionId": old.get("meta", {}).get("revisionId")},
+        "new": {"revisionId": new.get("meta", {}).get("revisionId")},
+        "affectedCountryCodes": sorted(affected_country_codes),
+        "affectedRoadTypeNames": sorted(affected_road_type_names),
+        "speedLimitsByCountryCode": speed_limits_changes,
+        "roadTypesByName": road_types_changes,
+    }
+
+
+def read_result(file_name: str) -> dict:
+    with open(file_name, "r", encoding="utf8") as file:
+        return json.load(file)
+
+
+def generate_revision(wiki_client: WikiClient, revision_id: str) -> dict:
+    return generate(wiki_client.fetch_parsed_page(revision_id), ParseCache(parse_speed_definitions))
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Compare two legal_default_speeds.json")
+    arg_parser.add_argument("old", help="the old JSON, or the old revision id with --revisions")
+    arg_parser.add_argument("new", help="the new JSON, or the new revision id with --revisions")
+    arg_parser.add_argument("--revisions", action="store_true",
+                            help="compare the results for these two revisions of the wiki page")
+    arg_parser.add_argument("--wiki-cache", metavar="DIR", help="see main.py")
+    arg_parser.add_argument("-o", "--output", metavar="FILE", help="write the change set to this file instead")
+    args = arg_parser.parse_args()
+
+    if args.revisions:
+        wiki_client = WikiClient(WIKI_PAGE, args.wiki_cache)
+        old_result, new_result = generate_revision(wiki_client, args.old), generate_revision(wiki_client, args.new)
+    else:
+        old_result, new_result = read_result(args.old), read_result(args.new)
+
+    change_set = diff_results(old_result, new_result)
+    output = json.dumps(change_set, sort_keys=True, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf8") as file:
+            file.write(output)
+    else:
+        print(output)
+
+    sys.exit(1 if change_set["speedLimitsByCountryCode"] or change_set["roadTypesByName"] else 0)
@@ -0,0 +1,12 @@
+from legal_default_speeds.binary_format import BinaryReader
+from legal_default_speeds.binary_format import load_binary
+from legal_default_speeds.binary_format import write_binary
+from legal_default_speeds.speed_limits import Certitude
+from legal_default_speeds.speed_limits import LegalDefaultSpeeds
+from legal_default_speeds.speed_limits import Result
+from legal_default_speeds.speed_limits import load
+from legal_default_speeds.speed_limits import save_index
+
+__all__ = [
+    "BinaryReader", "load_binary", "write_binary", "Certitude", "LegalDefaultSpeeds", "Result", "load", "save_index"
+]
@@ -0,0 +1,220 @@
+"""Compact binary format for the data in legal_default_speeds.json.
+
+All strings (country codes, road type names, filters, tag keys and values) are stored once in a
+string table and referred to by their index everywhere else. The file can be memory-mapped and the
+road classes of one country looked up without decoding anything else.
+
+Layout, all integers are unsigned 32 bit little endian unless noted otherwise:
+
+    header          magic "LDSB", version (16 bit), 0 (16 bit), then the number of strings, countries
+                    and road types and the offsets of the sections below
+    string offsets  number of strings + 1 offsets into the string data, the last one being its end
+    string data     the strings, UTF-8 encoded
+    countries       per country, sorted by country code: country code, offset of its first road class
+                    into the road classes section and number of road classes
+    road classes    per road class: name (or NONE), number of tags, then key and value of each tag
+    road types      per road type: name, filter, fuzzy filter and relation filter (or NONE)
+    extra           everything else in the JSON (meta, warnings, ...) as UTF-8 encoded JSON
+"""
+import json
+import mmap
+import struct
+
+from legal_default_speeds.speed_limits import LegalDefaultSpeeds
+
+MAGIC = b"LDSB"
+VERSION = 1
+NONE = 0xFFFFFFFF
+
+HEADER = struct.Struct("<4sHH3I6I")
+U32 = struct.Struct("<I")
+COUNTRY = struct.Struct("<3I")
+ROAD_CLASS = struct.Struct("<2I")
+ROAD_TYPE = struct.Struct("<4I")
+
+ROAD_TYPE_FILTERS = ("filter", "fuzzyFilter", "relationFilter")
+
+
+class StringTable:
+    def __init__(self):
+        self.index_by_string = {}
+
+    def add(self, s) -> int:
+        if s is None:
+            return NONE
+        index = self.index_by_string.get(s)
+        if index is None:
+            index = len(self.index_by_string)
+            self.index_by_string[s] = index
+        return index
+
+
+def write_binary(result: dict, file_name: str):
+    """Writes the given result, i.e. the content of legal_default_speeds.json, in the binary format"""
+    strings = StringTable()
+
+    countries = bytearray()
+    road_classes = bytearray()
+    for country_code in sorted(result["speedLimitsByCountryCode"]):
+        country_road_classes = result["speedLimitsByCountryCode"][country_code]
+        countries += COUNTRY.pack(strings.add(country_code), len(road_classes), len(country_road_classes))
+        for road_class in country_road_classes:
+            tags = road_class.get("tags", {})
+            road_classes += ROAD_CLASS.pack(strings.add(road_class.get("name")), len(tags))
+            for key, value in tags.items():
+                road_classes += ROAD_CLASS.pack(strings.add(key), strings.add(value))
+
+    road_types = bytearray()
+    for name, filters in result["roadTypesByName"].items():
+        road_types += ROAD_TYPE.pack(strings.add(name), *(strings.add(filters.get(f)) for f in ROAD_TYPE_FILTERS))
+
+    extra = json.dumps(
+        {k: v for k, v in result.items() if k not in ("speedLimitsByCountryCode", "roadTypesByName")},
+        sort_keys=True, separators=(",", ":")
+    ).encode("utf8")
+
+    string_data = bytearray()
+    string_offsets = bytearray()
+    for s in strings.index_by_string:
+        string_offsets += U32.pack(len(string_data))
+        string_data += s.encode("utf8")
+    string_offsets += U32.pack(len(string_data))
+
+    sections = [string_offsets, string_data, countries, road_classes, road_types, extra]
+    offsets = []
+    offset = HEADER.size
+    for section in sections:
+        offsets.append(offset)
+        offset += len(section)
+
+    with open(file_name, "wb") as file:
+        file.write(HEADER.pack(
+            MAGIC, VERSION, 0,
+            len(strings.index_by_string), len(result["speedLimitsByCountryCode"]), len(result["roadTypesByName"]),
+            *offsets
+        ))
+        for section in sections:
+            file.write(section)
+
+
+class BinaryReader:
+    """Reads a file written with write_binary. The file is memory-mapped and only what is asked for is
+    decoded. Each string is decoded only once, so equal keys and values are the same str object"""
+
+    def __init__(self, file_name: str):
+        with open(file_name, "rb") as file:
+            self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        (
+            magic, version, _,
+            self.string_count, self.country_count, self.road_type_count,
+            self.string_offsets_offset, self.string_data_offset, self.countries_offset,
+            self.road_classes_offset, self.road_types_offset, self.extra_offset,
+        ) = HEADER.unpack_from(self.buffer)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{file_name} is not a legal default speeds binary file of version {VERSION}")
+        self.strings = [None] * self.string_count
+
+    def close(self):
+        self.buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def string(self, index: int):
+        if index == NONE:
+            return None
+        s = self.strings[index]
+        if s is None:
+            start, end = struct.unpack_from("<2I", self.buffer, self.string_offsets_offset + index * U32.size)
+            s = str(self.buffer[self.string_data_offset + start:self.string_data_offset + end], "utf8")
+            self.strings[index] = s
+        return s
+
+    def country_entry(self, i: int) -> tuple:
+        return COUNTRY.unpack_from(self.buffer, self.countries_offset + i * COUNTRY.size)
+
+    def country_codes(self) -> list:
+        return [self.string(self.country_entry(i)[0]) for i in range(self.country_count)]
+
+    def road_classes(self, country_code: str):
+        """Returns the road classes of the given country as in speedLimitsByCountryCode or None if
+        there are none for this country. Only the country codes are decoded to find it (binary search)"""
+        low, high = 0, self.country_count
+        while low < high:
+            middle = (low + high) // 2
+            code_index, offset, count = self.country_entry(middle)
+            code = self.string(code_index)
+            if code < country_code:
+                low = middle + 1
+            elif code > country_code:
+                high = middle
+            else:
+                # the road classes of the next country follow right after those of this one
+                if middle + 1 < self.country_count:
+                    end = self.road_classes_offset + self.country_entry(middle + 1)[1]
+                else:
+                    end = self.road_types_offset
+                values = self.u32s(self.road_classes_offset + offset, end)
+                return self.decode_road_classes(values, 0, count)[0]
+        return None
+
+    def u32s(self, offset: int, end: int) -> tuple:
+        return struct.unpack_from(f"<{(end - offset) // U32.size}I", self.buffer, offset)
+
+    def decode_road_classes(self, values: tuple, i: int, count: int) -> tuple:
+        """Decodes count road classes from the given road classes section values, starting at i.
+        Returns them and the index after the last one"""
+        string = self.string
+        result = []
+        for _ in range(count):
+            name_index, tag_count = values[i], values[i + 1]
+            i += 2
+            tags = {}
+            for _ in range(tag_count):
+                tags[string(values[i])] = string(values[i + 1])
+                i += 2
+            road_class = {"tags": tags}
+            if name_index != NONE:
+                road_class["name"] = string(name_index)
+            result.append(road_class)
+        return result, i
+
+    def speed_limits_by_country_code(self) -> dict:
+        result = {}
+        # road classes of all countries are stored one after another in the order of the countries
+        values = self.u32s(self.road_classes_offset, self.road_types_offset)
+        i = 0
+        for code_index, _, count in COUNTRY.iter_unpack(self.buffer[self.countries_offset:self.road_classes_offset]):
+            result[self.string(code_index)], i = self.decode_road_classes(values, i, count)
+        return result
+
+    def road_types_by_name(self) -> dict:
+        result = {}
+        for i in range(self.road_type_count):
+            offset = self.road_types_offset + i * ROAD_TYPE.size
+            name_index, *filter_indices = ROAD_TYPE.unpack_from(self.buffer, offset)
+            result[self.string(name_index)] = {
+                f: self.string(index) for f, index in zip(ROAD_TYPE_FILTERS, filter_indices) if index != NONE
+            }
+        return result
+
+    def extra(self) -> dict:
+        """Returns everything else of the JSON, i.e. meta and warnings"""
+        return json.loads(str(self.buffer[self.extra_offset:], "utf8"))
+
+    def read_all(self) -> dict:
+        """Returns the same as json.load on legal_default_speeds.json"""
+        result = self.extra()
+        result["roadTypesByName"] = self.road_types_by_name()
+        result["speedLimitsByCountryCode"] = self.speed_limits_by_country_code()
+        return result
+
+
+def load_binary(file_name: str, index: dict = None) -> LegalDefaultSpeeds:
+    """Creates a LegalDefaultSpeeds from a file written with write_binary"""
+    with BinaryReader(file_name) as reader:
+        return LegalDefaultSpeeds(reader.road_types_by_name(), reader.speed_limits_by_country_code(), index)
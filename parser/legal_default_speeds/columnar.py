@@ -0,0 +1,227 @@
+"""Matching of many roads at once, given as columns of their tag values, e.g. read from Parquet or
+Arrow files, with NumPy.
+
+Each column is factorized once into its distinct values and a code per road. A tag filter is then
+evaluated on the distinct values only and the result is mapped back to all roads, which turns each
+filter into a boolean mask over all roads. The mask of each road type is computed only once for all
+countries, placeholders use the mask of the road type they name.
+
+NumPy is an optional dependency, needed only for this module."""
+import numpy as np
+
+from legal_default_speeds.number_with_unit import with_optional_unit_to_float_or_none
+from legal_default_speeds.speed_limits import Certitude
+from legal_default_speeds.tag_filter import (
+    AllOf, AnyOf, CompareTagValue, HasKey, HasKeyLike, HasTag, HasTagLike, HasTagValueLike, Leaf, Not, NotHasKey,
+    NotHasKeyLike, NotHasTag, NotHasTagValueLike, NotPlaceholder, Placeholder,
+)
+
+# the certitude codes returned by match_columns. 0: no road type matched
+CERTITUDES = (None, Certitude.EXACT, Certitude.FROM_MAX_SPEED, Certitude.FUZZY, Certitude.FALLBACK)
+NO_MATCH = 0
+EXACT = 1
+FROM_MAX_SPEED = 2
+FUZZY = 3
+FALLBACK = 4
+
+
+class Column:
+    """The values of one tag (or the country codes) of all roads. None is a missing tag"""
+
+    __slots__ = ("values", "codes", "present")
+
+    def __init__(self, column):
+        if hasattr(column, "dictionary") and hasattr(column, "indices"):
+            # a pyarrow.DictionaryArray, e.g. as read from Parquet, is already factorized
+            self.values = column.dictionary.to_pylist() + [None]
+            self.codes = column.indices.fill_null(len(self.values) - 1).to_numpy()
+        else:
+            if hasattr(column, "to_pylist"):
+                column = column.to_pylist()
+            # the distinct values, and for each road the position of its value in them
+            position_by_value = {}
+            self.codes = np.fromiter(
+                (position_by_value.setdefault(value, len(position_by_value)) for value in column),
+                dtype=np.int32, count=len(column)
+            )
+            self.values = list(position_by_value)
+        self.present = self.codes != (self.values.index(None) if None in self.values else -1)
+
+    def where(self, predicate) -> np.ndarray:
+        """Returns for each road whether the tag is present and predicate(value) is true"""
+        matches = np.fromiter(
+            (value is not None and predicate(value) for value in self.values), dtype=bool, count=len(self.values)
+        )
+        return matches[self.codes]
+
+    def lookup(self, mapping: dict, default: int, rows: np.ndarray) -> np.ndarray:
+        """Returns for each of the given rows mapping[value], or default if the value is not in mapping"""
+        looked_up = np.array([mapping.get(value, default) for value in self.values], dtype=np.int32)
+        return looked_up[self.codes[rows]]
+
+
+class ColumnarMatcher:
+    """Evaluates the road type filters of a LegalDefaultSpeeds on all roads at once. columns is
+    a dict of tag key to the values of that tag of all roads (None if a road does not have it). Only
+    tags with a column are known, i.e. a tag without a column is treated as missing on all roads"""
+
+    def __init__(self, columns: dict):
+        self.columns = {key: Column(values) for key, values in columns.items()}
+        self.size = len(next(iter(self.columns.values())).codes) if self.columns else 0
+        # (id(RoadTypeFilters), fuzzy) -> mask
+        self.masks_by_road_type = {}
+
+    def none(self) -> np.ndarray:
+        return np.zeros(self.size, dtype=bool)
+
+    def key_present(self, key: str) -> np.ndarray:
+        column = self.columns.get(key)
+        return column.present if column is not None else self.none()
+
+    def value_matches(self, key: str, predicate) -> np.ndarray:
+        column = self.columns.get(key)
+        return column.where(predicate) if column is not None else self.none()
+
+    def any_key_like(self, regex, predicate=None) -> np.ndarray:
+        mask = self.none()
+        for key, column in self.columns.items():
+            if regex.matches(key):
+                mask |= column.present if predicate is None else column.where(predicate)
+        return mask
+
+    def leaf_mask(self, tag_filter) -> np.ndarray:
+        if isinstance(tag_filter, HasKey):
+            return self.key_present(tag_filter.key)
+        if isinstance(tag_filter, NotHasKey):
+            return ~self.key_present(tag_filter.key)
+        if isinstance(tag_filter, HasTag):
+            return self.value_matches(tag_filter.key, lambda v: v == tag_filter.value)
+        if isinstance(tag_filter, NotHasTag):
+            return ~self.value_matches(tag_filter.key, lambda v: v == tag_filter.value)
+        if isinstance(tag_filter, HasKeyLike):
+            return self.any_key_like(tag_filter.regex)
+        if isinstance(tag_filter, NotHasKeyLike):
+            return ~self.any_key_like(tag_filter.regex)
+        if isinstance(tag_filter, HasTagValueLike):
+            return self.value_matches(tag_filter.key, tag_filter.regex.matches)
+        if isinstance(tag_filter, NotHasTagValueLike):
+            return ~self.value_matches(tag_filter.key, tag_filter.regex.matches)
+        if isinstance(tag_filter, HasTagLike):
+            return self.any_key_like(tag_filter.key_regex, tag_filter.value_regex.matches)
+        if isinstance(tag_filter, CompareTagValue):
+            def compare(value: str) -> bool:
+                number = with_optional_unit_to_float_or_none(value)
+                return number is not None and tag_filter.compare_to(number)
+            return self.value_matches(tag_filter.key, compare)
+        raise TypeError(f"Unknown tag filter {type(tag_filter).__name__}")
+
+    def node_mask(self, node, fuzzy: bool) -> np.ndarray:
+        if isinstance(node, NotPlaceholder):
+            return ~self.road_type_mask(node.value, fuzzy)
+        if isinstance(node, Placeholder):
+            return self.road_type_mask(node.value, fuzzy)
+        if isinstance(node, Leaf):
+            return self.leaf_mask(node.value)
+        if isinstance(node, AllOf):
+            mask = ~self.none()
+            for child in node.nodes:
+                mask &= self.node_mask(child, fuzzy)
+            return mask
+        if isinstance(node, AnyOf):
+            mask = self.none()
+            for child in node.nodes:
+                mask |= self.node_mask(child, fuzzy)
+            return mask
+        if isinstance(node, Not):
+            return ~self.node_mask(node.nodes[0], fuzzy)
+        raise TypeError(f"Unknown node {type(node).__name__}")
+
+    def road_type_mask(self, filters, fuzzy: bool) -> np.ndarray:
+        """Returns for each road whether the given road type matches, like filters_match in
+        find_road_type_by_tags for a road without relations. The result must not be modified"""
+        key = (id(filters), fuzzy)
+        if key not in self.masks_by_road_type:
+            mask = self.none()
+            if filters.filter is not None:
+                mask |= self.node_mask(filters.filter.expression, fuzzy)
+            if fuzzy and filters.fuzzy_filter is not None:
+                mask |= self.node_mask(filters.fuzzy_filter.expression, fuzzy)
+            self.masks_by_road_type[key] = mask
+        return self.masks_by_road_type[key]
+
+    def match_country(self, country_road_types, rows: np.ndarray, road_class_indices: np.ndarray,
+                      certitudes: np.ndarray):
+        """Sets the matched road class and certitude of the given rows, like find_speed_limits"""
+        position_by_id = {id(road_type): i for i, road_type in enumerate(country_road_types.road_types)}
+        unmatched = np.ones(len(rows), dtype=bool)
+
+        def assign(mask: np.ndarray, position: int, certitude: int):
+            matched = mask & unmatched
+            road_class_indices[rows[matched]] = position
+            certitudes[rows[matched]] = certitude
+            unmatched[matched] = False
+
+        # 1. the first road type in the search order whose filter matches
+        for road_type, filters in country_road_types.search_order:
+            if not unmatched.any():
+                return
+            assign(self.road_type_mask(filters, False)[rows], position_by_id[id(road_type)], EXACT)
+
+        # 2. reverse-search by maxspeed
+        maxspeed = self.columns.get("maxspeed")
+        if maxspeed is not None and country_road_types.by_maxspeed:
+            positions = maxspeed.lookup(
+                {value: position_by_id[id(road_type)] for value, road_type in country_road_types.by_maxspeed.items()},
+                -1, rows
+            )
+            matched = (positions >= 0) & unmatched
+            road_class_indices[rows[matched]] = positions[matched]
+            certitudes[rows[matched]] = FROM_MAX_SPEED
+            unmatched[matched] = False
+
+        # 3. fuzzy
+        for road_type, filters in country_road_types.search_order:
+            if not unmatched.any():
+                return
+            assign(self.road_type_mask(filters, True)[rows], position_by_id[id(road_type)], FUZZY)
+
+        # 4. the default rule
+        if country_road_types.fallback is not None:
+            assign(unmatched.copy(), position_by_id[id(country_road_types.fallback)], FALLBACK)
+
+
+def match_columns(speeds, country_codes, columns: dict) -> tuple:
+    """Matches the road types of many roads at once, like LegalDefaultSpeeds.get_speed_limits for
+    each road without relations and without replacer.
+
+    country_codes are the country codes of the roads and columns is a dict of tag key to the values of
+    that tag of the roads, both as NumPy arrays, Arrow arrays, lists etc. of str or None. Only tags with
+    a column are known to the filters, so there should be one for each key in the filters that is
+    relevant for the roads in question, see LegalDefaultSpeeds.is_relevant_tag_key.
+
+    Returns two NumPy arrays, with one element per road:
+    - the position of the matched road class in speedLimitsByCountryCode of the country (or of the
+      country without subdivision, if there are no road classes for the subdivision), -1 if none
+    - the certitude as position in CERTITUDES, i.e. NO_MATCH, EXACT, FROM_MAX_SPEED, FUZZY or FALLBACK
+
+    For large extracts, call it for batches of e.g. a million roads, as one mask of the size of the
+    batch is kept for each road type."""
+    country_codes = Column(country_codes)
+    matcher = ColumnarMatcher(columns)
+    if matcher.size == 0:
+        matcher.size = len(country_codes.codes)
+    elif matcher.size != len(country_codes.codes):
+        raise ValueError("All columns must have the same length as country_codes")
+
+    road_class_indices = np.full(matcher.size, -1, dtype=np.int32)
+    certitudes = np.zeros(matcher.size, dtype=np.int8)
+    rows_by_country = np.argsort(country_codes.codes, kind="stable")
+    bounds = np.searchsorted(country_codes.codes[rows_by_country], np.arange(len(country_codes.values) + 1))
+    for code, country_code in enumerate(country_codes.values):
+        if country_code is None:
+            continue
+        rows = rows_by_country[bounds[code]:bounds[code + 1]]
+        country_road_types = speeds.get_country_road_types(country_code)
+        if country_road_types is not None and len(rows):
+            matcher.match_country(country_road_types, rows, road_class_indices, certitudes)
+    return road_class_indices, certitudes
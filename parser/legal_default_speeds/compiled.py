@@ -0,0 +1,205 @@
+"""Compiled form of legal_default_speeds.json, written by main.py --compiled.
+
+Consumers of the JSON parse each filter string, resolve the placeholders and build the decision
+index each time they load it. The compiled file contains all that already, so loading it only
+creates the objects. It is a compact JSON:
+
+    version                   COMPILED_VERSION, files of other versions are rejected
+    revisionId                the revision of the wiki page it was generated from
+    dataHash                  the hash of roadTypesByName and speedLimitsByCountryCode of the JSON
+    roadTypes                 per road type [name, filter, fuzzy filter, relation filter], followed by
+                              [name] for each road type that is referred to by a placeholder but not
+                              defined
+    speedLimitsByCountryCode  as in the JSON, each road class optionally with the parsed speeds per
+                              vehicle type, see parsers.speed_model
+    index                     the decision index, see decision_index.py
+
+A filter is a tree of lists. ["and", ...], ["or", ...] and ["not", node] are the boolean operators,
+["{}", position] and ["!{}", position] the placeholders, with the position of the road type in
+roadTypes, and anything else a tag filter, e.g. ["=", "highway", "residential"] or [">", "width", 3.5].
+"""
+import json
+
+from legal_default_speeds.speed_limits import LegalDefaultSpeeds, RoadTypeFilters, parse_filter
+from legal_default_speeds.tag_filter import (
+    AllOf, AnyOf, HasKey, HasKeyLike, HasTag, HasTagGreaterOrEqualThan, HasTagGreaterThan, HasTagLessOrEqualThan,
+    HasTagLessThan, HasTagLike, HasTagValueLike, Leaf, Not, NotHasKey, NotHasKeyLike, NotHasTag, NotHasTagValueLike,
+    NotPlaceholder, Placeholder, TagFilterExpression,
+)
+
+COMPILED_VERSION = 1
+
+ROAD_TYPE_FILTERS = ("filter", "fuzzyFilter", "relationFilter")
+
+TAG_FILTER_TYPES = {
+    "has": HasKey,
+    "!has": NotHasKey,
+    "=": HasTag,
+    "!=": NotHasTag,
+    "~has": HasKeyLike,
+    "!~has": NotHasKeyLike,
+    "~": HasTagValueLike,
+    "!~": NotHasTagValueLike,
+    "~=~": HasTagLike,
+    "<": HasTagLessThan,
+    ">": HasTagGreaterThan,
+    "<=": HasTagLessOrEqualThan,
+    ">=": HasTagGreaterOrEqualThan,
+}
+TAG_FILTER_OPERATORS = {tag_filter_type: operator for operator, tag_filter_type in TAG_FILTER_TYPES.items()}
+CHAIN_TYPES = {"and": AllOf, "or": AnyOf, "not": Not}
+CHAIN_OPERATORS = {chain_type: operator for operator, chain_type in CHAIN_TYPES.items()}
+
+
+def compile_road_types(road_types_by_name: dict, errors: list = None) -> list:
+    """Returns the roadTypes of the compiled form for the given roadTypesByName. Raises a ValueError if
+    a filter cannot be parsed. If a list of errors is given instead, such a filter is left out and
+    (road type name, filter name, TagFilterParseError) appended to it"""
+    road_types = [[name] for name in road_types_by_name]
+    position_by_name = {name: i for i, name in enumerate(road_types_by_name)}
+
+    def position(name: str) -> int:
+        if name not in position_by_name:
+            position_by_name[name] = len(road_types)
+            road_types.append([name])
+        return position_by_name[name]
+
+    def compile_node(node) -> list:
+        if isinstance(node, Placeholder):
+            return ["!{}" if isinstance(node, NotPlaceholder) else "{}", position(node.value)]
+        if isinstance(node, Leaf):
+            tag_filter = node.value
+            if hasattr(tag_filter, "value"):
+                return [TAG_FILTER_OPERATORS[type(tag_filter)], tag_filter.key, tag_filter.value]
+            return [TAG_FILTER_OPERATORS[type(tag_filter)], tag_filter.key]
+        return [CHAIN_OPERATORS[type(node)]] + [compile_node(child) for child in node.nodes]
+
+    for i, (name, filters) in enumerate(road_types_by_name.items()):
+        for filter_name in ROAD_TYPE_FILTERS:
+            try:
+                expression = parse_filter(name, filter_name, filters.get(filter_name))
+            except ValueError as e:
+                if errors is None:
+                    raise
+                errors.append((name, filter_name, e.__cause__))
+                expression = None
+            road_types[i].append(compile_node(expression.expression) if expression is not None else None)
+    return road_types
+
+
+def placeholder_graph(road_types: list) -> dict:
+    """Returns the names of the road types each defined road type in the given compiled roadTypes
+    refers to with placeholders, in the order they first appear in its filters"""
+    def visit(node: list, names: dict):
+        if node[0] in ("{}", "!{}"):
+            names[road_types[node[1]][0]] = None
+        elif node[0] in CHAIN_TYPES:
+            for child in node[1:]:
+                visit(child, names)
+
+    result = {}
+    for name, *filters in road_types:
+        if not filters:
+            continue
+        names = {}
+        for node in filters:
+            if node is not None:
+                visit(node, names)
+        result[name] = list(names)
+    return result
+
+
+def reachable_road_types(graph: dict, names) -> set:
+    """Returns the given road type names and all road types they refer to, directly or indirectly"""
+    result = set()
+    to_visit = list(names)
+    while to_visit:
+        name = to_visit.pop()
+        if name not in result:
+            result.add(name)
+            to_visit.extend(graph.get(name, ()))
+    return result
+
+
+def with_speeds(road_classes: list, structured_road_classes: list) -> list:
+    if [r.get("name") for r in road_classes] != [r.get("name") for r in structured_road_classes]:
+        raise ValueError("The parsed speeds do not belong to the road classes")
+    return [
+        dict(road_class, speedsByVehicleType=structured_road_class["speedsByVehicleType"])
+        for road_class, structured_road_class in zip(road_classes, structured_road_classes)
+    ]
+
+
+def compile_rules(result: dict, speeds_by_country_code: dict = None) -> dict:
+    """Returns the compiled form of the given result, i.e. the content of legal_default_speeds.json.
+    speeds_by_country_code are the parsed speeds of the road classes as put into the dict of the same
+    name by parsers.parse_utils.parse_speed_table, if they should be included.
+
+    Raises a ValueError if a filter cannot be parsed or placeholders are circular"""
+    speed_limits_by_country_code = result["speedLimitsByCountryCode"]
+    # checks the filters and builds the decision index
+    speeds = LegalDefaultSpeeds(result["roadTypesByName"], speed_limits_by_country_code)
+    if speeds_by_country_code is not None:
+        speed_limits_by_country_code = {
+            country_code: with_speeds(road_classes, speeds_by_country_code.get(country_code, []))
+            for country_code, road_classes in speed_limits_by_country_code.items()
+        }
+    return {
+        "version": COMPILED_VERSION,
+        "revisionId": result.get("meta", {}).get("revisionId"),
+        "dataHash": speeds.data_hash,
+        "roadTypes": compile_road_types(result["roadTypesByName"]),
+        "speedLimitsByCountryCode": speed_limits_by_country_code,
+        "index": speeds.get_index(),
+    }
+
+
+def write_compiled(result: dict, file_name: str, speeds_by_country_code: dict = None):
+    with open(file_name, "w", encoding="utf8") as file:
+        file.write(json.dumps(compile_rules(result, speeds_by_country_code), separators=(",", ":")))
+
+
+def decode_road_type_filters(road_types: list) -> dict:
+    """Returns the RoadTypeFilters by name of the given compiled roadTypes, with the placeholders
+    resolved"""
+    all_filters = [RoadTypeFilters(road_type[0]) for road_type in road_types]
+
+    def decode_node(node: list):
+        operator = node[0]
+        if operator == "{}":
+            return Placeholder(all_filters[node[1]])
+        if operator == "!{}":
+            return NotPlaceholder(all_filters[node[1]])
+        chain_type = CHAIN_TYPES.get(operator)
+        if chain_type is None:
+            return Leaf(TAG_FILTER_TYPES[operator](*node[1:]))
+        chain = chain_type()
+        for child in node[1:]:
+            chain.add_child(decode_node(child))
+        return chain
+
+    result = {}
+    for filters, road_type in zip(all_filters, road_types):
+        if len(road_type) == 1:
+            # not defined, never matches
+            continue
+        filters.filter, filters.fuzzy_filter, filters.relation_filter = (
+            TagFilterExpression.from_expression(decode_node(node)) if node is not None else None
+            for node in road_type[1:]
+        )
+        result[filters.name] = filters
+    return result
+
+
+def load_compiled(file_name: str, revision_id: str = None) -> LegalDefaultSpeeds:
+    """Creates a LegalDefaultSpeeds from a file written with write_compiled. If a revision id is given,
+    raises a ValueError if the file was generated from another revision of the wiki page"""
+    with open(file_name, "r", encoding="utf8") as file:
+        data = json.load(file)
+    if not isinstance(data, dict) or data.get("version") != COMPILED_VERSION:
+        raise ValueError(f"{file_name} is not a compiled legal default speeds file of version {COMPILED_VERSION}")
+    if revision_id is not None and data["revisionId"] != str(revision_id):
+        raise ValueError(f"{file_name} is outdated: it is of revision {data['revisionId']}, not {revision_id}")
+    return LegalDefaultSpeeds.from_resolved(
+        decode_road_type_filters(data["roadTypes"]), data["speedLimitsByCountryCode"], data["dataHash"], data["index"]
+    )
@@ -0,0 +1,189 @@
+"""Index over the road types of each country that tells which of them can match a road at all.
+
+For each road type, necessary conditions are derived from its filters: which values the highway
+tag must have and which keys (of which at least one) the tags must contain. A road type whose
+conditions are not met is skipped without evaluating its filters. The conditions are derived once,
+for each combination of exact or fuzzy matching and of roads with or without relations, and can be
+saved as JSON next to legal_default_speeds.json."""
+import hashlib
+import json
+import re
+
+from legal_default_speeds.tag_filter import (
+    AllOf, AnyOf, CompareTagValue, HasKey, HasKeyLike, HasTag, HasTagLike, HasTagValueLike, Leaf, NotPlaceholder,
+    Placeholder, RealRegex, SetRegex,
+)
+
+INDEX_VERSION = 1
+
+# (name, fuzzy, with relations)
+MODES = (
+    ("exact", False, False),
+    ("exact+relations", False, True),
+    ("fuzzy", True, False),
+    ("fuzzy+relations", True, True),
+)
+
+# A condition is either None, i.e. no condition is known, or a frozenset of which one must be contained
+# in the tags (for required keys) or be the highway value. An empty frozenset thus never matches.
+
+
+def data_hash(road_types_by_name: dict, speed_limits_by_country_code: dict) -> str:
+    data = json.dumps([road_types_by_name, speed_limits_by_country_code], sort_keys=True)
+    return hashlib.sha256(data.encode("utf8")).hexdigest()
+
+
+def all_of(conditions: list, is_set_condition: bool):
+    known = [c for c in conditions if c is not None]
+    if not known:
+        return None
+    if is_set_condition:
+        return frozenset.intersection(*known)
+    # only one of several required key sets can be checked, so take the most selective one
+    return min(known, key=len)
+
+
+def any_of(conditions: list):
+    if any(c is None for c in conditions):
+        return None
+    return frozenset().union(*conditions)
+
+
+def leaf_required_keys(tag_filter):
+    if isinstance(tag_filter, (HasKey, HasTag, HasTagValueLike, CompareTagValue)):
+        return frozenset((tag_filter.key,))
+    if isinstance(tag_filter, (HasKeyLike, HasTagLike)) and isinstance(tag_filter.relevant_key, SetRegex):
+        return tag_filter.relevant_key.set
+    return None
+
+
+def leaf_highway_values(tag_filter):
+    if isinstance(tag_filter, HasTag) and tag_filter.key == "highway":
+        return frozenset((tag_filter.value,))
+    if isinstance(tag_filter, HasTagValueLike) and tag_filter.key == "highway" \
+            and isinstance(tag_filter.regex, SetRegex):
+        return tag_filter.regex.set
+    return None
+
+
+class ConditionAnalyzer:
+    """Derives the conditions for one mode. leaf_condition is either leaf_required_keys or
+    leaf_highway_values. Placeholders must already be resolved to RoadTypeFilters"""
+
+    def __init__(self, leaf_condition, fuzzy: bool, with_relations: bool):
+        self.leaf_condition = leaf_condition
+        self.is_set_condition = leaf_condition is leaf_highway_values
+        self.fuzzy = fuzzy
+        self.with_relations = with_relations
+        self.conditions_by_road_type = {}
+
+    def road_type_condition(self, filters):
+        key = id(filters)
+        if key not in self.conditions_by_road_type:
+            conditions = []
+            if filters.relation_filter is not None and self.with_relations:
+                # the relation filter is matched against the tags of the relations, not those of the road
+                conditions.append(None)
+            if filters.filter is not None:
+                conditions.append(self.node_condition(filters.filter.expression))
+            if self.fuzzy and filters.fuzzy_filter is not None:
+                conditions.append(self.node_condition(filters.fuzzy_filter.expression))
+            self.conditions_by_road_type[key] = any_of(conditions)
+        return self.conditions_by_road_type[key]
+
+    def node_condition(self, node):
+        if isinstance(node, NotPlaceholder):
+            return None
+        if isinstance(node, Placeholder):
+            return self.road_type_condition(node.value)
+        if isinstance(node, Leaf):
+            return self.leaf_condition(node.value)
+        if isinstance(node, AllOf):
+            return all_of([self.node_condition(child) for child in node.nodes], self.is_set_condition)
+        if isinstance(node, AnyOf):
+            return any_of([self.node_condition(child) for child in node.nodes])
+        return None
+
+
+def build_country_index(country_road_types) -> dict:
+    """Returns the index for the road types of one country as a JSON serializable dict. The road
+    types are referred to by their position in country_road_types.search_order"""
+    modes = {}
+    for mode, fuzzy, with_relations in MODES:
+        highway_analyzer = ConditionAnalyzer(leaf_highway_values, fuzzy, with_relations)
+        keys_analyzer = ConditionAnalyzer(leaf_required_keys, fuzzy, with_relations)
+        highway_values = [highway_analyzer.road_type_condition(f) for _, f in country_road_types.search_order]
+        required_keys = [keys_analyzer.road_type_condition(f) for _, f in country_road_types.search_order]
+
+        candidates = [i for i, keys in enumerate(required_keys) if keys is None or keys]
+        all_highway_values = sorted(set().union(*(v for v in highway_values if v is not None)))
+        modes[mode] = {
+            "byHighway": {
+                value: [i for i in candidates if highway_values[i] is None or value in highway_values[i]]
+                for value in all_highway_values
+            },
+            "otherHighway": [i for i in candidates if highway_values[i] is None],
+            "requiredKeys": [sorted(keys) if keys is not None else None for keys in required_keys],
+        }
+
+    relevant_key_strings, relevant_key_regexes = relevant_keys(f for _, f in country_road_types.search_order)
+    return {
+        "modes": modes,
+        "relevantKeys": sorted(relevant_key_strings),
+        "relevantKeyRegexes": sorted(relevant_key_regexes),
+    }
+
+
+def relevant_keys(road_type_filters) -> tuple:
+    """Returns the keys and key regexes used in the given road type filters, including those of the
+    road types referred to by placeholders"""
+    strings = set()
+    regexes = set()
+    visited = set()
+    to_visit = list(road_type_filters)
+    while to_visit:
+        filters = to_visit.pop()
+        if id(filters) in visited:
+            continue
+        visited.add(id(filters))
+        for expression in filters.expressions():
+            to_visit.extend(expression.placeholders())
+            for relevant_key in expression.relevant_keys():
+                if isinstance(relevant_key, RealRegex):
+                    regexes.add(relevant_key.regex.pattern)
+                elif isinstance(relevant_key, SetRegex):
+                    strings.update(relevant_key.set)
+                else:
+                    strings.add(relevant_key)
+    return strings, regexes
+
+
+class CountryIndex:
+    """The index of one country, as loaded from the dict returned by build_country_index"""
+
+    __slots__ = ("candidates_by_mode", "relevant_key_strings", "relevant_key_regexes")
+
+    def __init__(self, country_road_types, data: dict):
+        self.candidates_by_mode = {}
+        for mode, fuzzy, with_relations in MODES:
+            mode_data = data["modes"][mode]
+            entries = [
+                (road_type, filters, frozenset(keys) if keys is not None else None)
+                for (road_type, filters), keys in zip(country_road_types.search_order, mode_data["requiredKeys"])
+            ]
+            by_highway = {
+                value: tuple(entries[i] for i in positions) for value, positions in mode_data["byHighway"].items()
+            }
+            other_highway = tuple(entries[i] for i in mode_data["otherHighway"])
+            self.candidates_by_mode[(fuzzy, with_relations)] = (by_highway, other_highway)
+        self.relevant_key_strings = frozenset(data["relevantKeys"])
+        self.relevant_key_regexes = [re.compile(regex) for regex in data["relevantKeyRegexes"]]
+
+    def candidates(self, fuzzy: bool, with_relations: bool, highway) -> tuple:
+        """Returns the (road type, filters, required keys) that may match a road with the given
+        highway value, in the order in which they should be tried"""
+        by_highway, other_highway = self.candidates_by_mode[(fuzzy, with_relations)]
+        return by_highway.get(highway, other_highway)
+
+    def is_relevant_tag_key(self, key: str) -> bool:
+        return key in self.relevant_key_strings or any(r.fullmatch(key) for r in self.relevant_key_regexes)
@@ -0,0 +1,67 @@
+import re
+
+FEET_INCH_REGEX = re.compile(r"([0-9]+)\s*(?:'|ft)\s*([0-9]+)\s*(?:\"|in)")
+WITH_UNIT_REGEX = re.compile(r"([0-9]+|[0-9]*\.[0-9]+)\s*([a-z/'\"]+)")
+
+STANDARD_UNITS_FACTORS = {
+    # speed: to kilometers per hour
+    "km/h": 1.0,
+    "kph": 1.0,
+    "mph": 1.609344,
+    # width/length/height: to meters
+    "m": 1.0,
+    "mm": 0.001,
+    "cm": 0.01,
+    "km": 1000.0,
+    "ft": 0.3048,
+    "'": 0.3048,
+    "in": 0.0254,
+    "\"": 0.0254,
+    "yd": 0.9144,
+    "yds": 0.9144,
+    # weight: to tonnes
+    "t": 1.0,
+    "kg": 0.001,
+    "st": 0.90718474,  # short tons
+    "lt": 1.0160469,  # long tons
+    "lb": 0.00045359237,
+    "lbs": 0.00045359237,
+    "cwt": 0.05080234544,  # imperial (=long) hundredweight. short cwt is not in use in road traffic
+}
+
+
+def to_float_or_none(s: str):
+    if "_" in s:
+        return None
+    try:
+        return float(s)
+    except ValueError:
+        return None
+
+
+def with_optional_unit_to_float_or_none(s: str):
+    """Parses a number with an optional unit, e.g. "3.5", "3.5t", "10 ft" or "3'4\"", into a float in
+    standard units (km/h, meters or tonnes). Returns None if it is not a number or the unit is unknown"""
+    if not s:
+        return None
+    if not s[0].isdigit() and s[0] != ".":
+        return None
+
+    if not s[-1].isalpha() and s[-1] != "\"" and s[-1] != "'":
+        return to_float_or_none(s)
+
+    with_unit_match = WITH_UNIT_REGEX.fullmatch(s)
+    if with_unit_match:
+        value, unit = with_unit_match.groups()
+        v = to_float_or_none(value)
+        factor = STANDARD_UNITS_FACTORS.get(unit)
+        if v is None or factor is None:
+            return None
+        return v * factor
+
+    feet_inch_match = FEET_INCH_REGEX.fullmatch(s)
+    if feet_inch_match:
+        feet, inches = feet_inch_match.groups()
+        return int(feet) * STANDARD_UNITS_FACTORS["ft"] + int(inches) * STANDARD_UNITS_FACTORS["in"]
+
+    return None
@@ -0,0 +1,106 @@
+"""Sharded form of legal_default_speeds.json, written by main.py --sharded.
+
+Consumers that only need a few countries fetch and load only their shards. The directory contains
+
+    index.json  the meta of the result, the file and the hash of the content of each shard in shards,
+                and the shard of each country and subdivision code in shardByCountryCode
+    XX.json     the shard of the country with the ISO 3166-1 alpha-2 code XX: the road classes of the
+                country and of its subdivisions, which fall back to those of the country, and only the
+                road types they refer to, directly or via placeholders. It is in the format of
+                legal_default_speeds.json, so it can also be loaded with load()
+
+The meta in the shards has no revision id and timestamp, so a shard only changes if its data changes
+and a client can keep the shards whose hash is the same as before.
+"""
+import hashlib
+import json
+import os
+
+from legal_default_speeds.compiled import compile_road_types, placeholder_graph, reachable_road_types
+from legal_default_speeds.speed_limits import LegalDefaultSpeeds
+
+INDEX_FILE_NAME = "index.json"
+
+SHARD_META_KEYS = ("source", "license", "licenseUrl")
+
+
+def shard_name(country_code: str) -> str:
+    return country_code.split("-", 1)[0]
+
+
+def shard_results(result: dict) -> dict:
+    """Returns the content of each shard of the given result by shard name"""
+    road_types_by_name = result["roadTypesByName"]
+    # filters that cannot be parsed are in the warnings of the result already
+    graph = placeholder_graph(compile_road_types(road_types_by_name, []))
+    meta = {key: value for key, value in result.get("meta", {}).items() if key in SHARD_META_KEYS}
+
+    speed_limits_by_shard = {}
+    for country_code, road_classes in result["speedLimitsByCountryCode"].items():
+        speed_limits_by_shard.setdefault(shard_name(country_code), {})[country_code] = road_classes
+
+    shards = {}
+    for name, speed_limits_by_country_code in speed_limits_by_shard.items():
+        used = reachable_road_types(graph, {
+            road_class["name"]
+            for road_classes in speed_limits_by_country_code.values()
+            for road_class in road_classes
+            if "name" in road_class
+        })
+        shards[name] = {
+            "meta": meta,
+            "roadTypesByName": {
+                road_type: filters for road_type, filters in road_types_by_name.items() if road_type in used
+            },
+            "speedLimitsByCountryCode": speed_limits_by_country_code,
+        }
+    return shards
+
+
+def content_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def write_sharded(result: dict, directory: str):
+    os.makedirs(directory, exist_ok=True)
+    shards = {}
+    for name, shard in shard_results(result).items():
+        content = json.dumps(shard, sort_keys=True, separators=(",", ":")).encode("utf8")
+        file_name = name + ".json"
+        with open(os.path.join(directory, file_name), "wb") as file:
+            file.write(content)
+        shards[name] = {"file": file_name, "hash": content_hash(content)}
+    index = {
+        "meta": result.get("meta", {}),
+        "shards": shards,
+        "shardByCountryCode": {
+            country_code: shard_name(country_code) for country_code in result["speedLimitsByCountryCode"]
+        },
+    }
+    with open(os.path.join(directory, INDEX_FILE_NAME), "w", encoding="utf8") as file:
+        file.write(json.dumps(index, sort_keys=True, indent=2))
+
+
+def load_sharded(directory: str, country_codes) -> LegalDefaultSpeeds:
+    """Creates a LegalDefaultSpeeds for only the given countries and subdivisions from a directory
+    written with write_sharded. Codes for which there is no shard are ignored. Raises a ValueError if
+    a shard does not match its hash in the index"""
+    with open(os.path.join(directory, INDEX_FILE_NAME), "r", encoding="utf8") as file:
+        index = json.load(file)
+    road_types_by_name = {}
+    speed_limits_by_country_code = {}
+    loaded = set()
+    for country_code in country_codes:
+        name = index["shardByCountryCode"].get(country_code, shard_name(country_code))
+        if name in loaded or name not in index["shards"]:
+            continue
+        loaded.add(name)
+        shard = index["shards"][name]
+        with open(os.path.join(directory, shard["file"]), "rb") as file:
+            content = file.read()
+        if content_hash(content) != shard["hash"]:
+            raise ValueError(f"{shard['file']} does not match its hash in {INDEX_FILE_NAME}")
+        data = json.loads(content)
+        road_types_by_name.update(data["roadTypesByName"])
+        speed_limits_by_country_code.update(data["speedLimitsByCountryCode"])
+    return LegalDefaultSpeeds(road_types_by_name, speed_limits_by_country_code)
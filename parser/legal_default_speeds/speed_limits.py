@@ -0,0 +1,383 @@
+"""Port of LegalDefaultSpeeds of the Kotlin library: Look up the default speed limits of a road in a
+country as specified in the legal_default_speeds.json generated by main.py"""
+import json
+from enum import Enum
+from typing import NamedTuple
+
+from legal_default_speeds.decision_index import CountryIndex, INDEX_VERSION, build_country_index, data_hash
+from legal_default_speeds.number_with_unit import with_optional_unit_to_float_or_none
+from legal_default_speeds.tag_filter import RealRegex, SetRegex, TagFilterExpression, TagFilterParseError
+
+
+class Certitude(Enum):
+    """Indicates how sure the result can be assumed to be"""
+    # It is an exact match with the road type. I.e., the tag filter for the road type matched.
+    EXACT = "Exact"
+    # The road type was inferred from the maxspeed given in the input
+    FROM_MAX_SPEED = "FromMaxSpeed"
+    # It can be assumed with reasonable certainty that the match is of the given road type. I.e., the
+    # fuzzy tag filter for the road type matched.
+    FUZZY = "Fuzzy"
+    # No road type matched, falling back to the default speed limit for "other roads"
+    FALLBACK = "Fallback"
+
+
+class Result(NamedTuple):
+    # the road type name as it appears in the wiki page or None if it is the default (fallback) rule
+    road_type_name: str
+    # only the tags that should be added to the input tags, see create_result_tags
+    tags: dict
+    certitude: Certitude
+
+
+class RoadTypeFilters:
+    """The parsed filters of one road type. Placeholders in the filters refer directly to the
+    RoadTypeFilters of the road type they name"""
+
+    __slots__ = ("name", "filter", "fuzzy_filter", "relation_filter")
+
+    def __init__(self, name: str, filter=None, fuzzy_filter=None, relation_filter=None):
+        self.name = name
+        self.filter = filter
+        self.fuzzy_filter = fuzzy_filter
+        self.relation_filter = relation_filter
+
+    def expressions(self) -> list:
+        return [e for e in (self.filter, self.fuzzy_filter, self.relation_filter) if e is not None]
+
+
+class CountryRoadTypes:
+    """The road types of one country, prepared for matching"""
+
+    __slots__ = ("road_types", "search_order", "by_maxspeed", "fallback", "index")
+
+    def __init__(self, road_types: list, road_type_filters: dict):
+        self.road_types = road_types
+        # a. First try to match the road that is defined the furthest to the bottom, b. if nothing matched,
+        # match the road that is defined furthest to the top. Both stop at the default rule (without name)
+        bottom = []
+        for road_type in reversed(road_types):
+            if "name" not in road_type:
+                break
+            bottom.append(road_type)
+        top = []
+        for road_type in road_types:
+            if "name" not in road_type:
+                break
+            top.append(road_type)
+        # matching is deterministic, so there is no need to try a road type a second time in b.
+        tried = {id(road_type) for road_type in bottom}
+        ordered = bottom + [road_type for road_type in top if id(road_type) not in tried]
+
+        self.search_order = tuple(
+            (road_type, road_type_filters.get(road_type["name"]) or RoadTypeFilters(road_type["name"]))
+            for road_type in ordered
+        )
+        self.by_maxspeed = {}
+        for road_type in ordered:
+            maxspeed = road_type.get("tags", {}).get("maxspeed")
+            if maxspeed is not None:
+                self.by_maxspeed.setdefault(maxspeed, road_type)
+        self.fallback = next((road_type for road_type in road_types if "name" not in road_type), None)
+        self.index = None
+
+
+def parse_filter(road_type: str, filter_name: str, filter_string: str):
+    if filter_string is None:
+        return None
+    try:
+        return TagFilterExpression(filter_string)
+    except TagFilterParseError as e:
+        raise ValueError(f"Invalid road type {filter_name} for \"{road_type}\"") from e
+
+
+def parse_road_type_filters(road_types_by_name: dict) -> dict:
+    """Returns the RoadTypeFilters by name of the given roadTypesByName, with the placeholders not yet
+    resolved"""
+    return {
+        name: RoadTypeFilters(
+            name,
+            parse_filter(name, "filter", filters.get("filter")),
+            parse_filter(name, "fuzzyFilter", filters.get("fuzzyFilter")),
+            parse_filter(name, "relationFilter", filters.get("relationFilter")),
+        )
+        for name, filters in road_types_by_name.items()
+    }
+
+
+class LegalDefaultSpeeds:
+    """Look up the default speed limits per country as specified in the given data, i.e. the
+    roadTypesByName and speedLimitsByCountryCode of legal_default_speeds.json.
+
+    All filters are parsed and their placeholders resolved once in the constructor (so a syntax
+    error becomes apparent immediately), so one instance should be reused for any number of roads.
+
+    index is the decision index as returned by get_index(), see decision_index.py. If it is not
+    given or does not belong to the given data, it is built in the constructor."""
+
+    def __init__(self, road_types_by_name: dict, speed_limits_by_country_code: dict, index: dict = None):
+        self.road_type_filters = parse_road_type_filters(road_types_by_name)
+        self.check_for_circular_placeholders()
+        self.resolve_placeholders()
+        self.init_countries(
+            speed_limits_by_country_code, data_hash(road_types_by_name, speed_limits_by_country_code), index
+        )
+
+    @classmethod
+    def from_resolved(cls, road_type_filters: dict, speed_limits_by_country_code: dict, data_hash: str,
+                      index: dict = None):
+        """Creates a LegalDefaultSpeeds from RoadTypeFilters whose placeholders are already resolved and
+        checked for circles, e.g. as loaded from a compiled file. data_hash is the hash of the data
+        they were parsed from"""
+        speeds = cls.__new__(cls)
+        speeds.road_type_filters = road_type_filters
+        speeds.init_countries(speed_limits_by_country_code, data_hash, index)
+        return speeds
+
+    def init_countries(self, speed_limits_by_country_code: dict, data_hash: str, index: dict):
+        self.relevant_key_strings = set()
+        self.relevant_key_regexes = []
+        self.calculate_relevant_keys()
+
+        self.road_types_by_country_code = {
+            country_code: CountryRoadTypes(road_types, self.road_type_filters)
+            for country_code, road_types in speed_limits_by_country_code.items()
+        }
+
+        self.data_hash = data_hash
+        if not index or index.get("version") != INDEX_VERSION or index.get("dataHash") != self.data_hash:
+            index = self.build_index()
+        self.index = index
+        for country_code, country_road_types in self.road_types_by_country_code.items():
+            country_road_types.index = CountryIndex(country_road_types, index["countries"][country_code])
+
+    def check_for_circular_placeholders(self):
+        # map of e.g. "rural paved road" -> {"rural", "paved road"} etc.
+        placeholders_by_road_name = {
+            name: set().union(*(e.placeholders() for e in filters.expressions()))
+            for name, filters in self.road_type_filters.items()
+        }
+        for name, placeholders in placeholders_by_road_name.items():
+            collected_placeholders = set(placeholders)
+            placeholders_to_expand = placeholders
+            while placeholders_to_expand:
+                expanded_placeholders = set()
+                for placeholder in placeholders_to_expand:
+                    expanded_placeholders.update(placeholders_by_road_name.get(placeholder, ()))
+                expanded_placeholders -= collected_placeholders
+                collected_placeholders |= expanded_placeholders
+                placeholders_to_expand = expanded_placeholders
+
+            if name in collected_placeholders:
+                raise ValueError(f"A road type filter for \"{name}\" contains circular placeholders")
+
+    def calculate_relevant_keys(self):
+        for filters in self.road_type_filters.values():
+            for expression in filters.expressions():
+                for relevant_key in expression.relevant_keys():
+                    if isinstance(relevant_key, RealRegex):
+                        self.relevant_key_regexes.append(relevant_key.regex)
+                    elif isinstance(relevant_key, SetRegex):
+                        self.relevant_key_strings.update(relevant_key.set)
+                    else:
+                        self.relevant_key_strings.add(relevant_key)
+
+    def resolve_placeholders(self):
+        """Lets each placeholder refer to the RoadTypeFilters it names, so they don't need to be looked
+        up by name on every evaluation. Unknown road types never match"""
+        def resolve(name: str) -> RoadTypeFilters:
+            return self.road_type_filters.get(name) or RoadTypeFilters(name)
+
+        for filters in self.road_type_filters.values():
+            for expression in filters.expressions():
+                expression.resolve_placeholders(resolve)
+
+    def build_index(self) -> dict:
+        return {
+            "version": INDEX_VERSION,
+            "dataHash": self.data_hash,
+            "countries": {
+                country_code: build_country_index(country_road_types)
+                for country_code, country_road_types in self.road_types_by_country_code.items()
+            },
+        }
+
+    def get_index(self) -> dict:
+        """Returns the decision index as a JSON serializable dict, to be passed to the constructor
+        the next time the same data is loaded"""
+        return self.index
+
+    def get_country_road_types(self, country_code: str):
+        return (
+            self.road_types_by_country_code.get(country_code)
+            or self.road_types_by_country_code.get(country_code.split("-", 1)[0])
+        )
+
+    def get_speed_limits(self, country_code: str, tags: dict, relations_tags: list = (), replacer_fn=None):
+        """Given a country/subdivision and the tags of a road (segment), returns a Result with the
+        additional maxspeed tags the road can be assumed to have. Returns None if nothing was found.
+
+        country_code is a ISO 3166-1 alpha-2 code optionally concatenated with a ISO 3166-2 code,
+        e.g. "DE", "US" or "BE-VLG". relations_tags are the tags of all relations the road is a member
+        of. They are optional, but may lead to more precise results.
+
+        replacer_fn(name, evaluate) may replace the result of any placeholder (or road type), e.g. for
+        name = "urban" if another data source tells whether a road is in a built-up area. For those
+        it does not want to replace, it should simply return evaluate()."""
+        country_road_types = self.get_country_road_types(country_code)
+        if country_road_types is None:
+            return None
+        return self.find_speed_limits(country_road_types, tags, relations_tags, replacer_fn)
+
+    def get_speed_limits_batch(self, ways, replacer_fn=None):
+        """Yields the result of get_speed_limits for each of the given (country_code, tags,
+        relations_tags) tuples. Lookups of the same country codes are only done once."""
+        country_road_types_by_code = {}
+        for country_code, tags, relations_tags in ways:
+            if country_code in country_road_types_by_code:
+                country_road_types = country_road_types_by_code[country_code]
+            else:
+                country_road_types = self.get_country_road_types(country_code)
+                country_road_types_by_code[country_code] = country_road_types
+
+            if country_road_types is None:
+                yield None
+            else:
+                yield self.find_speed_limits(country_road_types, tags, relations_tags or (), replacer_fn)
+
+    def find_speed_limits(self, country_road_types: CountryRoadTypes, tags: dict, relations_tags, replacer_fn):
+        # 1. Try to match tags first
+        road_type = find_road_type_by_tags(country_road_types, tags, relations_tags, False, replacer_fn)
+        if road_type is not None:
+            return create_result(road_type, tags, Certitude.EXACT)
+
+        # 2. If a maxspeed is set, try to reverse-search by maxspeed
+        maxspeed = tags.get("maxspeed")
+        if maxspeed is not None:
+            road_type = country_road_types.by_maxspeed.get(maxspeed)
+            if road_type is not None:
+                return create_result(road_type, tags, Certitude.FROM_MAX_SPEED)
+
+        # 3. If still nothing is found, try to match fuzzy tags
+        road_type = find_road_type_by_tags(country_road_types, tags, relations_tags, True, replacer_fn)
+        if road_type is not None:
+            return create_result(road_type, tags, Certitude.FUZZY)
+
+        # 4. Otherwise, match the default (if it exists)
+        if country_road_types.fallback is not None:
+            return create_result(country_road_types.fallback, tags, Certitude.FALLBACK)
+        return None
+
+    def is_relevant_tag_key(self, key: str, country_code: str = None) -> bool:
+        """Returns whether the given tag key is relevant for getting the speed limits. This can be used
+        to reduce the tags of roads to only the relevant ones, e.g. to cache results. If a country code
+        is given, only the road types of that country are considered"""
+        if country_code is not None:
+            country_road_types = self.get_country_road_types(country_code)
+            return country_road_types is not None and country_road_types.index.is_relevant_tag_key(key)
+        return key in self.relevant_key_strings or any(r.fullmatch(key) for r in self.relevant_key_regexes)
+
+
+def find_road_type_by_tags(country_road_types: CountryRoadTypes, tags: dict, relations_tags, fuzzy: bool,
+                           replacer_fn):
+    def filters_match(filters: RoadTypeFilters) -> bool:
+        if filters.relation_filter is not None:
+            for relation_tags in relations_tags:
+                if filters.relation_filter.matches(relation_tags, evaluate):
+                    return True
+        if filters.filter is not None and filters.filter.matches(tags, evaluate):
+            return True
+        return fuzzy and filters.fuzzy_filter is not None and filters.fuzzy_filter.matches(tags, evaluate)
+
+    if replacer_fn is not None:
+        # the replacer may let any road type match, so the index cannot be used
+        def evaluate(filters: RoadTypeFilters) -> bool:
+            return replacer_fn(filters.name, lambda: filters_match(filters))
+
+        for road_type, filters in country_road_types.search_order:
+            if evaluate(filters):
+                return road_type
+        return None
+
+    evaluate = filters_match
+    for road_type, filters, required_keys in country_road_types.index.candidates(
+        fuzzy, bool(relations_tags), tags.get("highway")
+    ):
+        if required_keys is not None and required_keys.isdisjoint(tags):
+            continue
+        if filters_match(filters):
+            return road_type
+    return None
+
+
+def create_result(road_type: dict, tags: dict, certitude: Certitude) -> Result:
+    return Result(road_type.get("name"), create_result_tags(tags, road_type.get("tags", {})), certitude)
+
+
+def is_implicit_max_speed(key: str, value: str) -> bool:
+    # stuff like maxspeed=RO:urban from the input tags should not overwrite explicit speed limits from output tags
+    return key == "maxspeed" and with_optional_unit_to_float_or_none(value) is None
+
+
+def create_result_tags(tags: dict, road_type_tags: dict) -> dict:
+    """Returns the tags of the road type, without those already in the given tags and without the
+    speeds that are higher than the (given or default) maxspeed"""
+    result = dict(road_type_tags)
+    result.update((k, v) for k, v in tags.items() if not is_implicit_max_speed(k, v))
+    limit_speeds_to(result, "maxspeed", with_optional_unit_to_float_or_none(result.get("maxspeed", "")))
+    for k, v in tags.items():
+        if not is_implicit_max_speed(k, v):
+            result.pop(k, None)
+    return result
+
+
+def limit_speeds_to(tags: dict, key: str, maxspeed):
+    prefix = key + ":"
+    if maxspeed is not None:
+        for k in [k for k in tags if k.startswith(prefix)]:
+            if k.endswith(":conditional"):
+                # search & remove through conditionals strings. E.g. if maxspeed=60, turn
+                # maxspeed:hgv:conditional=80 @ (trailer); 40 @ (weight>30t) into
+                # maxspeed:hgv:conditional=40 @ (weight>30t) or delete if no conditionals are left
+                conditionals = [c for c in tags[k].split("; ") if is_lower_speed(c.split(" @ ")[0], maxspeed)]
+                if conditionals:
+                    tags[k] = "; ".join(conditionals)
+                else:
+                    del tags[k]
+                    continue
+
+            # remove higher speeds. E.g. if maxspeed=60, remove maxspeed:hgv=80
+            speed = with_optional_unit_to_float_or_none(tags[k])
+            if speed is not None and speed >= maxspeed:
+                del tags[k]
+
+    # recurse down. The same should be done for e.g. maxspeed:hgv:conditional if maxspeed:hgv already has
+    # a lower speed limit etc.
+    for subkey in [k for k in tags if k.startswith(prefix)]:
+        sub_maxspeed = with_optional_unit_to_float_or_none(tags.get(subkey, ""))
+        limit_speeds_to(tags, subkey, min((s for s in (maxspeed, sub_maxspeed) if s is not None), default=None))
+
+
+def is_lower_speed(s: str, maxspeed: float) -> bool:
+    speed = with_optional_unit_to_float_or_none(s)
+    return speed is None or speed < maxspeed
+
+
+def load(file_name: str, index_file_name: str = None) -> LegalDefaultSpeeds:
+    """Creates a LegalDefaultSpeeds from a legal_default_speeds.json and optionally its decision index
+    as saved with save_index(). The index is rebuilt if the file does not exist or is outdated"""
+    with open(file_name, "r", encoding="utf8") as file:
+        data = json.load(file)
+    index = None
+    if index_file_name:
+        try:
+            with open(index_file_name, "r", encoding="utf8") as file:
+                index = json.load(file)
+        except FileNotFoundError:
+            pass
+    return LegalDefaultSpeeds(data["roadTypesByName"], data["speedLimitsByCountryCode"], index)
+
+
+def save_index(speeds: LegalDefaultSpeeds, file_name: str):
+    with open(file_name, "w", encoding="utf8") as file:
+        file.write(json.dumps(speeds.get_index(), sort_keys=True))
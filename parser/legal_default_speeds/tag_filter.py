@@ -0,0 +1,771 @@
+"""Port of the tag filter expressions of the Kotlin library. A tag filter expression is a string like
+
+    (highway = residential or highway = tertiary) and !name
+
+The syntax is documented in TagFilterExpressionParser.kt. Road types may refer to other road types
+in their filters with placeholders like {urban}, the evaluation of these is delegated to the caller.
+"""
+import re
+
+from legal_default_speeds.number_with_unit import with_optional_unit_to_float_or_none
+
+OR = "or"
+AND = "and"
+
+EQUALS = "="
+NOT_EQUALS = "!="
+LIKE = "~"
+PLACEHOLDER_START = "{"
+PLACEHOLDER_END = "}"
+NOT = "!"
+NOT_LIKE = "!~"
+GREATER_THAN = ">"
+LESS_THAN = "<"
+GREATER_OR_EQUAL_THAN = ">="
+LESS_OR_EQUAL_THAN = "<="
+
+RESERVED_WORDS = (OR, AND)
+QUOTATION_MARKS = ("\"", "'")
+KEY_VALUE_OPERATORS = {EQUALS, NOT_EQUALS, LIKE, NOT_LIKE}
+COMPARISON_OPERATORS = {GREATER_THAN, GREATER_OR_EQUAL_THAN, LESS_THAN, LESS_OR_EQUAL_THAN}
+# must be in that order because if ">=" would be after ">", parser would match ">" also when encountering ">="
+OPERATORS = (
+    GREATER_OR_EQUAL_THAN,
+    LESS_OR_EQUAL_THAN,
+    GREATER_THAN,
+    LESS_THAN,
+    NOT_EQUALS,
+    EQUALS,
+    NOT_LIKE,
+    LIKE,
+)
+
+ESCAPED_QUOTE_REGEX = re.compile(r"\\(['\"])")
+WHITESPACE_REGEX = re.compile(r"\s")
+WHITESPACES_REGEX = re.compile(r"\s*")
+NOT_WITH_WHITESPACE_AND_OPENING_BRACE = re.compile(r"!\s*\(")
+ANY_REGEX_STUFF_EXCEPT_PIPE = re.compile(r"[.\[\]{}()<>*+-=!?^$]")
+
+
+class TagFilterParseError(ValueError):
+    def __init__(self, message: str, error_offset: int):
+        super().__init__(f"At position {error_offset}: {message}")
+        self.error_offset = error_offset
+
+
+class IllegalExpressionStateError(Exception):
+    pass
+
+
+# ---------------------------------------------------------------------------------------------------
+# regexes
+
+class RealRegex:
+    def __init__(self, regex: str):
+        self.regex = re.compile(regex)
+
+    def matches(self, string: str) -> bool:
+        return self.regex.fullmatch(string) is not None
+
+
+class SetRegex:
+    def __init__(self, strings):
+        self.set = frozenset(strings)
+
+    def matches(self, string: str) -> bool:
+        return string in self.set
+
+
+def regex_or_set(string: str):
+    """Returns a set matcher if the regex only consists of a string with pipes, e.g.
+    bakery|pharmacy|clock, or a real regex otherwise"""
+    if not ANY_REGEX_STUFF_EXCEPT_PIPE.search(string):
+        return SetRegex(string.split("|"))
+    return RealRegex(string)
+
+
+# ---------------------------------------------------------------------------------------------------
+# tag filters. relevant_key is either a key or a RealRegex or SetRegex that matches the relevant keys
+
+class HasKey:
+    def __init__(self, key: str):
+        self.key = key
+        self.relevant_key = key
+
+    def matches(self, tags: dict) -> bool:
+        return self.key in tags
+
+
+class NotHasKey:
+    def __init__(self, key: str):
+        self.key = key
+        self.relevant_key = key
+
+    def matches(self, tags: dict) -> bool:
+        return self.key not in tags
+
+
+class HasTag:
+    def __init__(self, key: str, value: str):
+        self.key = key
+        self.value = value
+        self.relevant_key = key
+
+    def matches(self, tags: dict) -> bool:
+        return tags.get(self.key) == self.value
+
+
+class NotHasTag:
+    def __init__(self, key: str, value: str):
+        self.key = key
+        self.value = value
+        self.relevant_key = key
+
+    def matches(self, tags: dict) -> bool:
+        return tags.get(self.key) != self.value
+
+
+class HasKeyLike:
+    def __init__(self, key: str):
+        self.key = key
+        self.regex = regex_or_set(key)
+        self.relevant_key = self.regex
+
+    def matches(self, tags: dict) -> bool:
+        return any(self.regex.matches(k) for k in tags)
+
+
+class NotHasKeyLike:
+    def __init__(self, key: str):
+        self.key = key
+        self.regex = regex_or_set(key)
+        self.relevant_key = self.regex
+
+    def matches(self, tags: dict) -> bool:
+        return not any(self.regex.matches(k) for k in tags)
+
+
+class HasTagValueLike:
+    def __init__(self, key: str, value: str):
+        self.key = key
+        self.value = value
+        self.regex = regex_or_set(value)
+        self.relevant_key = key
+
+    def matches(self, tags: dict) -> bool:
+        value = tags.get(self.key)
+        return value is not None and self.regex.matches(value)
+
+
+class NotHasTagValueLike:
+    def __init__(self, key: str, value: str):
+        self.key = key
+        self.value = value
+        self.regex = regex_or_set(value)
+        self.relevant_key = key
+
+    def matches(self, tags: dict) -> bool:
+        value = tags.get(self.key)
+        return value is None or not self.regex.matches(value)
+
+
+class HasTagLike:
+    def __init__(self, key: str, value: str):
+        self.key = key
+        self.value = value
+        self.key_regex = regex_or_set(key)
+        self.value_regex = regex_or_set(value)
+        self.relevant_key = self.key_regex
+
+    def matches(self, tags: dict) -> bool:
+        return any(self.key_regex.matches(k) and self.value_regex.matches(v) for k, v in tags.items())
+
+
+class CompareTagValue:
+    def __init__(self, key: str, value: float):
+        self.key = key
+        self.value = value
+        self.relevant_key = key
+
+    def matches(self, tags: dict) -> bool:
+        tag_value = tags.get(self.key)
+        if tag_value is None:
+            return False
+        tag_value = with_optional_unit_to_float_or_none(tag_value)
+        if tag_value is None:
+            return False
+        return self.compare_to(tag_value)
+
+
+class HasTagLessThan(CompareTagValue):
+    def compare_to(self, tag_value: float) -> bool:
+        return tag_value < self.value
+
+
+class HasTagGreaterThan(CompareTagValue):
+    def compare_to(self, tag_value: float) -> bool:
+        return tag_value > self.value
+
+
+class HasTagLessOrEqualThan(CompareTagValue):
+    def compare_to(self, tag_value: float) -> bool:
+        return tag_value <= self.value
+
+
+class HasTagGreaterOrEqualThan(CompareTagValue):
+    def compare_to(self, tag_value: float) -> bool:
+        return tag_value >= self.value
+
+
+# ---------------------------------------------------------------------------------------------------
+# boolean expressions
+
+class Chain:
+    def __init__(self):
+        self.parent = None
+        self.nodes = []
+
+    @property
+    def children(self) -> list:
+        return list(self.nodes)
+
+    def add_child(self, child):
+        child.parent = self
+        self.nodes.append(child)
+
+    def remove_child(self, child):
+        self.nodes.remove(child)
+        child.parent = None
+
+    def replace_child(self, replace, with_node):
+        for i, child in enumerate(self.nodes):
+            if child is replace:
+                self.nodes[i] = with_node
+                with_node.parent = self
+                return
+
+    def flatten(self):
+        """Removes unnecessary depth in the expression tree"""
+        self.remove_empty_nodes()
+        self.merge_nodes_with_same_operator()
+
+    def remove_empty_nodes(self):
+        """remove nodes from superfluous brackets"""
+        i = 0
+        while i < len(self.nodes):
+            child = self.nodes[i]
+            if isinstance(child, Chain):
+                if len(child.nodes) == 1 and not isinstance(child, Not):
+                    self.nodes[i] = child.nodes[0]
+                    self.nodes[i].parent = self
+                    continue  # = the just replaced node will be checked again
+                child.remove_empty_nodes()
+            i += 1
+
+    def merge_nodes_with_same_operator(self):
+        """merge children recursively which do have the same operator set (and, or)"""
+        i = 0
+        while i < len(self.nodes):
+            child = self.nodes[i]
+            if isinstance(child, Chain) and not isinstance(child, Not):
+                child.merge_nodes_with_same_operator()
+                # merge two successive nodes of same type
+                if type(child) is type(self):
+                    self.nodes[i:i + 1] = child.nodes
+                    for grandchild in child.nodes:
+                        grandchild.parent = self
+                    i += len(child.nodes)
+                    continue
+            i += 1
+
+    def placeholders(self):
+        for node in self.nodes:
+            yield from node.placeholders()
+
+    def items(self):
+        for node in self.nodes:
+            yield from node.items()
+
+
+class Placeholder:
+    def __init__(self, value: str):
+        self.parent = None
+        self.value = value
+
+    def matches(self, tags: dict, evaluate) -> bool:
+        return evaluate(self.value)
+
+    def placeholders(self):
+        yield self.value
+
+    def items(self):
+        return iter(())
+
+
+class NotPlaceholder(Placeholder):
+    def matches(self, tags: dict, evaluate) -> bool:
+        return not evaluate(self.value)
+
+
+class Leaf:
+    def __init__(self, value):
+        self.parent = None
+        self.value = value
+
+    def matches(self, tags: dict, evaluate) -> bool:
+        return self.value.matches(tags)
+
+    def placeholders(self):
+        return iter(())
+
+    def items(self):
+        yield self.value
+
+
+class AllOf(Chain):
+    def matches(self, tags: dict, evaluate) -> bool:
+        return all(node.matches(tags, evaluate) for node in self.nodes)
+
+
+class AnyOf(Chain):
+    def matches(self, tags: dict, evaluate) -> bool:
+        return any(node.matches(tags, evaluate) for node in self.nodes)
+
+
+class Not(Chain):
+    def add_child(self, child):
+        if self.nodes:
+            raise IllegalExpressionStateError("Adding a second child to '!' (NOT) operator is not allowed")
+        super().add_child(child)
+
+    def matches(self, tags: dict, evaluate) -> bool:
+        return not self.nodes[0].matches(tags, evaluate)
+
+
+class BracketHelper(Chain):
+    def matches(self, tags: dict, evaluate) -> bool:
+        raise IllegalExpressionStateError("Bracket cannot match")
+
+
+def ensure_no_bracket_nodes(chain: Chain):
+    if isinstance(chain, BracketHelper):
+        raise IllegalExpressionStateError("BooleanExpression still contains a Bracket node!")
+    for child in chain.nodes:
+        if isinstance(child, Chain):
+            ensure_no_bracket_nodes(child)
+
+
+class BooleanExpressionBuilder:
+    """Builds a boolean expression. Basically a boolean expression with a cursor."""
+
+    def __init__(self):
+        self.node = BracketHelper()
+        self.bracket_count = 0
+
+    def build(self):
+        if self.bracket_count > 0:
+            raise IllegalExpressionStateError("Closed one bracket too little")
+
+        while self.node.parent is not None:
+            self.node = self.node.parent
+
+        self.node.flatten()
+
+        # flatten cannot remove itself, but we wanna do that
+        if len(self.node.nodes) == 0:
+            return None
+        if len(self.node.nodes) == 1:
+            first_child = self.node.nodes[0]
+            self.node.remove_child(first_child)
+            return first_child
+
+        ensure_no_bracket_nodes(self.node)
+        return self.node
+
+    def add_open_bracket(self):
+        group = BracketHelper()
+        self.node.add_child(group)
+        self.node = group
+        self.bracket_count += 1
+
+    def add_close_bracket(self):
+        self.bracket_count -= 1
+        if self.bracket_count < 0:
+            raise IllegalExpressionStateError("Closed one bracket too much")
+
+        while not isinstance(self.node, BracketHelper):
+            self.node = self.node.parent
+        self.node = self.node.parent
+
+        if isinstance(self.node, Not):
+            self.node = self.node.parent
+
+    def add_value(self, value):
+        self.node.add_child(Leaf(value))
+
+    def add_placeholder(self, placeholder: str):
+        self.node.add_child(Placeholder(placeholder))
+
+    def add_not_placeholder(self, placeholder: str):
+        self.node.add_child(NotPlaceholder(placeholder))
+
+    def add_and(self):
+        if not isinstance(self.node, AllOf):
+            last = self.node.nodes[-1]
+            all_of = AllOf()
+            self.node.replace_child(last, all_of)
+            all_of.add_child(last)
+            self.node = all_of
+
+    def add_or(self):
+        if isinstance(self.node, AllOf):
+            all_of = self.node
+            node_parent = all_of.parent
+            if isinstance(node_parent, AnyOf):
+                self.node = node_parent
+            else:
+                if node_parent is not None:
+                    node_parent.remove_child(all_of)
+                any_of = AnyOf()
+                any_of.add_child(all_of)
+                if node_parent is not None:
+                    node_parent.add_child(any_of)
+                self.node = any_of
+        elif isinstance(self.node, BracketHelper):
+            last = self.node.nodes[-1]
+            any_of = AnyOf()
+            self.node.replace_child(last, any_of)
+            any_of.add_child(last)
+            self.node = any_of
+
+    def add_not(self):
+        not_node = Not()
+        self.node.add_child(not_node)
+        self.node = not_node
+
+
+# ---------------------------------------------------------------------------------------------------
+# parser
+
+class StringWithCursor:
+    """Convenience class to make it easier to go step by step through a string"""
+
+    def __init__(self, string: str):
+        self.string = string
+        self.cursor_pos = 0
+
+    def get(self, index: int):
+        return self.string[index] if index < len(self.string) else None
+
+    def next_is_and_advance(self, s: str) -> bool:
+        if not self.next_is(s):
+            return False
+        self.advance_by(len(s))
+        return True
+
+    def next_matches_and_advance(self, regex):
+        match = self.next_matches(regex)
+        if match:
+            self.advance_by(len(match.group(0)))
+        return match
+
+    def is_at_end(self, offs: int = 0) -> bool:
+        return self.cursor_pos + offs >= len(self.string)
+
+    def find_next(self, s: str, offs: int = 0) -> int:
+        """@return the position relative to the cursor position at which s is found in the string.
+        If not found, the position past the end of the string is returned"""
+        return self.to_delta(self.string.find(s, self.cursor_pos + offs))
+
+    def find_next_regex(self, regex, offs: int = 0) -> int:
+        match = regex.search(self.string, self.cursor_pos + offs)
+        return self.to_delta(match.start() if match else -1)
+
+    def advance(self) -> str:
+        if self.is_at_end():
+            raise IndexError()
+        result = self.string[self.cursor_pos]
+        self.cursor_pos += 1
+        return result
+
+    def advance_by(self, x: int) -> str:
+        if x < 0:
+            raise IndexError()
+        end = min(self.cursor_pos + x, len(self.string))
+        result = self.string[self.cursor_pos:end]
+        self.cursor_pos = end
+        return result
+
+    def retreat_by(self, x: int):
+        if x < 0:
+            raise IndexError()
+        self.cursor_pos = max(0, self.cursor_pos - x)
+
+    def next_is(self, s: str) -> bool:
+        return self.string.startswith(s, self.cursor_pos)
+
+    def next_matches(self, regex):
+        return regex.match(self.string, self.cursor_pos)
+
+    def to_delta(self, index: int) -> int:
+        return len(self.string) - self.cursor_pos if index == -1 else index - self.cursor_pos
+
+
+def parse_tags(cursor: StringWithCursor):
+    builder = BooleanExpressionBuilder()
+    first = True
+
+    while True:
+        # if it has no bracket, there must be at least one whitespace
+        if not parse_brackets_and_spaces(cursor, "(", builder) and not first:
+            raise TagFilterParseError("Expected a whitespace or bracket before the tag", cursor.cursor_pos)
+        first = False
+
+        if cursor.next_matches(NOT_WITH_WHITESPACE_AND_OPENING_BRACE):
+            cursor.advance_by(len(NOT))
+            add_to_builder(cursor, builder.add_not)
+            # continue is required, as !( could be nested
+            continue
+
+        if cursor.next_is_and_advance(NOT + PLACEHOLDER_START):
+            builder.add_not_placeholder(parse_placeholder(cursor))
+        elif cursor.next_is_and_advance(PLACEHOLDER_START):
+            builder.add_placeholder(parse_placeholder(cursor))
+        else:
+            builder.add_value(parse_tag(cursor))
+
+        separated = parse_brackets_and_spaces(cursor, ")", builder)
+
+        if cursor.is_at_end():
+            break
+
+        # same as with the opening bracket, only that if the string is over, it's okay
+        if not separated:
+            raise TagFilterParseError("Expected a whitespace or bracket after the tag", cursor.cursor_pos)
+
+        if cursor.next_is_and_advance(OR):
+            builder.add_or()
+        elif cursor.next_is_and_advance(AND):
+            builder.add_and()
+        else:
+            raise TagFilterParseError(f"Expected end of string, '{AND}' or '{OR}'", cursor.cursor_pos)
+
+    return add_to_builder(cursor, builder.build)
+
+
+def add_to_builder(cursor: StringWithCursor, builder_func):
+    try:
+        return builder_func()
+    except IllegalExpressionStateError as e:
+        raise TagFilterParseError(str(e), cursor.cursor_pos) from e
+
+
+def parse_brackets_and_spaces(cursor: StringWithCursor, bracket: str, builder: BooleanExpressionBuilder) -> bool:
+    initial_cursor_pos = cursor.cursor_pos
+    while True:
+        loop_start_cursor_pos = cursor.cursor_pos
+        expect_any_number_of_spaces(cursor)
+        if cursor.next_is_and_advance(bracket):
+            add_to_builder(cursor, builder.add_open_bracket if bracket == "(" else builder.add_close_bracket)
+        if loop_start_cursor_pos >= cursor.cursor_pos:
+            break
+    expect_any_number_of_spaces(cursor)
+    return initial_cursor_pos < cursor.cursor_pos
+
+
+def parse_tag(cursor: StringWithCursor):
+    if cursor.next_is_and_advance(NOT):
+        if cursor.next_is_and_advance(LIKE):
+            expect_any_number_of_spaces(cursor)
+            return NotHasKeyLike(parse_key(cursor))
+        else:
+            expect_any_number_of_spaces(cursor)
+            return NotHasKey(parse_key(cursor))
+
+    if cursor.next_is_and_advance(LIKE):
+        expect_any_number_of_spaces(cursor)
+        key = parse_key(cursor)
+        operator = parse_operator_with_surrounding_spaces(cursor)
+        if operator is None:
+            return HasKeyLike(key)
+        elif operator == LIKE:
+            return HasTagLike(key, parse_quotable_word(cursor))
+        raise TagFilterParseError(
+            f"Unexpected operator '{operator}': The key prefix operator '{LIKE}' must be used together with "
+            f"the binary operator '{LIKE}'",
+            cursor.cursor_pos
+        )
+
+    key = parse_key(cursor)
+    operator = parse_operator_with_surrounding_spaces(cursor)
+    if operator is None:
+        return HasKey(key)
+
+    if operator in KEY_VALUE_OPERATORS:
+        value = parse_quotable_word(cursor)
+        if operator == EQUALS:
+            return HasTag(key, value)
+        elif operator == NOT_EQUALS:
+            return NotHasTag(key, value)
+        elif operator == LIKE:
+            return HasTagValueLike(key, value)
+        elif operator == NOT_LIKE:
+            return NotHasTagValueLike(key, value)
+
+    if operator in COMPARISON_OPERATORS:
+        value = with_optional_unit_to_float_or_none(parse_word(cursor))
+        if value is None:
+            raise TagFilterParseError(
+                "Expected a number (e.g. 3.5) or a number with a known unit (e.g. 3.5st)", cursor.cursor_pos
+            )
+        if operator == GREATER_THAN:
+            return HasTagGreaterThan(key, value)
+        elif operator == GREATER_OR_EQUAL_THAN:
+            return HasTagGreaterOrEqualThan(key, value)
+        elif operator == LESS_THAN:
+            return HasTagLessThan(key, value)
+        elif operator == LESS_OR_EQUAL_THAN:
+            return HasTagLessOrEqualThan(key, value)
+
+    raise TagFilterParseError(f"Unknown operator '{operator}'", cursor.cursor_pos)
+
+
+def parse_key(cursor: StringWithCursor) -> str:
+    reserved = next_is_reserved_word(cursor)
+    if reserved is not None:
+        raise TagFilterParseError(
+            f"A key cannot be named like the reserved word '{reserved}', surround it with quotation marks",
+            cursor.cursor_pos
+        )
+
+    length = find_key_length(cursor)
+    if length == 0:
+        raise TagFilterParseError("Missing key (dangling prefix operator)", cursor.cursor_pos)
+    return strip_and_unescape_quotes(cursor.advance_by(length))
+
+
+def parse_operator_with_surrounding_spaces(cursor: StringWithCursor):
+    spaces = expect_any_number_of_spaces(cursor)
+    result = next((operator for operator in OPERATORS if cursor.next_is_and_advance(operator)), None)
+    if result is None:
+        cursor.retreat_by(spaces)
+        return None
+    expect_any_number_of_spaces(cursor)
+    return result
+
+
+def parse_placeholder(cursor: StringWithCursor) -> str:
+    length = cursor.find_next(PLACEHOLDER_END)
+    if cursor.is_at_end(length):
+        raise TagFilterParseError("Missing closing bracket '}' for placeholder", cursor.cursor_pos + length)
+    result = cursor.advance_by(length)
+    cursor.advance()  # consume "}"
+    return result
+
+
+def parse_quotable_word(cursor: StringWithCursor) -> str:
+    length = find_quotable_word_length(cursor)
+    if length == 0:
+        raise TagFilterParseError("Missing value (dangling operator)", cursor.cursor_pos)
+    return strip_and_unescape_quotes(cursor.advance_by(length))
+
+
+def parse_word(cursor: StringWithCursor) -> str:
+    length = find_word_length(cursor)
+    if length == 0:
+        raise TagFilterParseError("Missing value (dangling operator)", cursor.cursor_pos)
+    return cursor.advance_by(length)
+
+
+def expect_any_number_of_spaces(cursor: StringWithCursor) -> int:
+    match = cursor.next_matches_and_advance(WHITESPACES_REGEX)
+    return len(match.group(0)) if match else 0
+
+
+def next_is_reserved_word(cursor: StringWithCursor):
+    word_length = find_word_length(cursor)
+    return next((word for word in RESERVED_WORDS if cursor.next_is(word) and word_length == len(word)), None)
+
+
+def find_key_length(cursor: StringWithCursor) -> int:
+    length = find_quotation_length(cursor)
+    if length is not None:
+        return length
+
+    length = find_word_length(cursor)
+    for operator in OPERATORS:
+        operator_length = cursor.find_next(operator)
+        if operator_length < length:
+            length = operator_length
+    return length
+
+
+def find_word_length(cursor: StringWithCursor) -> int:
+    return min(cursor.find_next_regex(WHITESPACE_REGEX), cursor.find_next(")"))
+
+
+def find_quotable_word_length(cursor: StringWithCursor) -> int:
+    length = find_quotation_length(cursor)
+    return length if length is not None else find_word_length(cursor)
+
+
+def find_quotation_length(cursor: StringWithCursor):
+    for quot in QUOTATION_MARKS:
+        if cursor.next_is(quot):
+            length = 0
+            while True:
+                length = cursor.find_next(quot, 1 + length)
+                if cursor.is_at_end(length):
+                    raise TagFilterParseError("Did not close quotation marks", cursor.cursor_pos - 1)
+                # ignore escaped
+                if cursor.get(cursor.cursor_pos + length - 1) == "\\":
+                    continue
+                # +1 because we want to include the closing quotation mark
+                return length + 1
+    return None
+
+
+def strip_and_unescape_quotes(s: str) -> str:
+    trimmed = s[1:-1] if s.startswith(QUOTATION_MARKS) else s
+    return ESCAPED_QUOTE_REGEX.sub(r"\1", trimmed)
+
+
+def placeholder_nodes(node):
+    if isinstance(node, Placeholder):
+        yield node
+    elif isinstance(node, Chain):
+        for child in node.nodes:
+            yield from placeholder_nodes(child)
+
+
+class TagFilterExpression:
+    """A parsed tag filter expression"""
+
+    def __init__(self, string: str):
+        self.string = string
+        self.expression = parse_tags(StringWithCursor(string))
+
+    @classmethod
+    def from_expression(cls, expression):
+        """Returns a TagFilterExpression of an already parsed expression, e.g. as loaded from a compiled
+        file. Its string is None"""
+        result = cls.__new__(cls)
+        result.string = None
+        result.expression = expression
+        return result
+
+    def matches(self, tags: dict, evaluate) -> bool:
+        """Whether the given tags match. evaluate(name) is called to evaluate placeholders"""
+        return self.expression.matches(tags, evaluate)
+
+    def placeholders(self) -> set:
+        return set(self.expression.placeholders())
+
+    def resolve_placeholders(self, resolve):
+        """Replaces the value of each placeholder, i.e. its name, with resolve(name). evaluate is then
+        called with that value instead of the name when matching"""
+        for node in placeholder_nodes(self.expression):
+            node.value = resolve(node.value)
+
+    def relevant_keys(self) -> list:
+        return [tag_filter.relevant_key for tag_filter in self.expression.items()]
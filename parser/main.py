@@ -1,44 +1,199 @@
+import argparse
 import json
 import sys
 
-import requests
 import datetime
 
-from bs4 import BeautifulSoup
-
-from parsers.osm_restrictions import parse_speeds
+from legal_default_speeds import LegalDefaultSpeeds
+from legal_default_speeds import save_index
+from legal_default_speeds import write_binary
+from legal_default_speeds.compiled import write_compiled
+from legal_default_speeds.sharded import write_sharded
+from parsers.html_tables import read_tables
+from parsers.osm_restrictions import parse_speed_definitions
+from parsers.parse_cache import ParseCache
+from parsers.parse_cache import parser_hash
+from parsers.parse_utils import map_speed_table_rows
 from parsers.parse_utils import parse_road_types_table
 from parsers.parse_utils import parse_speed_table
-from parsers.parse_utils import validate_road_types
-from parsers.parse_utils import validate_road_types_in_speed_table
+from parsers.profiling import Profile
+from parsers.profiling import stage
+from parsers.validation import Validation
+from parsers.wiki_client import WikiClient
+from parsers.wiki_client import read_snapshot
 
 WIKI_URL = "https://wiki.openstreetmap.org/wiki/"
-WIKI_API_URL = "https://wiki.openstreetmap.org/w/api.php"
 WIKI_PAGE = "Default_speed_limits"
 
 
-if __name__ == "__main__":
-    output_file_name = sys.argv[1] if len(sys.argv)>1 else "legal_default_speeds.json"
-
-    parsed = requests.get(WIKI_API_URL, {"action": "parse", "page": WIKI_PAGE, "format": "json"}).json()["parse"]
+def read_page_tables(parsed: dict):
     html_string = parsed["text"]["*"]
     # (UI editor of) mediawiki sometimes adds crap like this (no-break space)
     html_string_cleaned = html_string.replace("&#160;", " ")
-    soup = BeautifulSoup(html_string_cleaned, "html.parser")
-    speed_table = soup.find_all("table")[0]
-    road_types = parse_road_types_table(soup.find_all("table")[1])
+    return read_tables(html_string_cleaned)
+
+
+def next_table(tables, name: str):
+    """Returns the next of the given tables as returned by read_page_tables. Raises a ValueError if
+    there is none, e.g. if the page is not the wiki page"""
+    table = next(tables, None)
+    if table is None:
+        raise ValueError(f"The page has no {name}")
+    return table
+
 
-    result = parse_speed_table(speed_table, parse_speeds)
+def generate(parsed: dict, speed_parse_func, previous_road_classes: dict = None, workers: int = 1,
+             profile: Profile = None, speeds_by_country_code: dict = None) -> dict:
+    """Generates the result, i.e. the content of legal_default_speeds.json, from the given parsed page
+    as returned by WikiClient.fetch_parsed_page. See parse_speed_table for the other parameters"""
+    # tables are read lazily, row by row, so they need to be parsed in the order they appear on the page
+    tables = read_page_tables(parsed)
+    validation = Validation()
+    with stage(profile, "readHtml"):
+        speed_table = next_table(tables, "speed table")
+    with stage(profile, "parseSpeedTable"):
+        result = parse_speed_table(
+            speed_table, speed_parse_func, previous_road_classes, workers, profile, validation, speeds_by_country_code
+        )
+    with stage(profile, "readHtml"):
+        road_types_table = next_table(tables, "road types table")
+    with stage(profile, "parseRoadTypesTable"):
+        road_types = parse_road_types_table(road_types_table, profile)
     result["meta"] = {
         "source": WIKI_URL + WIKI_PAGE,
-        "revisionId": str(parsed["revid"]),
+        "revisionId": None if parsed["revid"] is None else str(parsed["revid"]),
         "timestamp": datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0).isoformat(),
         "license": "Creative Commons Attribution-ShareAlike 2.0 license",
         "licenseUrl": "https://wiki.openstreetmap.org/wiki/Wiki_content_license",
     }
     result["roadTypesByName"] = road_types
-    result['warnings'] += validate_road_types(road_types)
-    result['warnings'] += validate_road_types_in_speed_table(result['speedLimitsByCountryCode'], road_types)
+    with stage(profile, "validate"):
+        validation.validate_road_types(road_types)
+    result['warnings'] = validation.messages()
+    return result
+
+
+def read_previous_result(file_name: str):
+    try:
+        with open(file_name, "r", encoding="utf8") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Generate a JSON from the " + WIKI_PAGE + " wiki page")
+    arg_parser.add_argument("output_file_name", nargs="?", default="legal_default_speeds.json")
+    arg_parser.add_argument("--parse-cache", metavar="FILE",
+                            help="keep parsed speeds in this file between runs")
+    arg_parser.add_argument("--jobs", type=int, default=1, metavar="N",
+                            help="parse the speeds in the table cells in N processes")
+    arg_parser.add_argument("--incremental", action="store_true",
+                            help="do nothing if the output file is from the current revision of the wiki page, "
+                                 "otherwise only parse the rows that changed since that revision")
+    arg_parser.add_argument("--binary", metavar="FILE",
+                            help="also write the result in the compact binary format of the legal_default_speeds "
+                                 "package to this file")
+    arg_parser.add_argument("--compiled", metavar="FILE",
+                            help="also write the result with all filters parsed, placeholders resolved, the decision "
+                                 "index and the typed speed definitions to this file, for loading it fast with "
+                                 "legal_default_speeds.compiled.load_compiled")
+    arg_parser.add_argument("--sharded", metavar="DIR",
+                            help="also write one file per country, with the road classes of it and its subdivisions "
+                                 "and only the road types they use, and an index.json with the hashes of the files "
+                                 "to this directory, see legal_default_speeds.sharded")
+    arg_parser.add_argument("--index", metavar="FILE",
+                            help="also write the decision index of the legal_default_speeds package to this file")
+    arg_parser.add_argument("--structured", metavar="FILE",
+                            help="also write the speeds as typed speed definitions (speed value and unit, "
+                                 "conditions, lanes) instead of OSM tag strings to this file")
+    arg_parser.add_argument("--wiki-cache", metavar="DIR",
+                            help="keep the fetched revisions of the wiki page in this directory, a revision that is "
+                                 "already there is not downloaded again")
+    arg_parser.add_argument("--revision", metavar="ID", help="use this revision of the wiki page instead of the latest")
+    arg_parser.add_argument("--from-snapshot", metavar="FILE",
+                            help="use this snapshot of the wiki page instead of downloading it, either a file from the "
+                                 "wiki cache or the HTML of the page")
+    arg_parser.add_argument("--profile", metavar="FILE",
+                            help="write timings of the stages, rows per country, parse counts and the slowest cells "
+                                 "to this JSON file")
+    args = arg_parser.parse_args()
+    output_file_name = args.output_file_name
+    profile = Profile() if args.profile else None
+
+    speed_parse_func = ParseCache(parse_speed_definitions)
+    if args.parse_cache:
+        speed_parse_func.load(args.parse_cache)
+
+    # only needed (and requests only imported) if anything is downloaded
+    wiki_client = WikiClient(WIKI_PAGE, args.wiki_cache) if not args.from_snapshot or args.incremental else None
+    parsed = read_snapshot(args.from_snapshot) if args.from_snapshot else None
+    if parsed:
+        # an HTML snapshot has no revision id
+        revision_id = None if parsed["revid"] is None else str(parsed["revid"])
+    else:
+        revision_id = args.revision
+
+    previous_result = read_previous_result(output_file_name) if args.incremental else None
+    previous_road_classes = None
+    if previous_result and previous_result["meta"]["revisionId"] is None:
+        # e.g. generated from an HTML snapshot, so it is unknown which revision its road classes belong to
+        print(f"{output_file_name} has no revision id, parsing all rows", file=sys.stderr)
+    elif previous_result:
+        previous_revision_id = previous_result["meta"]["revisionId"]
+        if not parsed and not revision_id:
+            revision_id = wiki_client.fetch_latest_revision_id()
+        if revision_id is not None and revision_id == previous_revision_id:
+            print(f"{output_file_name} is up to date (revision {previous_revision_id})", file=sys.stderr)
+            sys.exit(0)
+
+        with stage(profile, "download"):
+            previous_parsed = wiki_client.fetch_parsed_page(previous_revision_id)
+        previous_speed_table = next_table(read_page_tables(previous_parsed), "speed table")
+        previous_road_classes = map_speed_table_rows(
+            previous_speed_table, previous_result["speedLimitsByCountryCode"], previous_result["warnings"]
+        )
+
+    if not parsed:
+        with stage(profile, "download"):
+            parsed = wiki_client.fetch_parsed_page(revision_id)
+    # the parsed speeds as typed speed definitions, only if they are written
+    speeds_by_country_code = {} if args.structured or args.compiled else None
+    result = generate(parsed, speed_parse_func, previous_road_classes, args.jobs, profile, speeds_by_country_code)
+
+    with stage(profile, "writeOutput"):
+        with open(output_file_name, "w", encoding='utf8') as file:
+            file.write(json.dumps(result, sort_keys=True, indent=2))
+
+    if args.structured:
+        structured_result = {"speedsByCountryCode": speeds_by_country_code, "meta": result["meta"]}
+        with open(args.structured, "w", encoding="utf8") as file:
+            file.write(json.dumps(structured_result, sort_keys=True, indent=2))
+
+    if args.binary:
+        write_binary(result, args.binary)
+
+    if args.compiled:
+        write_compiled(result, args.compiled, speeds_by_country_code)
+
+    if args.sharded:
+        write_sharded(result, args.sharded)
+
+    if args.index:
+        save_index(LegalDefaultSpeeds(result["roadTypesByName"], result["speedLimitsByCountryCode"]), args.index)
+
+    if args.parse_cache:
+        speed_parse_func.save(args.parse_cache)
+    if args.parse_cache or args.profile:
+        print("Parse cache: {hits} hits, {misses} misses, {evictions} evictions".format(**speed_parse_func.stats()),
+              file=sys.stderr)
 
-    with open(output_file_name, "w", encoding='utf8') as file:
-        file.write(json.dumps(result, sort_keys=True, indent=2))
+    if args.profile:
+        report = {
+            "meta": {"revisionId": result["meta"]["revisionId"], "timestamp": result["meta"]["timestamp"],
+                     "parserHash": parser_hash(), "jobs": args.jobs},
+            "parseCache": speed_parse_func.stats(),
+            **profile.to_json(),
+        }
+        with open(args.profile, "w", encoding="utf8") as file:
+            file.write(json.dumps(report, sort_keys=True, indent=2))
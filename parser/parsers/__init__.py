@@ -2,3 +2,6 @@ import os
 
 with open(os.path.join(os.path.dirname(__file__), "speed_grammar.ebnf"), "r") as fp:
     SPEED_GRAMMAR = fp.read()
+
+with open(os.path.join(os.path.dirname(__file__), "speed_grammar_lalr.ebnf"), "r") as fp:
+    SPEED_GRAMMAR_LALR = fp.read()
@@ -0,0 +1,78 @@
+import unicodedata
+
+# the same attributes in the same order as pycountry.countries.lookup checks them
+COUNTRY_NAME_ATTRIBUTES = ("alpha_2", "alpha_3", "name", "numeric", "official_name", "common_name")
+
+
+def fold(s: str) -> str:
+    """Case-folds the string and removes diacritics, e.g. "Côte d'Ivoire" -> "cote d'ivoire" """
+    return "".join(c for c in unicodedata.normalize("NFKD", s.casefold()) if not unicodedata.combining(c))
+
+
+class CountryIndex:
+    """Resolves country and subdivision names as used in the speed table, e.g. "Germany" or
+    "United States:California", to ISO 3166 codes.
+
+    Like pycountry.countries.lookup, country names are compared case-insensitively and subdivision
+    names exactly. With loose=True, both are compared case-folded and without diacritics.
+
+    pycountry is only imported and its countries indexed when the first name is looked up, the
+    subdivisions of a country when the first subdivision of that country is looked up. Results are
+    cached by name."""
+
+    def __init__(self, loose: bool = False):
+        self.normalize = fold if loose else None
+        self.country_codes_by_name = None
+        self.subdivision_codes_by_country_code = {}
+        self.codes_by_name = {}
+
+    def get(self, name: str):
+        """Returns the ISO 3166-1 alpha-2 or ISO 3166-2 code for the given name or None if unknown"""
+        if name in self.codes_by_name:
+            return self.codes_by_name[name]
+
+        country_and_subdivision_name = name.split(":")
+        country_code = self.get_country_code(country_and_subdivision_name[0].strip())
+        if country_code and len(country_and_subdivision_name) > 1:
+            code = self.get_subdivision_code(country_code, country_and_subdivision_name[1].strip())
+        else:
+            code = country_code
+
+        self.codes_by_name[name] = code
+        return code
+
+    def get_country_code(self, country_name: str):
+        if self.country_codes_by_name is None:
+            self.country_codes_by_name = self.build_country_index()
+        return self.country_codes_by_name.get(self.country_key(country_name))
+
+    def get_subdivision_code(self, country_code: str, subdivision_name: str):
+        if country_code not in self.subdivision_codes_by_country_code:
+            self.subdivision_codes_by_country_code[country_code] = self.build_subdivision_index(country_code)
+        return self.subdivision_codes_by_country_code[country_code].get(self.subdivision_key(subdivision_name))
+
+    def country_key(self, country_name: str) -> str:
+        return self.normalize(country_name) if self.normalize else country_name.lower()
+
+    def subdivision_key(self, subdivision_name: str) -> str:
+        return self.normalize(subdivision_name) if self.normalize else subdivision_name
+
+    def build_country_index(self) -> dict:
+        import pycountry
+
+        result = {}
+        for attribute in COUNTRY_NAME_ATTRIBUTES:
+            for country in pycountry.countries:
+                value = getattr(country, attribute, None)
+                if value is not None:
+                    result.setdefault(self.country_key(value), country.alpha_2)
+        return result
+
+    def build_subdivision_index(self, country_code: str) -> dict:
+        import pycountry
+
+        result = {}
+        # in the same order as pycountry returns them, for subdivisions with the same name
+        for subdivision in pycountry.subdivisions.get(country_code=country_code) or []:
+            result.setdefault(self.subdivision_key(subdivision.name), subdivision.code)
+        return result
@@ -0,0 +1,109 @@
+from html.parser import HTMLParser
+from itertools import groupby
+
+
+class Cell:
+    """A td or th table cell. It offers the subset of the interface of bs4's element.Tag that the
+    table parsers and TableRowHelper use."""
+
+    __slots__ = ("name", "attrs", "strings")
+
+    def __init__(self, name: str, attrs: dict):
+        self.name = name
+        self.attrs = attrs
+        self.strings = []
+
+    def get(self, key, default=None):
+        return self.attrs.get(key, default)
+
+    def get_text(self, separator: str = "", strip: bool = False) -> str:
+        if strip:
+            return separator.join(s.strip() for s in self.strings if s.strip())
+        return separator.join(self.strings)
+
+
+class TableReader(HTMLParser):
+    """Event-driven reader that collects the rows of the (top-level) tables in a HTML document as
+    lists of Cells, without building a document tree. Content that doesn't serialize well, i.e.
+    footnotes (sup) and images (img), is dropped right away."""
+
+    def __init__(self):
+        super().__init__()
+        self.rows = []
+        self.table_index = -1
+        self.table_depth = 0
+        self.junk_depth = 0
+        self.row = None
+        self.cell = None
+        # text may be split up into several calls to handle_data when it spans several fed chunks
+        self.data_continues = False
+
+    def handle_starttag(self, tag, attrs):
+        self.data_continues = False
+        if tag == "table":
+            self.table_depth += 1
+            if self.table_depth == 1:
+                self.table_index += 1
+                self.rows.append((self.table_index, None))
+        if self.table_depth != 1:
+            return
+        if tag == "sup":
+            self.junk_depth += 1
+        elif tag == "tr":
+            self._end_row()
+            self.row = []
+        elif tag in {"td", "th"} and self.row is not None:
+            self.cell = Cell(tag, dict(attrs))
+            self.row.append(self.cell)
+
+    def handle_endtag(self, tag):
+        self.data_continues = False
+        if tag == "table":
+            if self.table_depth == 1:
+                self._end_row()
+            self.table_depth = max(self.table_depth - 1, 0)
+        if self.table_depth != 1:
+            return
+        if tag == "sup":
+            self.junk_depth = max(self.junk_depth - 1, 0)
+        elif tag in {"td", "th"}:
+            self.cell = None
+        elif tag == "tr":
+            self._end_row()
+
+    def handle_data(self, data):
+        if self.cell is None or self.junk_depth or self.table_depth != 1:
+            return
+        if self.data_continues:
+            self.cell.strings[-1] += data
+        else:
+            self.cell.strings.append(data)
+            self.data_continues = True
+
+    def _end_row(self):
+        if self.row is not None:
+            self.rows.append((self.table_index, self.row))
+        self.row = None
+        self.cell = None
+
+    def pop_rows(self) -> list:
+        rows = self.rows
+        self.rows = []
+        return rows
+
+
+def _read_rows(html: str, chunk_size: int):
+    reader = TableReader()
+    for i in range(0, len(html), chunk_size):
+        reader.feed(html[i:i + chunk_size])
+        yield from reader.pop_rows()
+    reader.close()
+    yield from reader.pop_rows()
+
+
+def read_tables(html: str, chunk_size: int = 65536):
+    """Lazily yields the tables in the given HTML, each as an iterator over its rows, each row being a
+    list of Cells. The HTML is read only as far as the rows consumed so far require, so the tables
+    must be consumed in order."""
+    for _, rows in groupby(_read_rows(html, chunk_size), key=lambda table_index_and_row: table_index_and_row[0]):
+        yield (row for _, row in rows if row is not None)
@@ -1,89 +1,116 @@
-from parsers.parse_utils import parser, ParseError
+from parsers.parse_utils import get_parser, ParseError
+from parsers.speed_model import (
+    AccessProhibited, DateInterval, LaneSpeedLimits, LengthCondition, MinCountCondition, NamedCondition, Speed,
+    SpeedLimit, Span, Time, TimeCondition, WeightCondition, osm_tags
+)
 
 
-def osm_speed_visitor(t):
-    """Visitor function that outputs speeds in OSM tag syntax"""
+def speed_model_visitor(t):
+    """Visitor function that converts a parse tree into the typed model of parsers.speed_model"""
     if t.data == "access_prohibited":
-        return {"access": "no"}
-    
+        return AccessProhibited()
+
     if t.data in {"normal_speed", "advisory_speed", "min_speed"}:
         if t.data == "normal_speed":
-            tag = "maxspeed"
+            key = "maxspeed"
         elif t.data == "advisory_speed":
-            tag = "maxspeed:advisory"
+            key = "maxspeed:advisory"
         elif t.data == "min_speed":
-            tag = "minspeed"
-
-        speed = osm_speed_visitor(t.children[0])
-        conditions = " AND ".join([osm_speed_visitor(child) for child in t.children[1:]])
-        if conditions:
-            tag += ":conditional"
-            speed = f"{speed} @ ({conditions})"
+            key = "minspeed"
 
-        return {tag: speed}
+        speed = speed_model_visitor(t.children[0])
+        conditions = tuple(speed_model_visitor(child) for child in t.children[1:])
+        return SpeedLimit(key, speed, conditions)
 
     # speed
     elif t.data == "mph_speed":
-        return f"{t.children[0]} mph"
+        return Speed(int(t.children[0]), "mph")
     elif t.data == "kph_speed":
-        return f"{t.children[0]}"
+        return Speed(int(t.children[0]), "km/h")
     elif t.data == "walk_speed":
-        return "walk"
+        return Speed(None, "walk")
 
     # multilane speed
     elif t.data == "multilane_speed":
-        return {
-            "maxspeed:lanes": "|".join(list(osm_speed_visitor(child).values())[0] for child in t.children)
-        }
+        return LaneSpeedLimits(tuple(speed_model_visitor(child) for child in t.children))
 
     # restrictions
     elif t.data == "weight_restriction":
-        return osm_speed_visitor(t.children[0])
+        return speed_model_visitor(t.children[0])
     elif t.data == "weight_rating":
-        return f"weightrating>{t.children[0]}{osm_weight_unit(t.children[1])}"
+        return WeightCondition("weightrating", weight_value(t.children[0]), str(t.children[1]), str(t.children[0]))
     elif t.data == "qualified_weight_pre":
-        return f"{osm_weight_qualifier(t.children[0])}>{t.children[1]}{osm_weight_unit(t.children[2])}"
+        return WeightCondition(
+            osm_weight_qualifier(t.children[0]), weight_value(t.children[1]), str(t.children[2]), str(t.children[1])
+        )
     elif t.data == "qualified_weight_post":
-        return f"{osm_weight_qualifier(t.children[2])}>{t.children[0]}{osm_weight_unit(t.children[1])}"
+        return WeightCondition(
+            osm_weight_qualifier(t.children[2]), weight_value(t.children[0]), str(t.children[1]), str(t.children[0])
+        )
     elif t.data == "length_restriction":
-        return f"length>{t.children[0]}{osm_length_unit(t.children[1])}"
+        return LengthCondition(int(t.children[0]), str(t.children[1]))
     elif t.data == "seat_restriction":
-        return f"seats>={t.children[0]}"
+        return MinCountCondition("seats", int(t.children[0]))
     elif t.data == "axle_restriction":
-        return f"axles>={t.children[0]}"
+        return MinCountCondition("axles", int(t.children[0]))
     elif t.data == "trailers_restriction":
-        return f"trailers>={t.children[0]}"
+        return MinCountCondition("trailers", int(t.children[0]))
     elif t.data == "wheel_restriction":
-        return f"wheels>={t.children[0]}"
-    elif t.data in {"restriction_conditional", "time_time", "time_event"}:
-        return t.children[0]
-    elif t.data == "date_interval":
-        return " ".join([osm_speed_visitor(child) for child in filter(None, t.children)])
+        return MinCountCondition("wheels", int(t.children[0]))
+    elif t.data == "restriction_conditional":
+        return NamedCondition(str(t.children[0]))
     elif t.data == "date_intervals":
-        return "; ".join([osm_speed_visitor(child) for child in filter(None, t.children)])
-    elif t.data == "off":
-        return f"off"
+        return TimeCondition(tuple(speed_model_visitor(child) for child in flatten(t, "date_intervals")))
+    elif t.data == "date_interval":
+        months, weekdays, times, off = None, (), None, False
+        for child in filter(None, t.children):
+            if child.data == "month_span":
+                months = speed_model_visitor(child)
+            elif child.data in {"weekday", "weekday_span"}:
+                weekdays = (speed_model_visitor(child),)
+            elif child.data == "weekday_list":
+                weekdays = tuple(speed_model_visitor(weekday) for weekday in flatten(child, "weekday_list"))
+            elif child.data == "time_span":
+                times = speed_model_visitor(child)
+            elif child.data == "off":
+                off = True
+            else:
+                raise ParseError(f'Unexpected token "{child}"')
+        return DateInterval(months, weekdays, times, off)
     elif t.data == "time_span":
-        return f"{osm_speed_visitor(t.children[0])}-{osm_speed_visitor(t.children[1])}"
-    elif t.data == "event_with_offset":
-        return f"({osm_speed_visitor(t.children[0])})"
-    elif t.data in {"neg_interval", "time_span", "weekday_span", "month_span"}:
-        return f"{t.children[0]}-{t.children[1]}"
+        return Span(speed_model_visitor(t.children[0]), speed_model_visitor(t.children[1]))
+    elif t.data in {"weekday_span", "month_span"}:
+        return Span(str(t.children[0]), str(t.children[1]))
     elif t.data == "weekday":
-        return f"{t.children[0]}"
-    elif t.data == "weekday_list":
-        return ",".join([osm_speed_visitor(child) for child in filter(None, t.children)])
+        return str(t.children[0])
+    elif t.data == "time_time":
+        return Time(str(t.children[0]), None, None)
+    elif t.data == "time_event":
+        return Time(None, str(t.children[0]), None)
+    elif t.data == "event_with_offset":
+        return speed_model_visitor(t.children[0])
+    elif t.data == "neg_interval":
+        return Time(None, str(t.children[0]), f"-{t.children[1]}")
     elif t.data == "pos_interval":
-        return f"{t.children[0]}+{t.children[1]}"
+        return Time(None, str(t.children[0]), f"+{t.children[1]}")
 
     else:
         raise ParseError(f'Unexpected token "{t}"')
 
-def osm_weight_unit(weight_unit):
-    return "" if weight_unit == "t" else " " + weight_unit
 
-def osm_length_unit(length_unit):
-    return "" if length_unit == "m" else " " + length_unit
+def flatten(t, data):
+    """The children of t, with those that are lists of the same kind (the Earley grammar nests them)
+    replaced by their children"""
+    for child in filter(None, t.children):
+        if child.data == data:
+            yield from flatten(child, data)
+        else:
+            yield child
+
+
+def weight_value(token):
+    return float(token) if "." in token else int(token)
+
 
 def osm_weight_qualifier(qualifier_type):
     if qualifier_type == "empty":
@@ -97,16 +124,22 @@ def osm_weight_qualifier(qualifier_type):
     else:
         raise ParseError(f'Unexpected qualifier "{qualifier_type}"')
 
+
 def parse_speeds(s) -> dict:
     """Parses a speed definition string into a dictionary of OSM tags"""
-    parse_tree = parser.parse(s)
+    return osm_speed_tags(get_parser().parse(s))
+
+
+def parse_speed_definitions(s) -> list:
+    """Parses a speed definition string into a list of speed definitions of the typed model"""
+    return speed_definitions(get_parser().parse(s))
+
+
+def speed_definitions(parse_tree) -> list:
+    """Converts the speeds of a speed definition parse tree into the typed model"""
+    return [speed_model_visitor(speed_def) for speed_def in parse_tree.children]
 
-    result = {}
-    for speed in (osm_speed_visitor(speed_def) for speed_def in parse_tree.children):
-        for k, v in speed.items():
-            if k in result:
-                result[k] += f"; {v}"
-            else:
-                result[k] = v
 
-    return result
+def osm_speed_tags(parse_tree) -> dict:
+    """Merges the speeds of a speed definition parse tree into a dictionary of OSM tags"""
+    return osm_tags(speed_definitions(parse_tree))
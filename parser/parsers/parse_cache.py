@@ -0,0 +1,90 @@
+import copy
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+from parsers import SPEED_GRAMMAR_LALR
+from parsers.speed_model import from_json
+from parsers.speed_model import to_json
+
+
+def parser_hash() -> str:
+    """Hash over everything that determines the result of parsing a speed definition string, i.e.
+    the grammar and the code that turns the parse tree into OSM tags"""
+    h = hashlib.sha256(SPEED_GRAMMAR_LALR.encode("utf8"))
+    for file_name in ("osm_restrictions.py", "speed_model.py"):
+        with open(os.path.join(os.path.dirname(__file__), file_name), "rb") as fp:
+            h.update(fp.read())
+    return h.hexdigest()
+
+
+def normalize_speeds(s: str) -> str:
+    """Normalizes a speed definition string so that strings that only differ in whitespace, which
+    is ignored by the grammar, share one cache entry"""
+    return " ".join(s.split())
+
+
+class ParseCache:
+    """A bounded LRU cache around a speed parse function, e.g. parse_speed_definitions or parse_speeds.
+
+    Many cells in the speed table are identical ("50", "80 (trailer)", ...), so each distinct
+    string only needs to be parsed once. Strings that cannot be parsed are not cached.
+    """
+
+    def __init__(self, parse_func, max_size: int = 4096):
+        self.parse_func = parse_func
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __call__(self, s: str):
+        result = self.get(s)
+        if result is None:
+            result = self.parse_func(normalize_speeds(s))
+            self.put(s, result)
+        return result
+
+    def get(self, s: str):
+        """Returns the cached result for s, or None if it is not cached. Counted as a hit or a miss"""
+        key = normalize_speeds(s)
+        if key not in self.entries:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        # callers may modify the result, so never hand out the cached dict or list itself
+        return copy.copy(self.entries[key])
+
+    def put(self, s: str, value):
+        """Caches the result of parsing s, e.g. if it was parsed elsewhere"""
+        self._put(normalize_speeds(s), copy.copy(value))
+
+    def _put(self, key: str, value):
+        self.entries[key] = value
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "size": len(self.entries)}
+
+    def load(self, file_name: str):
+        """Loads entries saved with save(). Does nothing if the file does not exist or if it was
+        written by a different version of the grammar."""
+        try:
+            with open(file_name, "r", encoding="utf8") as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return
+        if data.get("parserHash") != parser_hash():
+            return
+        for key, value in data["entries"].items():
+            self._put(key, from_json(value))
+
+    def save(self, file_name: str):
+        with open(file_name, "w", encoding="utf8") as file:
+            entries = {key: to_json(value) for key, value in self.entries.items()}
+            file.write(json.dumps({"parserHash": parser_hash(), "entries": entries}))
@@ -1,12 +1,38 @@
-from re import finditer
-from bs4 import element
-from lark import Lark
-
-import pycountry
-
-from parsers import SPEED_GRAMMAR
+import copy
+import math
+from functools import lru_cache
+from functools import partial
+from itertools import chain
+from time import perf_counter
+
+from parsers import SPEED_GRAMMAR_LALR
+from parsers.country_index import CountryIndex
+from parsers.parse_cache import ParseCache
+from parsers.profiling import stage
+from parsers.speed_model import from_json
+from parsers.speed_model import osm_tags
+from parsers.speed_model import to_json
+from parsers.validation import UNKNOWN_COUNTRY
+from parsers.validation import UNKNOWN_ROAD_TYPE
+from parsers.validation import UNPARSABLE_SPEEDS
+from parsers.validation import Validation
+from parsers.validation import ValidationWarning
+from parsers.validation import road_type_warnings
+
+# bs4 and lark are only imported when they are needed, see test_startup.py
+
+
+@lru_cache(maxsize=None)
+def get_parser():
+    """The speed definition parser, created on first use"""
+    try:
+        # Generated at build time, see README.md. Skips loading and analyzing the grammar on startup.
+        from parsers.speed_grammar_standalone import Lark_StandAlone
+        return Lark_StandAlone()
+    except ImportError:
+        from lark import Lark
+        return Lark(SPEED_GRAMMAR_LALR, parser="lalr")
 
-parser = Lark(SPEED_GRAMMAR)
 
 class ParseError(Exception):
     pass
@@ -22,7 +48,7 @@ class TableRowHelper:
     def __init__(self):
         self.td_cache = {}
 
-    def set_tds(self, tds: [element.Tag]):
+    def set_tds(self, tds: list):
         # Nuke any existing cache entries that "expire" this round (rowspan)
         for k in list(self.td_cache.keys()):
             (remaining, value) = self.td_cache[k]
@@ -43,26 +69,41 @@ class TableRowHelper:
                 self.td_cache[col_idx] = (rowspan, td)
                 col_idx += 1
 
-    def get_td(self, idx) -> element.Tag:
+    def get_td(self, idx):
         return self.td_cache[idx][1]
 
 
-def is_uninteresting(tag: element.Tag):
+def is_uninteresting(tag):
     return tag.name in {"sup", "img"}
 
 
-def parse_road_types_table(table) -> dict:
+def table_rows(table, profile=None):
+    """Iterates over the cells (td and th) of each row of the given table, which is either a bs4 table
+    or already an iterable of rows as yielded by html_tables.read_tables"""
+    # duck-typed rather than an isinstance check, so that bs4 is not imported if it is not used anyway
+    if not hasattr(table, "find_all"):
+        rows = table
+    else:
+        # Remove links (footnotes etc), images, etc. that don't serialize well.
+        with stage(profile, "removeJunkTags"):
+            for junk_tag in table.find_all(is_uninteresting):
+                junk_tag.decompose()
+
+        rows = (row.find_all(["td", "th"]) for row in table.find_all("tr"))
+
+    return profile.timed_iter(rows, "readHtml") if profile else rows
+
+
+def parse_road_types_table(table, profile=None) -> dict:
+    """Parses the road types table. profile is an optional parsers.profiling.Profile"""
     result = {}
     table_row_helper = TableRowHelper()
+    set_tds = profile.timed(table_row_helper.set_tds, "setTds") if profile else table_row_helper.set_tds
 
-    # Remove links (footnotes etc), images, etc. that don't serialize well.
-    for junk_tag in table.find_all(is_uninteresting):
-        junk_tag.decompose()
-
-    for row in table.find_all("tr"):
+    for row in table_rows(table, profile):
         # Loop through columns
-        tds = row.find_all("td")
-        table_row_helper.set_tds(tds)
+        tds = [cell for cell in row if cell.name == "td"]
+        set_tds(tds)
         if tds:
             road_type = table_row_helper.get_td(0).get_text(strip=True)
             tags_filter = table_row_helper.get_td(1).get_text(" ", strip=True)
@@ -77,19 +118,16 @@ def parse_road_types_table(table) -> dict:
     return result
 
 
-def parse_speed_table(table, speed_parse_func) -> dict:
+def speed_table_rows(table, profile=None):
+    """Yields each row of the speed table as a tuple of country name, road type and a list of
+    (vehicle type, speeds) for the non-empty speed cells, with rowspan and colspan resolved"""
     column_names = []
-    result = {}
-    warnings = []
     table_row_helper = TableRowHelper()
+    set_tds = profile.timed(table_row_helper.set_tds, "setTds") if profile else table_row_helper.set_tds
 
-    # Remove links (footnotes etc), images, etc. that don't serialize well.
-    for junk_tag in table.find_all(is_uninteresting):
-        junk_tag.decompose()
-
-    for row in table.find_all("tr"):
+    for row in table_rows(table, profile):
         # Handle column names
-        th_tags = row.find_all("th")
+        th_tags = [cell for cell in row if cell.name == "th"]
         if len(th_tags) > 0:
             if len(column_names) == 0:
                 for th in th_tags:
@@ -104,69 +142,236 @@ def parse_speed_table(table, speed_parse_func) -> dict:
                             column_names[i + j] = th_text
 
         # Loop through columns
-        tds = row.find_all("td")
-        table_row_helper.set_tds(tds)
+        tds = [cell for cell in row if cell.name == "td"]
+        set_tds(tds)
         if tds:
             country = table_row_helper.get_td(0).get_text(strip=True)
-            country_code = get_country_code(country)
-            if not country_code:
-                warnings.append(f'{country}: Unknown country / subdivision')
-                continue
-            
             road_type = table_row_helper.get_td(1).get_text(strip=True)
+            speeds = []
+            for col_idx in range(2, len(column_names)):
+                td_speeds = table_row_helper.get_td(col_idx).get_text(strip=True)
+                if td_speeds:
+                    speeds.append((column_names[col_idx], td_speeds))
+
+            yield country, road_type, speeds
+
 
+def speed_table_row_key(country: str, road_type: str, speeds: list) -> tuple:
+    return country, road_type, tuple(speeds)
+
+
+def parse_speed_table(table, speed_parse_func, previous_road_classes: dict = None, workers: int = 1,
+                      profile=None, validation: Validation = None, speeds_by_country_code: dict = None) -> dict:
+    """Parses the speed table. speed_parse_func parses a speed definition string either into a list of
+    speed definitions of parsers.speed_model, e.g. parse_speed_definitions, from which the OSM tags are
+    rendered, or directly into a dict of OSM tags, e.g. parse_speeds. The structured output (see below)
+    needs the former, a TypeError is raised otherwise.
+
+    previous_road_classes, as returned by map_speed_table_rows, may contain already parsed road
+    classes for rows that did not change, these are not parsed again.
+
+    With more than one worker, the speeds in the cells are parsed in that many processes first, each
+    distinct string once. speed_parse_func is then called in the worker processes, so it must be
+    picklable. If it is a ParseCache, the strings it has cached are not sent to the workers, and what
+    the workers parsed is put into it. The result is the same as when parsing sequentially.
+
+    profile is an optional parsers.profiling.Profile. With more than one worker, the parsing in the
+    worker processes is recorded as one stage, but each string parsed in them is counted with the time
+    it took there.
+
+    validation is an optional parsers.validation.Validation that collects the warnings and the road
+    types of the rows, to validate the road types table against later.
+
+    If a dict speeds_by_country_code is given, the parsed speeds are also put into it as JSON, see
+    parsers.speed_model.to_json. Per country code, the road classes in the same order as in the result,
+    each with its name and the speed definitions per vehicle type. Cells that cannot be parsed are left
+    out. The rows in previous_road_classes are then parsed, too, but their road classes are reused."""
+    result = {}
+    if validation is None:
+        validation = Validation()
+    structured = speeds_by_country_code is not None
+
+    rows = speed_table_rows(table, profile)
+    country_code_func = get_country_code
+    if profile:
+        rows = profile.timed_iter(rows, "readRows")
+        country_code_func = profile.timed(get_country_code, "countryCodes")
+        if workers == 1:
+            speed_parse_func = profile.timed_speed_parse_func(speed_parse_func)
+
+    if workers > 1:
+        rows = list(rows)
+        speeds_to_parse = dict.fromkeys(
+            td_speeds
+            for country, road_type, speeds in rows
+            if structured or not previous_road_classes
+            or speed_table_row_key(country, road_type, speeds) not in previous_road_classes
+            for _, td_speeds in speeds
+        )
+        parsed_speeds_by_text = {}
+        worker_speed_parse_func = speed_parse_func
+        if isinstance(speed_parse_func, ParseCache):
+            for td_speeds in speeds_to_parse:
+                parsed_speeds = speed_parse_func.get(td_speeds)
+                if parsed_speeds is not None:
+                    parsed_speeds_by_text[td_speeds] = parsed_speeds
+            worker_speed_parse_func = speed_parse_func.parse_func
+        with stage(profile, "parseSpeedsInParallel"):
+            newly_parsed_speeds_by_text = parse_speeds_in_parallel(
+                [td_speeds for td_speeds in speeds_to_parse if td_speeds not in parsed_speeds_by_text],
+                worker_speed_parse_func, workers, profile
+            )
+        if isinstance(speed_parse_func, ParseCache):
+            for td_speeds, parsed_speeds in newly_parsed_speeds_by_text.items():
+                if parsed_speeds is not None:
+                    speed_parse_func.put(td_speeds, parsed_speeds)
+        parsed_speeds_by_text.update(newly_parsed_speeds_by_text)
+        speed_parse_func = partial(get_parsed_speeds, parsed_speeds_by_text)
+
+    for country, road_type, speeds in rows:
+        country_code = country_code_func(country)
+        if not country_code:
+            validation.add(UNKNOWN_COUNTRY, country)
+            continue
+        if profile:
+            profile.add_row(country_code)
+        validation.add_row(country_code, road_type)
+
+        if country_code not in result:
+            result[country_code] = []
+
+        row_key = speed_table_row_key(country, road_type, speeds)
+        previous_road_class = previous_road_classes.get(row_key) if previous_road_classes else None
+
+        # (vehicle type, speed definitions), a vehicle type may appear more than once if its header spans columns
+        parsed_speeds = []
+        if previous_road_class is None or structured:
+            for vehicle_type, td_speeds in speeds:
+                try:
+                    speed_definitions = speed_parse_func(td_speeds)
+                except Exception:
+                    if previous_road_class is None:
+                        validation.add(UNPARSABLE_SPEEDS, country, road_type, vehicle_type)
+                    continue
+                if structured and isinstance(speed_definitions, dict):
+                    raise TypeError("The structured output needs a speed_parse_func that returns speed definitions")
+                parsed_speeds.append((vehicle_type, speed_definitions))
+
+        if previous_road_class is not None:
+            result[country_code].append(copy.deepcopy(previous_road_class))
+        else:
             road_tags = {}
-            for col_idx in range(2, len(column_names)):
-                td = table_row_helper.get_td(col_idx)
-                speeds = td.get_text(strip=True)
-
-                if speeds:
-                    vehicle_type = column_names[col_idx]
-                    try:
-                        parsed_speeds = speed_parse_func(speeds)
-                    except Exception:
-                        parsed_speeds = {}
-                        warnings.append(f'{country_and_subdivision_name}: Unable to parse \'{vehicle_type}\' for \'{road_type}\'')
-
-                    for key, value in parsed_speeds.items():
-                        if vehicle_type != "(default)":
-                            key = key.replace("maxspeed", "maxspeed:" + vehicle_type, 1)
-                            key = key.replace("access", vehicle_type)
-                        road_tags[key] = value
-
-            if country_code not in result:
-                result[country_code] = []
-
-            road_class = { 'tags': road_tags }
+            for vehicle_type, speed_definitions in parsed_speeds:
+                tags = speed_definitions if isinstance(speed_definitions, dict) else osm_tags(speed_definitions)
+                for key, value in tags.items():
+                    if vehicle_type != "(default)":
+                        key = key.replace("maxspeed", "maxspeed:" + vehicle_type, 1)
+                        key = key.replace("access", vehicle_type)
+                    road_tags[key] = value
+
+            road_class = {'tags': road_tags}
             if road_type:
                 road_class['name'] = road_type
-                
             result[country_code].append(road_class)
 
-    return {'speedLimitsByCountryCode': result, 'warnings': warnings}
-    
+        if structured:
+            structured_road_class = {
+                'speedsByVehicleType': {
+                    vehicle_type: to_json(speed_definitions)
+                    for vehicle_type, speed_definitions in parsed_speeds
+                }
+            }
+            if road_type:
+                structured_road_class['name'] = road_type
+            speeds_by_country_code.setdefault(country_code, []).append(structured_road_class)
+
+    return {'speedLimitsByCountryCode': result, 'warnings': validation.messages()}
 
-def get_country_code(name):
+
+def parse_speeds_in_parallel(speeds_list: list, speed_parse_func, workers: int, profile=None) -> dict:
+    """Parses the given speed strings in a pool of worker processes. Returns a dict of speed string to
+    the parsed speeds, or to None if it could not be parsed. profile is an optional
+    parsers.profiling.Profile, to which each parsed string is added"""
+    from concurrent.futures import ProcessPoolExecutor
+
+    if not speeds_list:
+        return {}
+    # a few batches per worker so that the work is evenly distributed but not every string is sent on its own
+    batch_size = math.ceil(len(speeds_list) / (workers * 4))
+    batches = [speeds_list[i:i + batch_size] for i in range(0, len(speeds_list), batch_size)]
+    with ProcessPoolExecutor(workers, initializer=init_speed_parse_worker, initargs=(speed_parse_func,)) as executor:
+        parsed = list(chain.from_iterable(executor.map(parse_speeds_batch, batches)))
+    result = {}
+    for speeds, (parsed_speeds, seconds) in zip(speeds_list, parsed):
+        if profile:
+            profile.add_parse(speeds, seconds)
+            if parsed_speeds is None:
+                profile.parse_failure_count += 1
+        result[speeds] = from_json(parsed_speeds) if parsed_speeds is not None else None
+    return result
+
+
+worker_speed_parse_func = None
+
+
+def init_speed_parse_worker(speed_parse_func):
+    global worker_speed_parse_func
+    worker_speed_parse_func = speed_parse_func
+
+
+def parse_speeds_batch(speeds_list: list) -> list:
+    """Returns (parsed speeds, seconds) for each of the given strings, the parsed speeds as JSON because
+    the frozen dataclasses of the model cannot be unpickled, or None if the string could not be parsed"""
+    result = []
+    for speeds in speeds_list:
+        start_time = perf_counter()
+        try:
+            parsed_speeds = to_json(worker_speed_parse_func(speeds))
+        except Exception:
+            parsed_speeds = None
+        result.append((parsed_speeds, perf_counter() - start_time))
+    return result
+
+
+def get_parsed_speeds(parsed_speeds_by_text: dict, speeds: str) -> list:
+    parsed_speeds = parsed_speeds_by_text[speeds]
+    if parsed_speeds is None:
+        raise ParseError(f'Unable to parse "{speeds}"')
+    return copy.copy(parsed_speeds)
+
+
+def map_speed_table_rows(table, speeds_by_country_code: dict, warnings: list) -> dict:
+    """Maps the rows of a previous revision of the speed table to the road classes that were parsed
+    from it, i.e. the speedLimitsByCountryCode and warnings of the previous output.
+
+    Rows with parse warnings are left out, so they are parsed (and warned about) again."""
+    result = {}
+    road_class_index_by_country_code = {}
+    warnings = set(warnings)
+    for country, road_type, speeds in speed_table_rows(table):
+        country_code = get_country_code(country)
+        if not country_code:
+            continue
+        index = road_class_index_by_country_code.get(country_code, 0)
+        road_class_index_by_country_code[country_code] = index + 1
+
+        road_classes = speeds_by_country_code.get(country_code, [])
+        if index >= len(road_classes):
+            continue
+        if any(ValidationWarning(UNPARSABLE_SPEEDS, country, road_type, vehicle_type).message() in warnings
+               for vehicle_type, _ in speeds):
+            continue
+        result[speed_table_row_key(country, road_type, speeds)] = road_classes[index]
+
+    return result
+
+
+def get_country_code(name, loose: bool = False):
+    """Returns the ISO 3166-1 alpha-2 or ISO 3166-2 code for the given country or subdivision name
+    from the speed table. With loose=True, names are matched case-insensitively and without diacritics"""
     if name in country_codes:
         return country_codes[name]
-
-    country_and_subdivision_name = name.split(":")
-    country_name = country_and_subdivision_name[0].strip()
-    try:
-        country_code = pycountry.countries.lookup(country_name).alpha_2
-        
-        if len(country_and_subdivision_name) > 1:
-            subdivision_name = country_and_subdivision_name[1].strip()
-            subdivisions = pycountry.subdivisions.get(country_code=country_code)
-            for subdivision in subdivisions:
-                if subdivision.name == subdivision_name:
-                    return subdivision.code
-            return
-        else:
-            return country_code
-        
-    except Exception:
-        return
+    return country_indices[loose].get(name)
 
 country_codes = {
     "Brunei": "BN",
@@ -190,27 +395,20 @@ country_codes = {
     "United Kingdom:Scotland": "GB-SCT"
 }
 
+country_indices = {False: CountryIndex(), True: CountryIndex(loose=True)}
+
 
 def validate_road_types(road_types: dict):
-    warnings = []
-    for road_type, filters in road_types.items():
-        all_filters = []
-        if "filter" in filters: all_filters.append(filters["filter"])
-        if "fuzzyFilter" in filters: all_filters.append(filters["fuzzyFilter"])
-        if "relationFilter" in filters: all_filters.append(filters["relationFilter"])
-        for f in all_filters:
-            for match in finditer("{.*?}", f):
-                placeholder = match.group(0)[1:-1]
-                if placeholder not in road_types:
-                    warnings.append(f'{road_type}: Unable to map \'{placeholder}\'')
-    return warnings
+    """Returns warnings for filters that cannot be parsed, placeholders that refer to no road type and
+    circular placeholders, see parsers.validation"""
+    return [warning.message() for warning in road_type_warnings(road_types)]
 
 def validate_road_types_in_speed_table(speeds_by_country_code: dict, road_types: dict):
-    warnings = []
-    for country_code in speeds_by_country_code:
-        for road_class in speeds_by_country_code[country_code]:
-            if "name" in road_class:
-                road_type = road_class["name"]
-                if road_type not in road_types:
-                    warnings.append(f'{country_code}: Unable to map \'{road_type}\'')
-    return warnings
+    """Returns warnings for the road classes whose road type is not defined. When parsing the speed
+    table, use a parsers.validation.Validation instead, which does not need to go through it again"""
+    return [
+        ValidationWarning(UNKNOWN_ROAD_TYPE, country_code, road_class["name"]).message()
+        for country_code, road_classes in speeds_by_country_code.items()
+        for road_class in road_classes
+        if "name" in road_class and road_class["name"] not in road_types
+    ]
@@ -0,0 +1,113 @@
+import heapq
+from collections import Counter
+from collections import defaultdict
+from contextlib import contextmanager
+from contextlib import nullcontext
+from time import perf_counter
+
+
+class Profile:
+    """Instrumentation of the parsing pipeline, passed to parse_speed_table, parse_road_types_table etc.
+
+    Records the time spent in each stage, the number of rows per country code, how many speed
+    definition strings were parsed (and failed) and the slowest ones. Stages may be nested, the time
+    of a stage does not include the time of the stages within it, so the times of all stages add up
+    to the total time."""
+
+    def __init__(self, slowest_cells_count: int = 10):
+        self.seconds_by_stage = defaultdict(float)
+        self.rows_by_country_code = Counter()
+        self.parse_count = 0
+        self.parse_failure_count = 0
+        self.slowest_cells_count = slowest_cells_count
+        # min-heap of (seconds, speeds)
+        self.slowest_cells = []
+        self.stages = []
+        self.last_switch_time = None
+
+    def _switch(self):
+        now = perf_counter()
+        if self.stages:
+            self.seconds_by_stage[self.stages[-1]] += now - self.last_switch_time
+        self.last_switch_time = now
+
+    def enter(self, stage: str):
+        self._switch()
+        self.stages.append(stage)
+
+    def exit(self):
+        self._switch()
+        self.stages.pop()
+
+    @contextmanager
+    def stage(self, stage: str):
+        self.enter(stage)
+        try:
+            yield
+        finally:
+            self.exit()
+
+    def timed(self, func, stage: str):
+        """Returns func, with the time spent in it recorded as the given stage"""
+        def timed_func(*args, **kwargs):
+            with self.stage(stage):
+                return func(*args, **kwargs)
+        return timed_func
+
+    def timed_iter(self, iterable, stage: str):
+        """Yields the items of iterable, with the time spent in getting each one recorded as the given
+        stage, e.g. for lazily read tables"""
+        iterator = iter(iterable)
+        while True:
+            self.enter(stage)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.exit()
+            yield item
+
+    def timed_speed_parse_func(self, speed_parse_func):
+        """Returns speed_parse_func, with the time spent in it recorded as the stage "parseSpeeds" and
+        each call counted"""
+        def timed_speed_parse_func(speeds: str) -> list:
+            self.enter("parseSpeeds")
+            start_time = self.last_switch_time
+            try:
+                return speed_parse_func(speeds)
+            except Exception:
+                self.parse_failure_count += 1
+                raise
+            finally:
+                self.exit()
+                self.add_parse(speeds, self.last_switch_time - start_time)
+        return timed_speed_parse_func
+
+    def add_parse(self, speeds: str, seconds: float):
+        self.parse_count += 1
+        if len(self.slowest_cells) < self.slowest_cells_count:
+            heapq.heappush(self.slowest_cells, (seconds, speeds))
+        elif self.slowest_cells and seconds > self.slowest_cells[0][0]:
+            heapq.heapreplace(self.slowest_cells, (seconds, speeds))
+
+    def add_row(self, country_code: str):
+        self.rows_by_country_code[country_code] += 1
+
+    def to_json(self) -> dict:
+        return {
+            "secondsByStage": {stage: round(seconds, 6) for stage, seconds in self.seconds_by_stage.items()},
+            "totalSeconds": round(sum(self.seconds_by_stage.values()), 6),
+            "rowsByCountryCode": dict(self.rows_by_country_code),
+            "parseCount": self.parse_count,
+            "parseFailureCount": self.parse_failure_count,
+            "slowestCells": [
+                {"speeds": speeds, "seconds": round(seconds, 6)}
+                for seconds, speeds in sorted(self.slowest_cells, reverse=True)
+            ],
+        }
+
+
+def stage(profile, stage: str):
+    """profile.stage(stage), or a context that does nothing if profile is None"""
+    return profile.stage(stage) if profile else nullcontext()
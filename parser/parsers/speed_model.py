@@ -0,0 +1,211 @@
+"""Typed model of parsed speed definitions, e.g. "80, 60 (3.5t)" is
+
+    [SpeedLimit("maxspeed", Speed(80, "km/h"), ()),
+     SpeedLimit("maxspeed", Speed(60, "km/h"), (WeightCondition("weightrating", 3.5, "t", "3.5"),))]
+
+Each class can render itself in OSM tag syntax (osm()) and be converted to JSON and back (to_json,
+from_json). The objects are immutable, sequences in them are tuples, so they can be hashed and shared,
+e.g. by the parse cache."""
+from dataclasses import dataclass, fields
+from typing import Optional, Tuple, Union
+
+
+@dataclass(frozen=True)
+class Speed:
+    __slots__ = ("value", "unit")
+    value: Optional[int]  # None for walk
+    unit: str  # "km/h", "mph" or "walk"
+
+    def osm(self) -> str:
+        if self.unit == "walk":
+            return "walk"
+        if self.unit == "mph":
+            return f"{self.value} mph"
+        return f"{self.value}"
+
+
+@dataclass(frozen=True)
+class WeightCondition:
+    __slots__ = ("qualifier", "value", "unit", "text")
+    qualifier: str  # the OSM key, i.e. "weightrating", "emptyweight", "weightcapacity", "trailerweight" or "weight"
+    value: Union[int, float]
+    unit: str  # "t", "st", "lt" or "lb"
+    text: str  # the value as written, e.g. "3.50", which is kept in the OSM tags
+
+    def osm(self) -> str:
+        unit = "" if self.unit == "t" else " " + self.unit
+        return f"{self.qualifier}>{self.text}{unit}"
+
+
+@dataclass(frozen=True)
+class LengthCondition:
+    __slots__ = ("value", "unit")
+    value: int
+    unit: str  # "m" or "ft"
+
+    def osm(self) -> str:
+        unit = "" if self.unit == "m" else " " + self.unit
+        return f"length>{self.value}{unit}"
+
+
+@dataclass(frozen=True)
+class MinCountCondition:
+    __slots__ = ("key", "value")
+    key: str  # "seats", "axles", "trailers" or "wheels"
+    value: int
+
+    def osm(self) -> str:
+        return f"{self.key}>={self.value}"
+
+
+@dataclass(frozen=True)
+class NamedCondition:
+    __slots__ = ("name",)
+    name: str  # e.g. "trailer", "articulated" or "wet"
+
+    def osm(self) -> str:
+        return self.name
+
+
+@dataclass(frozen=True)
+class Time:
+    __slots__ = ("time", "event", "offset")
+    time: Optional[str]  # e.g. "07:00", if it is not an event
+    event: Optional[str]  # "sunset", "sunrise", "dusk" or "dawn"
+    offset: Optional[str]  # e.g. "+01:00" or "-00:30" after the event
+
+    def osm(self) -> str:
+        if self.event is None:
+            return self.time
+        if self.offset is None:
+            return self.event
+        return f"({self.event}{self.offset})"
+
+
+@dataclass(frozen=True)
+class Span:
+    """A span of months, weekdays or times"""
+    __slots__ = ("start", "end")
+    start: Union[str, Time]
+    end: Union[str, Time]
+
+    def osm(self) -> str:
+        return f"{osm(self.start)}-{osm(self.end)}"
+
+
+@dataclass(frozen=True)
+class DateInterval:
+    __slots__ = ("months", "weekdays", "times", "off")
+    months: Optional[Span]
+    weekdays: Tuple[Union[str, Span], ...]  # each either a weekday (e.g. "Mo") or a span of weekdays
+    times: Optional[Span]
+    off: bool
+
+    def osm(self) -> str:
+        parts = []
+        if self.months is not None:
+            parts.append(self.months.osm())
+        if self.weekdays:
+            parts.append(",".join(osm(weekday) for weekday in self.weekdays))
+        if self.times is not None:
+            parts.append(self.times.osm())
+        if self.off:
+            parts.append("off")
+        return " ".join(parts)
+
+
+@dataclass(frozen=True)
+class TimeCondition:
+    __slots__ = ("intervals",)
+    intervals: Tuple[DateInterval, ...]
+
+    def osm(self) -> str:
+        return "; ".join(interval.osm() for interval in self.intervals)
+
+
+@dataclass(frozen=True)
+class SpeedLimit:
+    __slots__ = ("key", "speed", "conditions")
+    key: str  # "maxspeed", "maxspeed:advisory" or "minspeed"
+    speed: Speed
+    conditions: tuple  # all of which must apply
+
+    def osm_value(self) -> str:
+        if not self.conditions:
+            return self.speed.osm()
+        conditions = " AND ".join(condition.osm() for condition in self.conditions)
+        return f"{self.speed.osm()} @ ({conditions})"
+
+    def osm_tags(self) -> dict:
+        return {self.key + ":conditional" if self.conditions else self.key: self.osm_value()}
+
+
+@dataclass(frozen=True)
+class LaneSpeedLimits:
+    __slots__ = ("lanes",)
+    lanes: Tuple[SpeedLimit, ...]
+
+    def osm_tags(self) -> dict:
+        return {"maxspeed:lanes": "|".join(lane.osm_value() for lane in self.lanes)}
+
+
+@dataclass(frozen=True)
+class AccessProhibited:
+    __slots__ = ()
+
+    def osm_tags(self) -> dict:
+        return {"access": "no"}
+
+
+def osm(value) -> str:
+    return value if isinstance(value, str) else value.osm()
+
+
+def osm_tags(speed_definitions: list) -> dict:
+    """Merges the given speed definitions into a dictionary of OSM tags"""
+    result = {}
+    for speed_definition in speed_definitions:
+        for k, v in speed_definition.osm_tags().items():
+            if k in result:
+                result[k] += f"; {v}"
+            else:
+                result[k] = v
+    return result
+
+
+def to_json(value):
+    """Converts the given model, or lists of it, to JSON compatible values. Each object gets a "type"
+    with its class name"""
+    if isinstance(value, (list, tuple)):
+        return [to_json(v) for v in value]
+    if hasattr(value, "__dataclass_fields__"):
+        result = {"type": type(value).__name__}
+        for field in fields(value):
+            result[field.name] = to_json(getattr(value, field.name))
+        return result
+    return value
+
+
+MODEL_TYPES = {
+    model_type.__name__: model_type
+    for model_type in (
+        Speed, WeightCondition, LengthCondition, MinCountCondition, NamedCondition, Time, Span, DateInterval,
+        TimeCondition, SpeedLimit, LaneSpeedLimits, AccessProhibited,
+    )
+}
+
+
+def from_json(value):
+    """Converts the given JSON as returned by to_json back into the model. Lists within the model
+    become tuples"""
+    if isinstance(value, list):
+        return [from_json(v) for v in value]
+    if isinstance(value, dict) and "type" in value:
+        model_type = MODEL_TYPES[value["type"]]
+        return model_type(*(field_from_json(value[field.name]) for field in fields(model_type)))
+    return value
+
+
+def field_from_json(value):
+    value = from_json(value)
+    return tuple(value) if isinstance(value, list) else value
@@ -0,0 +1,128 @@
+from typing import NamedTuple
+
+from legal_default_speeds.compiled import compile_road_types
+from legal_default_speeds.compiled import placeholder_graph
+from legal_default_speeds.compiled import reachable_road_types
+
+UNKNOWN_COUNTRY = "unknownCountry"
+UNPARSABLE_SPEEDS = "unparsableSpeeds"
+INVALID_FILTER = "invalidFilter"
+UNDEFINED_PLACEHOLDER = "undefinedPlaceholder"
+CIRCULAR_PLACEHOLDERS = "circularPlaceholders"
+UNUSED_ROAD_TYPE = "unusedRoadType"
+UNKNOWN_ROAD_TYPE = "unknownRoadType"
+
+
+class ValidationWarning(NamedTuple):
+    code: str
+    # the country or subdivision as named in the speed table for UNKNOWN_COUNTRY and UNPARSABLE_SPEEDS,
+    # its code for UNKNOWN_ROAD_TYPE, otherwise None
+    country: str = None
+    road_type: str = None
+    # the vehicle type for UNPARSABLE_SPEEDS, the placeholder for UNDEFINED_PLACEHOLDER, the filter and
+    # error for INVALID_FILTER and the road types in the circle for CIRCULAR_PLACEHOLDERS
+    detail: str = None
+
+    def message(self) -> str:
+        """The warning as it is written to legal_default_speeds.json"""
+        if self.code == UNKNOWN_COUNTRY:
+            return f'{self.country}: Unknown country / subdivision'
+        if self.code == UNPARSABLE_SPEEDS:
+            return f'{self.country}: Unable to parse \'{self.detail}\' for \'{self.road_type}\''
+        if self.code == INVALID_FILTER:
+            return f'{self.road_type}: Invalid {self.detail}'
+        if self.code == UNDEFINED_PLACEHOLDER:
+            return f'{self.road_type}: Unable to map \'{self.detail}\''
+        if self.code == CIRCULAR_PLACEHOLDERS:
+            return f'{self.road_type}: Circular placeholders {self.detail}'
+        if self.code == UNUSED_ROAD_TYPE:
+            return f'{self.road_type}: Not used in any country'
+        if self.code == UNKNOWN_ROAD_TYPE:
+            return f'{self.country}: Unable to map \'{self.road_type}\''
+        raise ValueError(f"Unknown warning code {self.code}")
+
+
+def placeholder_circles(graph: dict) -> list:
+    """Returns the circles in the given placeholder graph as lists of road type names, each starting
+    with the road type that comes first in the graph and in that order. Each circle found is returned
+    once"""
+    position_by_name = {name: i for i, name in enumerate(graph)}
+    result = []
+    found = set()
+    done = set()
+    path = []
+    # the position of each road type on the path
+    path_position_by_name = {}
+
+    def visit(name: str):
+        path_position_by_name[name] = len(path)
+        path.append(name)
+        for referred_name in graph[name]:
+            if referred_name in path_position_by_name:
+                circle = path[path_position_by_name[referred_name]:]
+                start = min(range(len(circle)), key=lambda i: position_by_name[circle[i]])
+                circle = circle[start:] + circle[:start]
+                if tuple(circle) not in found:
+                    found.add(tuple(circle))
+                    result.append(circle)
+            elif referred_name in graph and referred_name not in done:
+                visit(referred_name)
+        path.pop()
+        del path_position_by_name[name]
+        done.add(name)
+
+    for name in graph:
+        if name not in done:
+            visit(name)
+    return sorted(result, key=lambda circle: position_by_name[circle[0]])
+
+
+def road_type_warnings(road_types: dict, used_road_types=None) -> list:
+    """Returns the warnings for the given roadTypesByName: filters that cannot be parsed, placeholders
+    that refer to no road type and circular placeholders. If the names of the road types used in the
+    speed table are given, also the road types that are not used, not even via placeholders"""
+    errors = []
+    graph = placeholder_graph(compile_road_types(road_types, errors))
+    warnings = [
+        ValidationWarning(INVALID_FILTER, road_type=road_type, detail=f'{filter_name}: {error}')
+        for road_type, filter_name, error in errors
+    ]
+    for road_type, placeholders in graph.items():
+        for placeholder in placeholders:
+            if placeholder not in road_types:
+                warnings.append(ValidationWarning(UNDEFINED_PLACEHOLDER, road_type=road_type, detail=placeholder))
+    for circle in placeholder_circles(graph):
+        warnings.append(ValidationWarning(
+            CIRCULAR_PLACEHOLDERS, road_type=circle[0], detail=" -> ".join(circle + circle[:1])
+        ))
+    if used_road_types is not None:
+        used = reachable_road_types(graph, used_road_types)
+        warnings += [ValidationWarning(UNUSED_ROAD_TYPE, road_type=name) for name in road_types if name not in used]
+    return warnings
+
+
+class Validation:
+    """Collects the warnings while parsing the speed table, see parse_speed_table, and then checks the
+    road types table against the road types seen in the speed table, so that the speed table is only
+    read once"""
+
+    def __init__(self):
+        self.warnings = []
+        # the road types of the rows in the speed table, as (country code, road type), in order
+        self.road_type_rows = {}
+
+    def add(self, code: str, country: str = None, road_type: str = None, detail: str = None):
+        self.warnings.append(ValidationWarning(code, country, road_type, detail))
+
+    def add_row(self, country_code: str, road_type: str):
+        if road_type:
+            self.road_type_rows[(country_code, road_type)] = None
+
+    def validate_road_types(self, road_types: dict):
+        self.warnings += road_type_warnings(road_types, {road_type for _, road_type in self.road_type_rows})
+        for country_code, road_type in self.road_type_rows:
+            if road_type not in road_types:
+                self.add(UNKNOWN_ROAD_TYPE, country_code, road_type)
+
+    def messages(self) -> list:
+        return [warning.message() for warning in self.warnings]
@@ -0,0 +1,110 @@
+import json
+import os
+
+WIKI_API_URL = "https://wiki.openstreetmap.org/w/api.php"
+
+
+class WikiClient:
+    """Fetches the parsed HTML of revisions of a wiki page via the MediaWiki API.
+
+    All requests go through one session, so the connection is reused, and are retried with
+    exponential backoff on connection errors and server errors. A revision never changes, so with a
+    cache_dir, each fetched revision is saved there and not fetched again."""
+
+    def __init__(self, page: str, cache_dir: str = None, timeout: float = 30, retries: int = 3,
+                 backoff_factor: float = 1, session=None):
+        # requests is only imported when it is needed, i.e. not for runs on snapshots
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        self.page = page
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        retry = Retry(total=retries, backoff_factor=backoff_factor, status_forcelist=(429, 500, 502, 503, 504))
+        self.session.mount("https://", HTTPAdapter(max_retries=retry))
+        self.session.mount("http://", HTTPAdapter(max_retries=retry))
+
+    def get(self, query: dict) -> dict:
+        response = self.session.get(WIKI_API_URL, params=query, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def fetch_latest_revision_id(self) -> str:
+        query = {"action": "query", "prop": "revisions", "titles": self.page, "rvprop": "ids", "format": "json",
+                 "formatversion": "2"}
+        return str(self.get(query)["query"]["pages"][0]["revisions"][0]["revid"])
+
+    def fetch_revision_ids(self, start_id: str = None, end_id: str = None) -> list:
+        """Returns the ids of all revisions of the page from start_id to end_id (both inclusive, both
+        optional), oldest first"""
+        query = {"action": "query", "prop": "revisions", "titles": self.page, "rvprop": "ids", "rvlimit": "max",
+                 "rvdir": "newer", "format": "json", "formatversion": "2"}
+        if start_id:
+            query["rvstartid"] = start_id
+        if end_id:
+            query["rvendid"] = end_id
+        result = []
+        while True:
+            response = self.get(query)
+            result += [str(revision["revid"]) for revision in response["query"]["pages"][0].get("revisions", [])]
+            if "continue" not in response:
+                return result
+            query.update(response["continue"])
+
+    def fetch_parsed_page(self, revision_id: str = None) -> dict:
+        """Returns the "parse" part of the API response for the given or else the latest revision.
+        With a cache, the latest revision id is looked up first, which is a much smaller request than
+        the page itself"""
+        if revision_id is None and self.cache_dir:
+            revision_id = self.fetch_latest_revision_id()
+
+        if revision_id is not None:
+            parsed = self.read_cached(revision_id)
+            if parsed is not None:
+                return parsed
+
+        query = {"action": "parse", "format": "json"}
+        if revision_id is not None:
+            query["oldid"] = revision_id
+        else:
+            query["page"] = self.page
+        parsed = self.get(query)["parse"]
+
+        self.write_cached(parsed)
+        return parsed
+
+    def cache_file_name(self, revision_id) -> str:
+        return os.path.join(self.cache_dir, f"{self.page}-{revision_id}.json")
+
+    def read_cached(self, revision_id):
+        if not self.cache_dir:
+            return None
+        try:
+            return read_snapshot(self.cache_file_name(revision_id))
+        except FileNotFoundError:
+            return None
+
+    def write_cached(self, parsed: dict):
+        if not self.cache_dir:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # written to a temporary file first, so that an interrupted run does not leave a broken file
+        file_name = self.cache_file_name(parsed["revid"])
+        with open(file_name + ".tmp", "w", encoding="utf8") as file:
+            json.dump(parsed, file)
+        os.replace(file_name + ".tmp", file_name)
+
+
+def read_snapshot(file_name: str) -> dict:
+    """Reads a snapshot of a page in the same form as WikiClient.fetch_parsed_page returns it. The file
+    is either such a JSON, e.g. a file in the cache of a WikiClient, or just the HTML of the page, which
+    then has no revision id"""
+    with open(file_name, "r", encoding="utf8") as file:
+        content = file.read()
+    if file_name.endswith(".json"):
+        parsed = json.loads(content)
+        # the whole API response
+        return parsed.get("parse", parsed)
+    return {"text": {"*": content}, "revid": None}
@@ -0,0 +1,155 @@
+"""Regenerates legal_default_speeds.json for many revisions of the wiki page, e.g. to see how the
+legal default speeds changed over time:
+
+    python regenerate.py --revisions 2000000:2400000 --wiki-cache wiki_cache output/
+    python regenerate.py --from-dir wiki_cache --combined revisions.json
+
+Revisions are downloaded into the wiki cache first (if not already there), then parsed in several
+processes. Each process parses the speed definition strings through one ParseCache for all its
+revisions, so a string that appears in many revisions is only parsed once per process."""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from main import WIKI_PAGE
+from main import generate
+from parsers.osm_restrictions import parse_speed_definitions
+from parsers.parse_cache import ParseCache
+from parsers.wiki_client import WikiClient
+from parsers.wiki_client import read_snapshot
+
+
+def revision_id_of(file_name: str):
+    """The revision id in the name of a snapshot file, e.g. "Default_speed_limits-2391456.json" or
+    "2391456.html", or None"""
+    stem = os.path.splitext(os.path.basename(file_name))[0]
+    revision_id = stem.rsplit("-", 1)[-1]
+    return revision_id if revision_id.isdigit() else None
+
+
+def snapshot_files_in_dir(dir_name: str) -> list:
+    """The snapshot files (from a wiki cache or HTML) in the given directory, oldest revision first"""
+    file_names = [
+        os.path.join(dir_name, file_name)
+        for file_name in os.listdir(dir_name)
+        if file_name.endswith((".json", ".html")) and revision_id_of(file_name)
+    ]
+    return sorted(file_names, key=lambda file_name: int(revision_id_of(file_name)))
+
+
+def download_revisions(wiki_client: WikiClient, start_id: str = None, end_id: str = None) -> list:
+    """Downloads the revisions in the given range into the cache of the wiki client, as far as they
+    are not there already. Returns the file names of the snapshots, oldest revision first"""
+    result = []
+    for revision_id in wiki_client.fetch_revision_ids(start_id, end_id):
+        wiki_client.fetch_parsed_page(revision_id)
+        result.append(wiki_client.cache_file_name(revision_id))
+    return result
+
+
+worker_speed_parse_func = None
+
+
+def init_worker(parse_cache_file_name: str = None):
+    global worker_speed_parse_func
+    worker_speed_parse_func = ParseCache(parse_speed_definitions)
+    if parse_cache_file_name:
+        worker_speed_parse_func.load(parse_cache_file_name)
+
+
+def regenerate_revision(file_name: str, output_dir: str = None):
+    """Generates the result for the given snapshot file. Writes it to output_dir if given, otherwise
+    returns it. Returns the revision id and the result (or None). If the result cannot be generated,
+    e.g. because the page had no speed table in that revision, the result is {"error": message}
+    instead and nothing is written, so that the other revisions are still generated"""
+    revision_id = revision_id_of(file_name)
+    try:
+        parsed = read_snapshot(file_name)
+        if parsed["revid"] is None:
+            parsed["revid"] = revision_id
+        revision_id = str(parsed["revid"])
+        result = generate(parsed, worker_speed_parse_func)
+    except Exception as e:
+        return revision_id, {"error": repr(e)}
+    if output_dir is None:
+        return revision_id, result
+    with open(os.path.join(output_dir, f"{revision_id}.json"), "w", encoding="utf8") as file:
+        file.write(json.dumps(result, sort_keys=True, indent=2))
+    return revision_id, None
+
+
+def regenerate(file_names: list, output_dir: str = None, jobs: int = 1, parse_cache_file_name: str = None):
+    """Generates the results for the given snapshot files, in jobs processes. Yields the revision id
+    and the result (None if written to output_dir) of each, in the same order as the files"""
+    if jobs == 1:
+        init_worker(parse_cache_file_name)
+        for file_name in file_names:
+            yield regenerate_revision(file_name, output_dir)
+        return
+
+    # a few chunks per process so that the work is evenly distributed but not every file is sent on its own
+    chunk_size = max(1, len(file_names) // (jobs * 4))
+    with ProcessPoolExecutor(jobs, initializer=init_worker, initargs=(parse_cache_file_name,)) as executor:
+        output_dirs = [output_dir] * len(file_names)
+        yield from executor.map(regenerate_revision, file_names, output_dirs, chunksize=chunk_size)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        description="Generate a JSON for each of many revisions of the " + WIKI_PAGE + " wiki page"
+    )
+    arg_parser.add_argument("output_dir", nargs="?",
+                            help="write the JSON of each revision to <revision id>.json in this directory")
+    source = arg_parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--revisions", metavar="START:END",
+                        help="download and use the revisions from START to END (both inclusive, both optional)")
+    source.add_argument("--from-dir", metavar="DIR",
+                        help="use the snapshots in this directory, i.e. a wiki cache or HTML files named by the "
+                             "revision id")
+    arg_parser.add_argument("--wiki-cache", metavar="DIR", default="wiki_cache",
+                            help="download the revisions into this directory (default: %(default)s)")
+    arg_parser.add_argument("--combined", metavar="FILE",
+                            help="write the JSONs of all revisions into this one file, by revision id")
+    arg_parser.add_argument("--jobs", type=int, default=os.cpu_count(), metavar="N",
+                            help="parse the revisions in N processes (default: number of CPUs)")
+    arg_parser.add_argument("--parse-cache", metavar="FILE",
+                            help="start each process with the parsed speeds in this file (see main.py), it is not "
+                                 "updated")
+    args = arg_parser.parse_args()
+    if not args.output_dir and not args.combined:
+        arg_parser.error("either an output directory or --combined is required")
+    if args.jobs < 1:
+        arg_parser.error("--jobs must be at least 1")
+
+    if args.revisions:
+        start_id, _, end_id = args.revisions.partition(":")
+        snapshot_files = download_revisions(WikiClient(WIKI_PAGE, args.wiki_cache), start_id or None, end_id or None)
+    else:
+        snapshot_files = snapshot_files_in_dir(args.from_dir)
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    start_time = time.perf_counter()
+    results = {}
+    failed_count = 0
+    for revision_id, result in regenerate(snapshot_files, args.output_dir, args.jobs, args.parse_cache):
+        if result is not None and "error" in result:
+            print(f"Revision {revision_id} failed: {result['error']}", file=sys.stderr)
+            failed_count += 1
+        if args.combined:
+            if result is None:
+                with open(os.path.join(args.output_dir, f"{revision_id}.json"), "r", encoding="utf8") as file:
+                    result = json.load(file)
+            results[revision_id] = result
+    duration = time.perf_counter() - start_time
+
+    if args.combined:
+        with open(args.combined, "w", encoding="utf8") as file:
+            file.write(json.dumps(results, sort_keys=True, indent=2))
+
+    print(f"Generated {len(snapshot_files) - failed_count} revisions in {duration:.1f}s, {failed_count} failed",
+          file=sys.stderr)
@@ -0,0 +1,161 @@
+"""Local HTTP server that keeps the speed parser and the country index loaded, so that single speed
+definition strings can be checked without starting Python each time:
+
+    python server.py --port 8080
+
+All requests and responses are JSON. The endpoints take lists, to check many strings at once:
+
+    POST /parse_speeds   {"speeds": ["50", "80 (trailer)", "x"]}
+                         -> {"results": [{"tags": {"maxspeed": "50"}}, ..., {"error": "..."}]}
+    POST /country_codes  {"names": ["Germany", "United States:California", "Atlantis"]}
+                         -> {"results": ["DE", "US-CA", null]}
+    POST /validate       {"html": "<html of the wiki page>"}
+                         -> the same as main.py would output, with the warnings
+    GET  /stats          latency histogram of each endpoint
+
+Each connection is handled in its own thread, but the requests are processed one at a time."""
+import argparse
+import bisect
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+
+from main import generate
+from parsers.osm_restrictions import parse_speed_definitions
+from parsers.osm_restrictions import parse_speeds
+from parsers.parse_cache import ParseCache
+from parsers.parse_utils import get_country_code
+from parsers.speed_model import osm_tags
+
+# upper bounds of the buckets of the latency histograms, in milliseconds
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class LatencyHistogram:
+    def __init__(self, buckets_ms: tuple = LATENCY_BUCKETS_MS):
+        self.buckets_ms = buckets_ms
+        # the last one for all latencies above the last bucket
+        self.counts = [0] * (len(buckets_ms) + 1)
+        self.count = 0
+        self.sum_ms = 0.0
+
+    def add(self, latency_ms: float):
+        self.counts[bisect.bisect_left(self.buckets_ms, latency_ms)] += 1
+        self.count += 1
+        self.sum_ms += latency_ms
+
+    def to_json(self) -> dict:
+        buckets = [{"le": bound, "count": count} for bound, count in zip(self.buckets_ms, self.counts)]
+        buckets.append({"le": None, "count": self.counts[-1]})
+        return {"count": self.count, "sumMs": round(self.sum_ms, 3), "buckets": buckets}
+
+
+class SpeedParserService:
+    """The endpoints, independent of HTTP"""
+
+    def __init__(self, parse_cache_file_name: str = None):
+        self.speed_parse_func = ParseCache(parse_speed_definitions)
+        if parse_cache_file_name:
+            self.speed_parse_func.load(parse_cache_file_name)
+        self.histograms = {}
+        self.lock = threading.Lock()
+        self.handlers = {
+            "/parse_speeds": self.parse_speeds,
+            "/country_codes": self.country_codes,
+            "/validate": self.validate,
+        }
+
+    def warm_up(self):
+        """Builds everything that is otherwise built lazily on the first request"""
+        parse_speeds("50 (Mo-Fr 07:00-17:00)")
+        get_country_code("Germany")
+
+    def parse_speeds(self, request: dict) -> dict:
+        results = []
+        for s in request["speeds"]:
+            try:
+                results.append({"tags": osm_tags(self.speed_parse_func(s))})
+            except Exception as e:
+                results.append({"error": str(e)})
+        return {"results": results}
+
+    def country_codes(self, request: dict) -> dict:
+        return {"results": [get_country_code(name) for name in request["names"]]}
+
+    def validate(self, request: dict) -> dict:
+        return generate({"text": {"*": request["html"]}, "revid": request.get("revisionId")}, self.speed_parse_func)
+
+    def stats(self) -> dict:
+        return {
+            "histograms": {endpoint: histogram.to_json() for endpoint, histogram in self.histograms.items()},
+            "parseCache": self.speed_parse_func.stats(),
+        }
+
+    def handle(self, endpoint: str, request: dict) -> dict:
+        with self.lock:
+            start_time = time.perf_counter()
+            response = self.handlers[endpoint](request)
+            latency_ms = (time.perf_counter() - start_time) * 1000
+            self.histograms.setdefault(endpoint, LatencyHistogram()).add(latency_ms)
+        return response
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    service: SpeedParserService = None
+
+    def do_GET(self):
+        if self.path == "/stats":
+            with self.service.lock:
+                self.send_json(200, self.service.stats())
+        else:
+            self.send_json(404, {"error": f"Unknown endpoint {self.path}"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        if self.path not in self.service.handlers:
+            self.send_json(404, {"error": f"Unknown endpoint {self.path}"})
+            return
+        try:
+            self.send_json(200, self.service.handle(self.path, json.loads(body)))
+        except (ValueError, KeyError, TypeError) as e:
+            self.send_json(400, {"error": f"Invalid request: {e!r}"})
+
+    def send_json(self, status: int, data: dict):
+        body = json.dumps(data).encode("utf8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def create_server(service: SpeedParserService, host: str = "127.0.0.1", port: int = 8080) -> ThreadingHTTPServer:
+    handler = type("BoundRequestHandler", (RequestHandler,), {"service": service})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Serve the speed parser via HTTP on localhost")
+    arg_parser.add_argument("--host", default="127.0.0.1")
+    arg_parser.add_argument("--port", type=int, default=8080)
+    arg_parser.add_argument("--parse-cache", metavar="FILE", help="start with the parsed speeds in this file")
+    args = arg_parser.parse_args()
+
+    service = SpeedParserService(args.parse_cache)
+    service.warm_up()
+    server = create_server(service, args.host, args.port)
+    print(f"Listening on http://{args.host}:{server.server_address[1]}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,134 @@
+import os
+
+import pytest
+
+from legal_default_speeds import Certitude, LegalDefaultSpeeds, load
+
+np = pytest.importorskip("numpy")
+
+from legal_default_speeds.columnar import CERTITUDES, match_columns  # noqa: E402
+
+SPEEDS = LegalDefaultSpeeds(
+    {
+        "urban": {"filter": "lit=yes", "fuzzyFilter": "sidewalk~both|left|right"},
+        "motorway": {"filter": "highway~motorway|motorway_link or motorroad=yes"},
+        "urban motorway": {"filter": "{motorway} and {urban}"},
+        "narrow road": {"filter": "width<4 and !{urban}"},
+        "service road": {"filter": "highway=service and !service"},
+    },
+    {
+        "XA": [
+            {"tags": {"maxspeed": "100"}},
+            {"name": "motorway", "tags": {"maxspeed": "130"}},
+            {"name": "urban", "tags": {"maxspeed": "50"}},
+            {"name": "urban motorway", "tags": {"maxspeed": "80"}},
+            {"name": "narrow road", "tags": {"maxspeed": "60"}},
+            {"name": "service road", "tags": {"maxspeed": "20"}},
+        ],
+        "XB": [
+            {"name": "motorway", "tags": {"maxspeed": "120"}},
+        ],
+    },
+)
+
+
+def match_one_by_one(speeds, country_codes, columns) -> list:
+    """Returns (road type name, certitude) of each road, via get_speed_limits"""
+    result = []
+    for i, country_code in enumerate(country_codes):
+        tags = {key: values[i] for key, values in columns.items() if values[i] is not None}
+        speed_limits = speeds.get_speed_limits(country_code, tags) if country_code is not None else None
+        result.append((speed_limits.road_type_name, speed_limits.certitude) if speed_limits else None)
+    return result
+
+
+def road_type_names(speeds, country_codes, road_class_indices, certitudes) -> list:
+    result = []
+    for country_code, position, certitude in zip(country_codes, road_class_indices, certitudes):
+        if position < 0:
+            result.append(None)
+        else:
+            road_type = speeds.get_country_road_types(country_code).road_types[position]
+            result.append((road_type.get("name"), CERTITUDES[certitude]))
+    return result
+
+
+def test_match_columns():
+    country_codes = ["XA", "XA", "XA", "XA", "XA", "XA", "XA", "XA-1", "XB", "XB", "YY", None]
+    columns = {
+        "highway": ["motorway", "motorway", None, "residential", "service", "service", None, "motorway_link",
+                    "primary", "primary", "motorway", "motorway"],
+        "lit": [None, "yes", None, None, None, None, None, "yes", None, None, None, None],
+        "sidewalk": [None, None, None, "both", None, None, None, None, None, None, None, None],
+        "width": [None, None, "3.5", None, None, None, None, None, None, None, None, None],
+        "service": [None, None, None, None, None, "driveway", None, None, None, None, None, None],
+        "maxspeed": [None, None, None, None, None, None, "130", None, "120", "50", None, None],
+    }
+    road_class_indices, certitudes = match_columns(SPEEDS, country_codes, columns)
+    assert road_type_names(SPEEDS, country_codes, road_class_indices, certitudes) == [
+        ("motorway", Certitude.EXACT),
+        ("urban motorway", Certitude.EXACT),
+        ("narrow road", Certitude.EXACT),
+        ("urban", Certitude.FUZZY),
+        ("service road", Certitude.EXACT),
+        (None, Certitude.FALLBACK),
+        ("motorway", Certitude.FROM_MAX_SPEED),
+        ("urban motorway", Certitude.EXACT),
+        ("motorway", Certitude.FROM_MAX_SPEED),
+        None,
+        None,
+        None,
+    ]
+    assert road_type_names(SPEEDS, country_codes, road_class_indices, certitudes) == \
+        match_one_by_one(SPEEDS, country_codes, columns)
+
+
+def test_match_columns_without_columns():
+    road_class_indices, certitudes = match_columns(SPEEDS, ["XA", "XB"], {})
+    assert road_class_indices.tolist() == [0, -1]
+    assert certitudes.tolist() == [CERTITUDES.index(Certitude.FALLBACK), 0]
+
+
+def test_match_columns_fails_on_columns_of_different_length():
+    with pytest.raises(ValueError):
+        match_columns(SPEEDS, ["XA", "XB"], {"highway": ["motorway"]})
+
+
+def test_match_columns_gives_same_results_as_get_speed_limits():
+    speeds = load(os.path.join(os.path.dirname(__file__), "..", "demo", "distribution", "legal_default_speeds.json"))
+    tag_values = {
+        "highway": ["motorway", "trunk", "primary", "residential", "service", "living_street", "track"],
+        "lit": ["yes", "no"],
+        "sidewalk": ["both", "no"],
+        "maxspeed": ["50", "RO:urban", "60 mph"],
+        "maxspeed:type": ["DE:rural", "sign"],
+        "lanes": ["1", "4"],
+        "surface": ["asphalt", "gravel"],
+        "width": ["3", "5.5 m"],
+        "motorroad": ["yes"],
+    }
+    country_codes = [
+        country_code
+        for country_code in ["DE", "FR", "GB", "US-CA", "US-TX", "BR", "ZA", "RU", "XX"]
+        for i in range(512)
+    ]
+    columns = {
+        key: [values[(i + j) % len(values)] if (i >> j) % 2 else None for i in range(len(country_codes))]
+        for j, (key, values) in enumerate(tag_values.items())
+    }
+    road_class_indices, certitudes = match_columns(speeds, np.array(country_codes, dtype=object), columns)
+    assert road_type_names(speeds, country_codes, road_class_indices, certitudes) == \
+        match_one_by_one(speeds, country_codes, columns)
+
+
+def test_match_columns_of_arrow_arrays():
+    pa = pytest.importorskip("pyarrow")
+    country_codes = ["XA", "XA", None, "XB"]
+    columns = {"highway": ["motorway", None, "motorway", "service"], "lit": [None, "yes", None, None]}
+    expected = match_columns(SPEEDS, country_codes, columns)
+    for to_arrow in (pa.array, lambda values: pa.array(values).dictionary_encode()):
+        road_class_indices, certitudes = match_columns(
+            SPEEDS, to_arrow(country_codes), {key: to_arrow(values) for key, values in columns.items()}
+        )
+        assert road_class_indices.tolist() == expected[0].tolist()
+        assert certitudes.tolist() == expected[1].tolist()
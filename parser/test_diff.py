@@ -0,0 +1,102 @@
+import copy
+
+from diff import diff_results
+from diff import diff_values
+from diff import road_types_referring_to
+
+OLD = {
+    "meta": {"revisionId": "1"},
+    "roadTypesByName": {
+        "rural": {"filter": "lit=no"},
+        "motorway": {"filter": "highway=motorway"},
+        "rural trunk": {"filter": "{rural} and highway=trunk"},
+        "living street": {"filter": "highway=living_street"},
+    },
+    "speedLimitsByCountryCode": {
+        "AA": [{"tags": {"maxspeed": "100"}}, {"name": "motorway", "tags": {"maxspeed": "130"}}],
+        "AB": [{"name": "rural trunk", "tags": {"maxspeed": "90"}}],
+        "AC": [{"name": "living street", "tags": {"maxspeed": "walk"}}],
+    },
+}
+
+
+def test_diff_values():
+    assert diff_values({"a": "1", "b": "2", "c": "3"}, {"a": "1", "b": "4", "d": "5"}) == {
+        "added": {"d": "5"},
+        "removed": {"c": "3"},
+        "changed": {"b": {"old": "2", "new": "4"}},
+    }
+    assert diff_values({"a": "1"}, {"a": "1"}) is None
+
+
+def test_road_types_referring_to():
+    road_types = {"a": {"filter": "{b}"}, "b": {"filter": "{c} or x=y"}, "c": {"filter": "x=z"}, "d": {}}
+    assert road_types_referring_to({"c"}, road_types) == {"a", "b", "c"}
+    assert road_types_referring_to({"a"}, road_types) == {"a"}
+
+
+def test_no_changes():
+    result = diff_results(OLD, copy.deepcopy(OLD))
+    assert result["affectedCountryCodes"] == []
+    assert result["affectedRoadTypeNames"] == []
+    assert result["speedLimitsByCountryCode"] == {}
+    assert result["roadTypesByName"] == {}
+
+
+def test_changed_tags():
+    new = copy.deepcopy(OLD)
+    new["speedLimitsByCountryCode"]["AA"][1]["tags"]["maxspeed"] = "120"
+    new["speedLimitsByCountryCode"]["AA"][0]["tags"]["maxspeed:hgv"] = "80"
+    result = diff_results(OLD, new)
+    assert result["affectedCountryCodes"] == ["AA"]
+    assert result["affectedRoadTypeNames"] == ["motorway"]
+    assert result["speedLimitsByCountryCode"] == {"AA": {"status": "changed", "roadClasses": {
+        "": {"status": "changed", "tags": {"added": {"maxspeed:hgv": "80"}}},
+        "motorway": {"status": "changed", "tags": {"changed": {"maxspeed": {"old": "130", "new": "120"}}}},
+    }}}
+
+
+def test_added_and_removed_countries_and_road_classes():
+    new = copy.deepcopy(OLD)
+    del new["speedLimitsByCountryCode"]["AC"]
+    new["speedLimitsByCountryCode"]["AD"] = [{"tags": {"maxspeed": "50"}}]
+    new["speedLimitsByCountryCode"]["AB"].append({"name": "motorway", "tags": {"maxspeed": "110"}})
+    result = diff_results(OLD, new)
+    assert result["affectedCountryCodes"] == ["AB", "AC", "AD"]
+    assert result["speedLimitsByCountryCode"]["AC"]["status"] == "removed"
+    assert result["speedLimitsByCountryCode"]["AD"] == {"status": "added", "roadClasses": {
+        "": {"status": "added", "tags": {"added": {"maxspeed": "50"}}}
+    }}
+    assert result["speedLimitsByCountryCode"]["AB"] == {"status": "changed", "roadClasses": {
+        "motorway": {"status": "added", "tags": {"added": {"maxspeed": "110"}}}
+    }}
+
+
+def test_changed_order_of_road_classes():
+    new = copy.deepcopy(OLD)
+    new["speedLimitsByCountryCode"]["AA"].reverse()
+    result = diff_results(OLD, new)
+    assert result["affectedCountryCodes"] == ["AA"]
+    assert result["speedLimitsByCountryCode"] == {"AA": {"status": "changed", "orderChanged": True}}
+
+
+def test_changed_road_type_affects_referring_road_types_and_their_countries():
+    new = copy.deepcopy(OLD)
+    new["roadTypesByName"]["rural"]["filter"] = "lit=no or maxspeed:type~.*:rural"
+    result = diff_results(OLD, new)
+    assert result["roadTypesByName"] == {"rural": {"status": "changed", "filters": {"changed": {
+        "filter": {"old": "lit=no", "new": "lit=no or maxspeed:type~.*:rural"}
+    }}}}
+    assert result["affectedRoadTypeNames"] == ["rural", "rural trunk"]
+    assert result["affectedCountryCodes"] == ["AB"]
+    assert result["speedLimitsByCountryCode"] == {}
+
+
+def test_road_classes_with_the_same_name():
+    new = copy.deepcopy(OLD)
+    new["speedLimitsByCountryCode"]["AA"].append({"name": "motorway", "tags": {"maxspeed": "110"}})
+    result = diff_results(OLD, new)
+    assert result["speedLimitsByCountryCode"]["AA"]["roadClasses"] == {
+        "motorway#2": {"status": "added", "tags": {"added": {"maxspeed": "110"}}}
+    }
+    assert result["affectedRoadTypeNames"] == ["motorway"]
@@ -0,0 +1,52 @@
+import os
+
+import pytest
+from bs4 import BeautifulSoup
+
+from parsers.html_tables import read_tables
+from parsers.osm_restrictions import parse_speed_definitions
+from parsers.parse_utils import parse_road_types_table
+from parsers.parse_utils import parse_speed_table
+
+
+def read_wiki_snapshot_html():
+    with open(os.path.join(os.path.dirname(__file__), "test_data", "default_speed_limits.html"), encoding="utf8") as fp:
+        return fp.read()
+
+
+@pytest.mark.parametrize("chunk_size", [7, 65536])
+def test_read_tables_is_equivalent_to_beautiful_soup(chunk_size):
+    html = read_wiki_snapshot_html()
+    soup_tables = BeautifulSoup(html, "html.parser").find_all("table")
+    tables = read_tables(html, chunk_size)
+
+    assert parse_speed_table(next(tables), parse_speed_definitions) == \
+        parse_speed_table(soup_tables[0], parse_speed_definitions)
+    assert parse_road_types_table(next(tables)) == parse_road_types_table(soup_tables[1])
+    assert next(tables, None) is None
+
+
+@pytest.mark.parametrize(
+    "html",
+    [
+        '<td> a <b>b</b>c<sup>[1]</sup> </td>',
+        '<td>a=<img src="x.png"/>b &lt;= <i> </i>c</td>',
+        '<td colspan="2">x <a href="#">y</a>\n z</td>',
+    ]
+)
+def test_cell_get_text_is_equivalent_to_beautiful_soup(html):
+    cell = next(next(read_tables(f'<table><tr>{html}</tr></table>')))[0]
+    td = BeautifulSoup(html, "html.parser").td
+    for junk_tag in td.find_all(["sup", "img"]):
+        junk_tag.decompose()
+
+    assert cell.get_text() == td.get_text()
+    assert cell.get_text(strip=True) == td.get_text(strip=True)
+    assert cell.get_text(" ", strip=True) == td.get_text(" ", strip=True)
+    assert cell.get("colspan", 1) == td.get("colspan", 1)
+
+
+def test_read_tables_ignores_nested_tables():
+    html = '<table><tr><td>a<table><tr><td>b</td></tr></table></td></tr><tr><td>c</td></tr></table>'
+    rows = list(next(read_tables(html)))
+    assert [[cell.get_text() for cell in row] for row in rows] == [["a"], ["c"]]
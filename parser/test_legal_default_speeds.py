@@ -0,0 +1,489 @@
+import json
+import os
+
+import pytest
+
+from legal_default_speeds import BinaryReader, Certitude, LegalDefaultSpeeds, Result, load, load_binary, save_index
+from legal_default_speeds import write_binary
+from legal_default_speeds.compiled import COMPILED_VERSION, compile_road_types, load_compiled, placeholder_graph
+from legal_default_speeds.compiled import write_compiled
+from legal_default_speeds.sharded import INDEX_FILE_NAME, load_sharded, write_sharded
+from legal_default_speeds.number_with_unit import with_optional_unit_to_float_or_none
+from legal_default_speeds.tag_filter import TagFilterExpression, TagFilterParseError
+from test_main import read_json, run_main
+from test_wiki_client import SNAPSHOT_FILE_NAME
+
+
+def filters(filter=None, fuzzy_filter=None, relation_filter=None):
+    result = {}
+    if filter:
+        result["filter"] = filter
+    if fuzzy_filter:
+        result["fuzzyFilter"] = fuzzy_filter
+    if relation_filter:
+        result["relationFilter"] = relation_filter
+    return result
+
+
+def road(name=None, tags=None):
+    result = {"tags": tags or {}}
+    if name:
+        result["name"] = name
+    return result
+
+
+ZA_DATA = {
+    "roadTypesByName": {
+        "living street": filters("highway=living_street"),
+        "alley": filters("{urban} and alley=yes"),
+        "urban": filters("lit=yes", "highway=residential"),
+        "urban state road": filters("{urban} and {state road}"),
+        "rural": filters(None, "sidewalk=no"),
+        "dual carriageway": filters("dual_carriageway=yes"),
+        "motorway": filters("highway=motorway"),
+        "state road": filters(None, None, "type=route and ref~ZA.*"),
+        "rural state road": filters("{rural} and {state road}"),
+        "road in construction": filters("~construction|proposed~yes"),
+        "imaginary road": filters("~imagination:.*"),
+    },
+    "speedLimitsByCountryCode": {
+        "ZA": [
+            road("road in construction", {"maxspeed": "0"}),
+            road("living street", {"maxspeed": "10"}),
+            road("alley", {"maxspeed": "5"}),
+            road("urban state road", {"maxspeed": "60"}),
+            road("urban", {"maxspeed": "50"}),
+            road(None, {"maxspeed": "100"}),
+            road("rural", {"maxspeed": "100"}),
+            road("dual carriageway", {"maxspeed": "110"}),
+            road("rural state road", {"maxspeed": "115"}),
+            road("motorway", {"maxspeed": "120"}),
+            road("imaginary road", {"maxspeed": "999"}),
+        ]
+    },
+}
+ZA = LegalDefaultSpeeds(ZA_DATA["roadTypesByName"], ZA_DATA["speedLimitsByCountryCode"])
+
+
+@pytest.mark.parametrize(
+    "data,tags,expected",
+    [
+        ("highway", {"highway": "x"}, True),
+        ("!highway", {"highway": "x"}, False),
+        ("highway = primary", {"highway": "primary"}, True),
+        ("highway != primary", {"highway": "primary"}, False),
+        ("highway ~ primary|secondary", {"highway": "secondary"}, True),
+        ("highway !~ prim.*", {"highway": "primary"}, False),
+        ("~highway|railway", {"railway": "rail"}, True),
+        ("!~high.*", {"highway": "rail"}, False),
+        ("~construction|proposed ~ yes", {"proposed": "yes"}, True),
+        ("maxweight > 3.5", {"maxweight": "3.6"}, True),
+        ("maxweight >= 3.5t", {"maxweight": "3.5"}, True),
+        ("maxheight < 10ft", {"maxheight": "3"}, True),
+        ("maxheight <= 3'4\"", {"maxheight": "1.1"}, False),
+        ("\"and\" = 'a b'", {"and": "a b"}, True),
+        ("a or b and c", {"a": "1"}, True),
+        ("(a or b) and c", {"a": "1"}, False),
+        ("a and !(b or c)", {"a": "1", "c": "1"}, False),
+    ]
+)
+def test_tag_filter_expression(data, tags, expected):
+    assert TagFilterExpression(data).matches(tags, lambda name: False) == expected
+
+
+@pytest.mark.parametrize("data", ["", "and and", "a =", "(a", "a)", "{a", "a >= b", "a b"])
+def test_tag_filter_expression_syntax_error(data):
+    with pytest.raises(TagFilterParseError):
+        TagFilterExpression(data)
+
+
+def test_tag_filter_expression_placeholders():
+    expression = TagFilterExpression("{urban} and !{lit} or highway")
+    assert expression.placeholders() == {"urban", "lit"}
+    assert expression.matches({}, lambda name: name == "urban")
+    assert not expression.matches({}, lambda name: True)
+
+    expression.resolve_placeholders(len)
+    assert expression.matches({}, lambda length: length == 5)
+
+
+@pytest.mark.parametrize(
+    "data,expected",
+    [("50", 50.0), ("30 mph", 48.28032), ("3'4\"", 1.016), ("3.5t", 3.5), ("RO:urban", None), ("50 km", 50000.0)]
+)
+def test_with_optional_unit_to_float_or_none(data, expected):
+    assert with_optional_unit_to_float_or_none(data) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("filter_name", ["filter", "fuzzyFilter", "relationFilter"])
+def test_fails_on_syntax_error_in_filter(filter_name):
+    with pytest.raises(ValueError):
+        LegalDefaultSpeeds({"urban": {filter_name: "and and"}}, {"FR": [road("urban", {"maxspeed": "50"})]})
+
+
+@pytest.mark.parametrize(
+    "road_types",
+    [
+        {"rural": filters("{rural}")},
+        {"urban": filters("{lit}"), "lit": filters("{urban}")},
+        {
+            "urban": filters("{lit}", "{sidewalk}"),
+            "lit": filters("lit=yes"),
+            "sidewalk": filters("sidewalk=yes", "{something else}"),
+            "something else": filters("{urban}"),
+        },
+    ]
+)
+def test_fails_for_circular_placeholders(road_types):
+    with pytest.raises(ValueError):
+        LegalDefaultSpeeds(road_types, {})
+
+
+@pytest.mark.parametrize(
+    "country_code,tags,relations_tags,expected",
+    [
+        ("GY", {"lit": "yes"}, [], None),
+        ("ZA", {"lit": "no"}, [], Result(None, {"maxspeed": "100"}, Certitude.FALLBACK)),
+        ("ZA", {"lit": "yes"}, [], Result("urban", {"maxspeed": "50"}, Certitude.EXACT)),
+        ("ZA", {"maxspeed": "110"}, [], Result("dual carriageway", {}, Certitude.FROM_MAX_SPEED)),
+        ("ZA", {"highway": "residential"}, [], Result("urban", {"maxspeed": "50"}, Certitude.FUZZY)),
+        ("ZA-NC", {"lit": "yes"}, [], Result("urban", {"maxspeed": "50"}, Certitude.EXACT)),
+        ("ZA-NC", {"maxspeed": "50"}, [], Result("urban", {}, Certitude.FROM_MAX_SPEED)),
+        # prefer matches further down the list
+        (
+            "ZA", {"highway": "motorway", "lit": "yes", "dual_carriageway": "yes"}, [],
+            Result("motorway", {"maxspeed": "120"}, Certitude.EXACT)
+        ),
+        (
+            "ZA", {"lit": "yes", "dual_carriageway": "yes"}, [],
+            Result("dual carriageway", {"maxspeed": "110"}, Certitude.EXACT)
+        ),
+        # otherwise prefer matches further at the top of the list
+        (
+            "ZA", {"highway": "living_street", "lit": "yes"}, [],
+            Result("living street", {"maxspeed": "10"}, Certitude.EXACT)
+        ),
+        ("ZA", {"lit": "yes", "sidewalk": "no"}, [], Result("urban", {"maxspeed": "50"}, Certitude.EXACT)),
+        ("ZA", {"lit": "yes", "sidewalk": "no", "maxspeed": "110"}, [], Result("urban", {}, Certitude.EXACT)),
+        ("ZA", {"sidewalk": "no", "maxspeed": "110"}, [], Result("dual carriageway", {}, Certitude.FROM_MAX_SPEED)),
+        # with placeholders
+        ("ZA", {"lit": "yes", "alley": "yes"}, [], Result("alley", {"maxspeed": "5"}, Certitude.EXACT)),
+        ("ZA", {"highway": "residential", "alley": "yes"}, [], Result("alley", {"maxspeed": "5"}, Certitude.FUZZY)),
+        # with relations
+        (
+            "ZA", {"sidewalk": "no"}, [{"type": "route", "ref": "Bus 1234"}, {"type": "route", "ref": "ZA 2"}],
+            Result("rural state road", {"maxspeed": "115"}, Certitude.FUZZY)
+        ),
+        (
+            "ZA", {"lit": "yes"}, [{"type": "route", "ref": "ZA 2"}],
+            Result("urban state road", {"maxspeed": "60"}, Certitude.EXACT)
+        ),
+    ]
+)
+def test_get_speed_limits(country_code, tags, relations_tags, expected):
+    assert ZA.get_speed_limits(country_code, tags, relations_tags) == expected
+
+
+@pytest.mark.parametrize(
+    "tags,replaced_name,expected",
+    [
+        ({}, "urban", Result("urban", {"maxspeed": "50"}, Certitude.EXACT)),
+        ({"alley": "yes"}, "urban", Result("alley", {"maxspeed": "5"}, Certitude.EXACT)),
+        ({"highway": "residential"}, "state road", Result("urban state road", {"maxspeed": "60"}, Certitude.FUZZY)),
+    ]
+)
+def test_get_speed_limits_with_replacer(tags, replaced_name, expected):
+    def replacer_fn(name, evaluate):
+        return True if name == replaced_name else evaluate()
+
+    assert ZA.get_speed_limits("ZA", tags, replacer_fn=replacer_fn) == expected
+
+
+@pytest.mark.parametrize(
+    "road_type_tags,tags,expected",
+    [
+        (
+            {"maxspeed": "60", "maxspeed:hgv": "80", "maxspeed:mofa": "50"}, {},
+            {"maxspeed": "60", "maxspeed:mofa": "50"}
+        ),
+        (
+            {"maxspeed": "35 mph", "maxspeed:hgv": "40 mph", "maxspeed:mofa": "10 mph"}, {},
+            {"maxspeed": "35 mph", "maxspeed:mofa": "10 mph"}
+        ),
+        (
+            {"maxspeed": "60", "maxspeed:conditional": "80 @ (something); 50 @ (something else)"}, {},
+            {"maxspeed": "60", "maxspeed:conditional": "50 @ (something else)"}
+        ),
+        (
+            {"maxspeed": "20 mph", "maxspeed:conditional": "40 mph @ (something); 30 mph @ (something else)"}, {},
+            {"maxspeed": "20 mph"}
+        ),
+        (
+            {"maxspeed": "60", "maxspeed:hgv:conditional": "80 @ (something); 50 @ (something else)"}, {},
+            {"maxspeed": "60", "maxspeed:hgv:conditional": "50 @ (something else)"}
+        ),
+        (
+            {"maxspeed:hgv": "30 mph", "maxspeed:hgv:conditional": "40 mph @ (a); 20 mph @ (b)"}, {},
+            {"maxspeed:hgv": "30 mph", "maxspeed:hgv:conditional": "20 mph @ (b)"}
+        ),
+        (
+            {"maxspeed:hgv": "60", "maxspeed:hgv:conditional": "80 @ (something); 60 @ (something else)"}, {},
+            {"maxspeed:hgv": "60"}
+        ),
+        (
+            {"maxspeed": "100", "maxspeed:hgv": "80", "maxspeed:mofa": "50"}, {"maxspeed": "80"},
+            {"maxspeed:mofa": "50"}
+        ),
+        ({"maxspeed": "100", "maxspeed:hgv": "80"}, {"maxspeed": "80", "maxspeed:hgv": "50"}, {}),
+        (
+            {"maxspeed": "100", "maxspeed:hgv": "80", "maxspeed:mofa": "50"},
+            {"maxspeed": "100", "maxspeed:mofa": "50"},
+            {"maxspeed:hgv": "80"}
+        ),
+        ({"maxspeed": "100"}, {"maxspeed": "RO:urban"}, {"maxspeed": "100"}),
+    ]
+)
+def test_result_tags(road_type_tags, tags, expected):
+    speeds = LegalDefaultSpeeds({}, {"AB": [road(tags=road_type_tags)]})
+    assert speeds.get_speed_limits("AB", tags).tags == expected
+
+
+@pytest.mark.parametrize("key", ["highway", "sidewalk", "ref", "proposed", "imagination:1"])
+def test_relevant_tag_key(key):
+    assert ZA.is_relevant_tag_key(key)
+
+
+@pytest.mark.parametrize("key", ["opening_hours", "urban", "{urban}", "not:imagination"])
+def test_non_relevant_tag_key(key):
+    assert not ZA.is_relevant_tag_key(key)
+
+
+def test_get_speed_limits_batch():
+    ways = [
+        ("ZA", {"lit": "yes"}, []),
+        ("GY", {"lit": "yes"}, []),
+        ("ZA", {"lit": "yes"}, [{"type": "route", "ref": "ZA 2"}]),
+        ("ZA-NC", {"highway": "residential"}, None),
+    ]
+    assert list(ZA.get_speed_limits_batch(ways)) == [ZA.get_speed_limits(*way[:2], way[2] or []) for way in ways]
+
+
+def test_load_generated_json():
+    speeds = load(os.path.join(os.path.dirname(__file__), "..", "demo", "distribution", "legal_default_speeds.json"))
+    result = speeds.get_speed_limits("DE", {"highway": "motorway"})
+    assert result.road_type_name == "motorway"
+    assert result.certitude == Certitude.EXACT
+
+
+def test_decision_index_only_keeps_road_types_that_can_match():
+    modes = ZA.get_index()["countries"]["ZA"]["modes"]
+    search_order = [road_type["name"] for road_type, _ in ZA.get_country_road_types("ZA").search_order]
+
+    def names(positions):
+        return [search_order[i] for i in positions]
+
+    assert names(modes["exact"]["byHighway"]["motorway"]) == [
+        "imaginary road", "motorway", "dual carriageway", "road in construction", "alley", "urban"
+    ]
+    assert "urban state road" not in names(modes["exact"]["otherHighway"])
+    assert "urban state road" in names(modes["exact+relations"]["otherHighway"])
+    assert "rural" not in names(modes["exact"]["otherHighway"])
+    assert "rural" in names(modes["fuzzy"]["otherHighway"])
+    assert modes["exact"]["requiredKeys"][search_order.index("alley")] == ["lit"]
+
+
+def test_decision_index_is_reused_if_it_belongs_to_the_data(tmp_path):
+    json_file_name = os.path.join(os.path.dirname(__file__), "..", "demo", "distribution", "legal_default_speeds.json")
+    index_file_name = str(tmp_path / "index.json")
+    save_index(load(json_file_name), index_file_name)
+    speeds = load(json_file_name, index_file_name)
+    with open(index_file_name, encoding="utf8") as file:
+        assert speeds.get_index() == json.load(file)
+
+    outdated_speeds = LegalDefaultSpeeds({}, {"AB": [road(tags={"maxspeed": "50"})]}, speeds.get_index())
+    assert outdated_speeds.get_speed_limits("AB", {}).tags == {"maxspeed": "50"}
+
+
+def test_decision_index_gives_same_results_as_trying_every_road_type():
+    speeds = load(os.path.join(os.path.dirname(__file__), "..", "demo", "distribution", "legal_default_speeds.json"))
+    tag_values = {
+        "highway": ["motorway", "trunk", "primary", "residential", "service", "living_street", "track"],
+        "lit": ["yes", "no"],
+        "sidewalk": ["both", "no"],
+        "maxspeed": ["50", "RO:urban", "60 mph"],
+        "ref": ["A 1", "N 3", "US 101"],
+        "lanes": ["1", "4"],
+        "surface": ["asphalt", "gravel"],
+    }
+    relations_tags = [{"type": "route", "route": "road", "network": "US:US", "ref": "101"}]
+    ways = [
+        (country_code, {key: values[(i + j) % len(values)] for j, (key, values) in enumerate(tag_values.items())
+                        if (i >> j) % 2}, relations_tags if i % 3 == 0 else [])
+        for country_code in ["DE", "FR", "GB", "US-CA", "US-TX", "BR", "ZA"]
+        for i in range(128)
+    ]
+    assert list(speeds.get_speed_limits_batch(ways)) == [
+        speeds.get_speed_limits(*way, replacer_fn=lambda name, evaluate: evaluate()) for way in ways
+    ]
+
+
+def test_relevant_tag_key_in_country():
+    speeds = LegalDefaultSpeeds(
+        {"urban": filters("lit=yes"), "alley": filters("{urban} and alley=yes"), "motorway": filters("~motor.*")},
+        {"AB": [road("alley")], "CD": [road("motorway")]}
+    )
+    assert speeds.is_relevant_tag_key("lit", "AB")
+    assert not speeds.is_relevant_tag_key("lit", "CD")
+    assert speeds.is_relevant_tag_key("motorroad", "CD")
+    assert not speeds.is_relevant_tag_key("lit", "XY")
+
+
+def test_binary_format_round_trip(tmp_path):
+    with open(os.path.join(os.path.dirname(__file__), "..", "demo", "distribution", "legal_default_speeds.json"),
+              encoding="utf8") as file:
+        data = json.load(file)
+    file_name = str(tmp_path / "legal_default_speeds.bin")
+    write_binary(data, file_name)
+
+    with BinaryReader(file_name) as reader:
+        assert reader.read_all() == data
+        assert reader.country_codes() == sorted(data["speedLimitsByCountryCode"])
+        for country_code, road_classes in data["speedLimitsByCountryCode"].items():
+            assert reader.road_classes(country_code) == road_classes
+        assert reader.road_classes("XX") is None
+
+        # strings are interned
+        tags = [road_class["tags"] for road_class in reader.road_classes("DE") + reader.road_classes("FR")]
+        keys = [key for t in tags for key in t if key == "maxspeed"]
+        assert all(key is keys[0] for key in keys)
+
+    assert load_binary(file_name).get_speed_limits("DE", {"highway": "motorway"}).road_type_name == "motorway"
+
+
+def test_binary_format_rejects_other_files(tmp_path):
+    file_name = tmp_path / "legal_default_speeds.json"
+    file_name.write_text("{" + " " * 100 + "}")
+    with pytest.raises(ValueError):
+        BinaryReader(str(file_name))
+
+
+def test_compiled_format_gives_same_results(tmp_path):
+    file_name = str(tmp_path / "legal_default_speeds.compiled.json")
+    write_compiled({**ZA_DATA, "meta": {"revisionId": "123"}}, file_name)
+    speeds = load_compiled(file_name, "123")
+    assert speeds.get_index() == ZA.get_index()
+    for country_code, tags, relations_tags in [
+        ("ZA", {"highway": "residential", "lit": "yes", "alley": "yes"}, []),
+        ("ZA", {"sidewalk": "no"}, []),
+        ("ZA", {"maxspeed": "100"}, []),
+        ("ZA", {"lit": "yes"}, [{"type": "route", "ref": "ZA 2"}]),
+        ("ZA-NC", {"highway": "motorway"}, []),
+    ]:
+        assert speeds.get_speed_limits(country_code, tags, relations_tags) == \
+            ZA.get_speed_limits(country_code, tags, relations_tags)
+
+
+def test_compiled_format_rejects_other_versions_and_revisions(tmp_path):
+    file_name = tmp_path / "legal_default_speeds.compiled.json"
+    write_compiled({**ZA_DATA, "meta": {"revisionId": "123"}}, str(file_name))
+    with pytest.raises(ValueError):
+        load_compiled(str(file_name), "124")
+    file_name.write_text(json.dumps({**json.loads(file_name.read_text()), "version": COMPILED_VERSION + 1}))
+    with pytest.raises(ValueError):
+        load_compiled(str(file_name))
+
+
+def test_compiled_road_types():
+    road_types = compile_road_types({
+        "urban": filters("lit=yes or sidewalk~both|left"),
+        "alley": filters("{urban} and !{lane} and width<=3"),
+    })
+    assert road_types == [
+        ["urban", ["or", ["=", "lit", "yes"], ["~", "sidewalk", "both|left"]], None, None],
+        ["alley", ["and", ["{}", 0], ["!{}", 2], ["<=", "width", 3.0]], None, None],
+        ["lane"],
+    ]
+    assert placeholder_graph(road_types) == {"urban": [], "alley": ["urban", "lane"]}
+
+
+def test_main_writes_compiled_file(tmp_path, monkeypatch):
+    output_file_name = str(tmp_path / "legal_default_speeds.json")
+    compiled_file_name = str(tmp_path / "legal_default_speeds.compiled.json")
+    run_main(monkeypatch, output_file_name, "--from-snapshot", SNAPSHOT_FILE_NAME, "--compiled", compiled_file_name)
+    result = read_json(output_file_name)
+
+    speeds = load_compiled(compiled_file_name)
+    assert speeds.get_speed_limits("DE", {"highway": "motorway"}).road_type_name == "motorway"
+    compiled_road_classes = read_json(compiled_file_name)["speedLimitsByCountryCode"]["DE"]
+    assert [road_class["tags"] for road_class in compiled_road_classes] == \
+        [road_class["tags"] for road_class in result["speedLimitsByCountryCode"]["DE"]]
+    assert compiled_road_classes[0]["speedsByVehicleType"]
+
+
+SHARDED_DATA = {
+    "meta": {"revisionId": "123", "license": "CC"},
+    "roadTypesByName": {**ZA_DATA["roadTypesByName"], "unused": filters("highway=unused")},
+    "speedLimitsByCountryCode": {
+        **ZA_DATA["speedLimitsByCountryCode"],
+        "ZA-NC": [road("urban", {"maxspeed": "40"})],
+        "GY": [road("urban state road", {"maxspeed": "50"}), road(None, {"maxspeed": "80"})],
+    },
+}
+
+
+def test_sharded_format(tmp_path):
+    write_sharded(SHARDED_DATA, str(tmp_path))
+    index = json.loads((tmp_path / INDEX_FILE_NAME).read_text())
+    assert index["meta"] == SHARDED_DATA["meta"]
+    assert index["shardByCountryCode"] == {"ZA": "ZA", "ZA-NC": "ZA", "GY": "GY"}
+    assert sorted(index["shards"]) == ["GY", "ZA"]
+
+    gy = json.loads((tmp_path / index["shards"]["GY"]["file"]).read_text())
+    assert gy["meta"] == {"license": "CC"}
+    # referred to via placeholders
+    assert sorted(gy["roadTypesByName"]) == ["state road", "urban", "urban state road"]
+    assert list(gy["speedLimitsByCountryCode"]) == ["GY"]
+
+    speeds = load_sharded(str(tmp_path), ["ZA-NC", "ZA-GP"])
+    assert speeds.get_country_road_types("GY") is None
+    assert speeds.get_speed_limits("ZA-NC", {"lit": "yes"}).tags == {"maxspeed": "40"}
+    for tags, relations_tags in [
+        ({"highway": "residential", "lit": "yes", "alley": "yes"}, []),
+        ({"lit": "yes"}, [{"type": "route", "ref": "ZA 2"}]),
+        ({"highway": "motorway"}, []),
+    ]:
+        assert speeds.get_speed_limits("ZA-GP", tags, relations_tags) == ZA.get_speed_limits("ZA", tags, relations_tags)
+
+
+def test_sharded_format_hashes_only_change_with_the_data(tmp_path):
+    write_sharded(SHARDED_DATA, str(tmp_path / "a"))
+    changed_data = {
+        **SHARDED_DATA,
+        "meta": {**SHARDED_DATA["meta"], "revisionId": "124"},
+        "speedLimitsByCountryCode": {**SHARDED_DATA["speedLimitsByCountryCode"], "GY": [road(None, {"maxspeed": "90"})]}
+    }
+    write_sharded(changed_data, str(tmp_path / "b"))
+    shards_a = json.loads((tmp_path / "a" / INDEX_FILE_NAME).read_text())["shards"]
+    shards_b = json.loads((tmp_path / "b" / INDEX_FILE_NAME).read_text())["shards"]
+    assert shards_a["ZA"]["hash"] == shards_b["ZA"]["hash"]
+    assert shards_a["GY"]["hash"] != shards_b["GY"]["hash"]
+
+
+def test_sharded_format_rejects_shard_not_matching_the_index(tmp_path):
+    write_sharded(SHARDED_DATA, str(tmp_path))
+    file_name = tmp_path / "GY.json"
+    file_name.write_text(file_name.read_text().replace('"80"', '"90"'))
+    load_sharded(str(tmp_path), ["ZA"])
+    with pytest.raises(ValueError):
+        load_sharded(str(tmp_path), ["GY"])
+
+
+def test_main_writes_sharded_files(tmp_path, monkeypatch):
+    sharded_directory = str(tmp_path / "sharded")
+    run_main(
+        monkeypatch, str(tmp_path / "legal_default_speeds.json"), "--from-snapshot", SNAPSHOT_FILE_NAME,
+        "--sharded", sharded_directory
+    )
+    speeds = load_sharded(sharded_directory, ["DE"])
+    assert speeds.get_speed_limits("DE", {"highway": "motorway"}).road_type_name == "motorway"
+    assert speeds.get_country_road_types("FR") is None
@@ -0,0 +1,55 @@
+import json
+import os
+import runpy
+import sys
+
+from parsers.wiki_client import WikiClient
+from test_wiki_client import SNAPSHOT_FILE_NAME
+
+
+def run_main(monkeypatch, *args):
+    monkeypatch.setattr(sys, "argv", ["main.py", *args])
+    runpy.run_path(os.path.join(os.path.dirname(__file__), "main.py"), run_name="__main__")
+
+
+def read_json(file_name: str) -> dict:
+    with open(file_name, encoding="utf8") as file:
+        return json.load(file)
+
+
+def test_main_from_snapshot(tmp_path, monkeypatch, capsys):
+    output_file_name = str(tmp_path / "legal_default_speeds.json")
+    run_main(monkeypatch, output_file_name, "--from-snapshot", SNAPSHOT_FILE_NAME)
+    result = read_json(output_file_name)
+    assert result["meta"]["revisionId"] is None
+    assert result["speedLimitsByCountryCode"]["DE"]
+    assert "Parse cache" not in capsys.readouterr().err
+
+    run_main(
+        monkeypatch, output_file_name, "--from-snapshot", SNAPSHOT_FILE_NAME,
+        "--parse-cache", str(tmp_path / "parse_cache.json")
+    )
+    assert "Parse cache" in capsys.readouterr().err
+
+
+def test_incremental_parses_all_rows_if_previous_result_has_no_revision_id(tmp_path, monkeypatch):
+    expected_file_name = str(tmp_path / "expected.json")
+    run_main(monkeypatch, expected_file_name, "--from-snapshot", SNAPSHOT_FILE_NAME)
+
+    # as generated from an HTML snapshot, but with other road classes
+    output_file_name = str(tmp_path / "legal_default_speeds.json")
+    previous_result = read_json(expected_file_name)
+    previous_result["speedLimitsByCountryCode"] = {
+        country_code: [{"tags": {"maxspeed": "1"}}] * len(road_classes)
+        for country_code, road_classes in previous_result["speedLimitsByCountryCode"].items()
+    }
+    with open(output_file_name, "w", encoding="utf8") as file:
+        json.dump(previous_result, file)
+
+    def fetch_parsed_page(self, revision_id=None):
+        raise AssertionError(f"Revision {revision_id} of the page should not be fetched")
+
+    monkeypatch.setattr(WikiClient, "fetch_parsed_page", fetch_parsed_page)
+    run_main(monkeypatch, output_file_name, "--from-snapshot", SNAPSHOT_FILE_NAME, "--incremental")
+    assert read_json(output_file_name)["speedLimitsByCountryCode"] == \
+        read_json(expected_file_name)["speedLimitsByCountryCode"]
@@ -0,0 +1,76 @@
+import pytest
+
+from parsers.osm_restrictions import parse_speed_definitions
+from parsers.osm_restrictions import parse_speeds
+from parsers.parse_cache import ParseCache
+
+
+def test_parse_cache_counts_hits_and_misses():
+    cache = ParseCache(parse_speeds)
+    assert cache("80 (trailer)") == {"maxspeed:conditional": "80 @ (trailer)"}
+    assert cache("80  (trailer) ") == {"maxspeed:conditional": "80 @ (trailer)"}
+    assert cache("50") == {"maxspeed": "50"}
+    assert cache.stats() == {"hits": 1, "misses": 2, "evictions": 0, "size": 2}
+
+
+def test_parse_cache_returns_copies():
+    cache = ParseCache(parse_speeds)
+    cache("50")["maxspeed"] = "30"
+    assert cache("50") == {"maxspeed": "50"}
+
+
+def test_parse_cache_returns_speed_definitions_that_cannot_be_changed():
+    cache = ParseCache(parse_speed_definitions)
+    cache("80 (trailer)").append("junk")
+    with pytest.raises(AttributeError):
+        cache("80 (trailer)")[0].conditions.append("junk")
+    assert cache("80 (trailer)") == parse_speed_definitions("80 (trailer)")
+
+
+def test_parse_cache_evicts_least_recently_used():
+    cache = ParseCache(parse_speeds, max_size=2)
+    cache("50")
+    cache("60")
+    cache("50")
+    cache("70")
+    assert list(cache.entries) == ["50", "70"]
+    assert cache.evictions == 1
+
+
+def test_parse_cache_does_not_cache_errors():
+    cache = ParseCache(parse_speeds)
+    with pytest.raises(Exception):
+        cache("junk")
+    assert len(cache.entries) == 0
+
+
+def test_parse_cache_save_and_load(tmp_path):
+    file_name = str(tmp_path / "cache.json")
+    cache = ParseCache(parse_speeds)
+    cache("50")
+    cache.save(file_name)
+
+    loaded_cache = ParseCache(parse_speeds)
+    loaded_cache.load(file_name)
+    assert loaded_cache("50") == {"maxspeed": "50"}
+    assert loaded_cache.stats()["hits"] == 1
+
+
+def test_parse_cache_saves_and_loads_speed_definitions(tmp_path):
+    file_name = str(tmp_path / "cache.json")
+    cache = ParseCache(parse_speed_definitions)
+    cache("80 (3.50t, Mo-Fr 07:00-17:00)")
+    cache.save(file_name)
+
+    loaded_cache = ParseCache(parse_speed_definitions)
+    loaded_cache.load(file_name)
+    assert loaded_cache("80 (3.50t, Mo-Fr 07:00-17:00)") == parse_speed_definitions("80 (3.50t, Mo-Fr 07:00-17:00)")
+    assert loaded_cache.stats()["hits"] == 1
+
+
+def test_parse_cache_ignores_cache_of_other_parser(tmp_path):
+    file_name = tmp_path / "cache.json"
+    file_name.write_text('{"parserHash": "other", "entries": {"50": {"maxspeed": "30"}}}')
+    cache = ParseCache(parse_speeds)
+    cache.load(str(file_name))
+    assert cache("50") == {"maxspeed": "50"}
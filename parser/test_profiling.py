@@ -0,0 +1,110 @@
+import os
+
+import pytest
+from bs4 import BeautifulSoup
+
+from parsers.html_tables import read_tables
+from parsers.osm_restrictions import parse_speed_definitions
+from parsers.osm_restrictions import parse_speeds
+from parsers.parse_cache import ParseCache
+from parsers.parse_cache import normalize_speeds
+from parsers.parse_utils import parse_road_types_table
+from parsers.parse_utils import parse_speed_table
+from parsers.parse_utils import speed_table_rows
+from parsers.profiling import Profile
+
+
+def read_wiki_snapshot_html() -> str:
+    with open(os.path.join(os.path.dirname(__file__), "test_data", "default_speed_limits.html"), encoding="utf8") as fp:
+        return fp.read().replace("&#160;", " ")
+
+
+def test_nested_stages_are_exclusive(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr("parsers.profiling.perf_counter", lambda: now[0])
+    profile = Profile()
+    with profile.stage("outer"):
+        now[0] += 1
+        with profile.stage("inner"):
+            now[0] += 2
+        now[0] += 4
+    assert profile.seconds_by_stage == {"outer": 5, "inner": 2}
+
+
+def test_timed_iter():
+    profile = Profile()
+    assert list(profile.timed_iter(iter([1, 2, 3]), "items")) == [1, 2, 3]
+    assert "items" in profile.seconds_by_stage
+    assert profile.stages == []
+
+
+def test_timed_speed_parse_func_counts_failures():
+    profile = Profile(slowest_cells_count=2)
+    parse_func = profile.timed_speed_parse_func(parse_speeds)
+    parse_func("50")
+    parse_func("60 (wet)")
+    parse_func("70 mph")
+    with pytest.raises(Exception):
+        parse_func("fast")
+    assert profile.parse_count == 4
+    assert profile.parse_failure_count == 1
+    assert len(profile.to_json()["slowestCells"]) == 2
+    assert profile.stages == []
+
+
+def test_parse_speed_table_with_profile():
+    html = read_wiki_snapshot_html()
+    expected = parse_speed_table(next(read_tables(html)), parse_speed_definitions)
+    parsed_strings = []
+
+    def speed_parse_func(s):
+        parsed_strings.append(s)
+        return parse_speed_definitions(s)
+
+    profile = Profile()
+    tables = read_tables(html)
+    assert parse_speed_table(next(tables), speed_parse_func, profile=profile) == expected
+    parse_road_types_table(next(tables), profile)
+
+    report = profile.to_json()
+    assert {"readHtml", "readRows", "setTds", "countryCodes", "parseSpeeds"} <= set(report["secondsByStage"])
+    assert report["rowsByCountryCode"]["DE"] == len(expected["speedLimitsByCountryCode"]["DE"])
+    assert report["parseCount"] == len(parsed_strings)
+    assert report["slowestCells"][0]["speeds"] in parsed_strings
+
+
+def test_parse_speed_table_with_profile_on_bs4_table():
+    profile = Profile()
+    table = BeautifulSoup(read_wiki_snapshot_html(), "html.parser").find_all("table")[0]
+    parse_speed_table(table, parse_speed_definitions, profile=profile)
+    assert "removeJunkTags" in profile.seconds_by_stage
+
+
+def test_parse_speed_table_in_parallel_with_profile():
+    profile = Profile()
+    table = list(next(read_tables(read_wiki_snapshot_html())))
+    parse_speed_table(table, parse_speed_definitions, workers=2, profile=profile)
+    assert "parseSpeedsInParallel" in profile.seconds_by_stage
+    # each distinct string is parsed once, in the workers
+    parsed_strings = {td_speeds for _, _, speeds in speed_table_rows(table) for _, td_speeds in speeds}
+    assert profile.parse_count == len(parsed_strings)
+    assert profile.slowest_cells[0][1] in parsed_strings
+
+
+def test_parse_speed_table_in_parallel_with_parse_cache():
+    table = list(next(read_tables(read_wiki_snapshot_html())))
+    cache = ParseCache(parse_speed_definitions)
+    cache("50")
+    expected = parse_speed_table(table, parse_speed_definitions)
+
+    assert parse_speed_table(table, cache, workers=2) == expected
+    assert cache.stats()["hits"] == 1
+    parsed_strings = {
+        normalize_speeds(td_speeds) for _, _, speeds in speed_table_rows(table) for _, td_speeds in speeds
+    }
+    assert set(cache.entries) == parsed_strings | {"50"}
+
+    # the strings parsed in the workers are in the cache now, so nothing is parsed again
+    profile = Profile()
+    assert parse_speed_table(table, cache, workers=2, profile=profile) == expected
+    assert profile.parse_count == 0
@@ -0,0 +1,87 @@
+import os
+import runpy
+import shutil
+import sys
+
+import pytest
+
+from regenerate import download_revisions
+from regenerate import regenerate
+from regenerate import revision_id_of
+from regenerate import snapshot_files_in_dir
+from parsers.wiki_client import WikiClient
+from test_wiki_client import FakeSession
+from test_wiki_client import SNAPSHOT_FILE_NAME
+
+
+def without_timestamp(result: dict) -> dict:
+    return {**result, "meta": {k: v for k, v in result["meta"].items() if k != "timestamp"}}
+
+
+def test_revision_id_of():
+    assert revision_id_of("cache/Default_speed_limits-2391456.json") == "2391456"
+    assert revision_id_of("2391456.html") == "2391456"
+    assert revision_id_of("default_speed_limits.html") is None
+
+
+def test_snapshot_files_in_dir(tmp_path):
+    for file_name in ["Page-100.json", "99.html", "Page-1000.json", "notes.txt", "snapshot.html"]:
+        (tmp_path / file_name).write_text("")
+    assert [os.path.basename(f) for f in snapshot_files_in_dir(str(tmp_path))] == [
+        "99.html", "Page-100.json", "Page-1000.json"
+    ]
+
+
+def test_download_revisions(tmp_path):
+    session = FakeSession()
+    client = WikiClient("Page", str(tmp_path), session=session)
+    file_names = download_revisions(client, "2", "3")
+    assert file_names == [str(tmp_path / "Page-2.json"), str(tmp_path / "Page-3.json")]
+    assert all(os.path.exists(file_name) for file_name in file_names)
+
+    session.queries.clear()
+    download_revisions(client, "2", "3")
+    assert [query["action"] for query in session.queries] == ["query"]
+
+
+def test_regenerate(tmp_path):
+    file_names = []
+    for revision_id in ["7", "8", "9"]:
+        file_names.append(str(tmp_path / f"{revision_id}.html"))
+        shutil.copy(SNAPSHOT_FILE_NAME, file_names[-1])
+
+    results = list(regenerate(file_names))
+    assert [revision_id for revision_id, _ in results] == ["7", "8", "9"]
+    assert [result["meta"]["revisionId"] for _, result in results] == ["7", "8", "9"]
+    assert results[0][1]["speedLimitsByCountryCode"]["DE"]
+
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+    assert list(regenerate(file_names, str(output_dir), jobs=2)) == [("7", None), ("8", None), ("9", None)]
+    assert sorted(os.listdir(output_dir)) == ["7.json", "8.json", "9.json"]
+    assert without_timestamp(results[1][1]) == without_timestamp(next(regenerate([file_names[1]]))[1])
+
+
+def test_regenerate_continues_after_broken_revision(tmp_path):
+    file_names = [str(tmp_path / f"{revision_id}.html") for revision_id in ["7", "8", "9"]]
+    shutil.copy(SNAPSHOT_FILE_NAME, file_names[0])
+    with open(file_names[1], "w", encoding="utf8") as file:
+        file.write("<p>Page moved</p>")
+    shutil.copy(SNAPSHOT_FILE_NAME, file_names[2])
+
+    for jobs in [1, 2]:
+        output_dir = tmp_path / f"output{jobs}"
+        output_dir.mkdir()
+        results = list(regenerate(file_names, str(output_dir), jobs))
+        assert [revision_id for revision_id, _ in results] == ["7", "8", "9"]
+        assert results[0][1] is None and results[2][1] is None
+        assert "no speed table" in results[1][1]["error"]
+        assert sorted(os.listdir(output_dir)) == ["7.json", "9.json"]
+
+
+@pytest.mark.parametrize("jobs", ["0", "-1"])
+def test_regenerate_rejects_jobs_below_one(tmp_path, monkeypatch, capsys, jobs):
+    monkeypatch.setattr(sys, "argv", ["regenerate.py", "--from-dir", str(tmp_path), "--combined", "x", "--jobs", jobs])
+    with pytest.raises(SystemExit):
+        runpy.run_path(os.path.join(os.path.dirname(__file__), "regenerate.py"), run_name="__main__")
+    assert "--jobs must be at least 1" in capsys.readouterr().err
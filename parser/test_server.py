@@ -0,0 +1,75 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from server import LatencyHistogram
+from server import SpeedParserService
+from server import create_server
+from test_wiki_client import SNAPSHOT_FILE_NAME
+
+
+@pytest.fixture(scope="module")
+def server_url():
+    server = create_server(SpeedParserService(), port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def post(url: str, data) -> dict:
+    request = urllib.request.Request(url, json.dumps(data).encode("utf8"), {"Content-Type": "application/json"})
+    with urllib.request.urlopen(request) as response:
+        return json.load(response)
+
+
+def test_latency_histogram():
+    histogram = LatencyHistogram((1, 10))
+    for latency_ms in [0.5, 1, 5, 20, 30]:
+        histogram.add(latency_ms)
+    assert histogram.to_json() == {"count": 5, "sumMs": 56.5, "buckets": [
+        {"le": 1, "count": 2}, {"le": 10, "count": 1}, {"le": None, "count": 2}
+    ]}
+
+
+def test_parse_speeds(server_url):
+    results = post(server_url + "/parse_speeds", {"speeds": ["50", "80 (trailer)", "fast"]})["results"]
+    assert results[:2] == [{"tags": {"maxspeed": "50"}}, {"tags": {"maxspeed:conditional": "80 @ (trailer)"}}]
+    assert "error" in results[2]
+
+
+def test_country_codes(server_url):
+    results = post(server_url + "/country_codes", {"names": ["Germany", "United States:California", "Atlantis"]})
+    assert results == {"results": ["DE", "US-CA", None]}
+
+
+def test_validate(server_url):
+    with open(SNAPSHOT_FILE_NAME, encoding="utf8") as file:
+        result = post(server_url + "/validate", {"html": file.read()})
+    assert result["speedLimitsByCountryCode"]["DE"]
+    assert isinstance(result["warnings"], list)
+
+
+def test_invalid_requests(server_url):
+    with pytest.raises(urllib.error.HTTPError) as e:
+        post(server_url + "/parse_speeds", {"strings": ["50"]})
+    assert e.value.code == 400
+    with pytest.raises(urllib.error.HTTPError) as e:
+        post(server_url + "/validate", {"html": "<p>x</p>"})
+    assert e.value.code == 400
+    assert "no speed table" in json.load(e.value)["error"]
+    with pytest.raises(urllib.error.HTTPError) as e:
+        post(server_url + "/unknown", {})
+    assert e.value.code == 404
+
+
+def test_stats(server_url):
+    post(server_url + "/parse_speeds", {"speeds": ["50"]})
+    with urllib.request.urlopen(server_url + "/stats") as response:
+        stats = json.load(response)
+    assert stats["histograms"]["/parse_speeds"]["count"] >= 1
+    assert "hits" in stats["parseCache"]
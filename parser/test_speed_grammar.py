@@ -0,0 +1,226 @@
+"""Property based tests of the speed grammar: speed definition strings are generated from the grammar
+together with the speed definitions they stand for, so parsing them must give back those speed
+definitions. And parsing must take linear time in the length of the string."""
+import time
+
+import pytest
+from lark import Lark
+
+from parsers import SPEED_GRAMMAR
+from parsers.osm_restrictions import parse_speed_definitions
+from parsers.osm_restrictions import parse_speeds
+from parsers.osm_restrictions import speed_definitions
+from parsers.speed_model import AccessProhibited
+from parsers.speed_model import DateInterval
+from parsers.speed_model import LaneSpeedLimits
+from parsers.speed_model import LengthCondition
+from parsers.speed_model import MinCountCondition
+from parsers.speed_model import NamedCondition
+from parsers.speed_model import Span
+from parsers.speed_model import Speed
+from parsers.speed_model import SpeedLimit
+from parsers.speed_model import Time
+from parsers.speed_model import TimeCondition
+from parsers.speed_model import WeightCondition
+from parsers.speed_model import osm_tags
+
+pytest.importorskip("hypothesis")
+
+from hypothesis import given, settings, strategies as st  # noqa: E402
+
+# each strategy generates (string, speed model) tuples
+
+# whitespace is ignored by the grammar
+OPTIONAL_SPACE = st.sampled_from(["", " "])
+
+WEIGHT_QUALIFIERS = {
+    "empty": "emptyweight", "capacity": "weightcapacity", "trailer": "trailerweight", "current": "weight"
+}
+RESTRICTION_CONDITIONALS = ["articulated", "trailer", "caravan", "wet", "empty", "agricultural"]
+EVENTS = ["sunset", "sunrise", "dusk", "dawn"]
+WEEKDAYS = ["Mo", "Tu", "We", "Th", "Fr", "Sa", "Su", "PH", "SH"]
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+SPEED_KEYS = {"": "maxspeed", "advisory:": "maxspeed:advisory", "min:": "minspeed"}
+
+
+@st.composite
+def speeds(draw):
+    unit = draw(st.sampled_from(["km/h", "mph", "walk"]))
+    if unit == "walk":
+        return "walk", Speed(None, "walk")
+    value = draw(st.integers(1, 300))
+    return (f"{value} mph" if unit == "mph" else str(value)), Speed(value, unit)
+
+
+@st.composite
+def weights(draw):
+    if draw(st.booleans()):
+        value_string = str(draw(st.integers(0, 99)))
+    else:
+        value_string = f"{draw(st.integers(0, 99))}.{draw(st.integers(0, 99))}"
+    value = float(value_string) if "." in value_string else int(value_string)
+    unit = draw(st.sampled_from(["t", "st", "lt", "lb"]))
+    weight = value_string + draw(OPTIONAL_SPACE) + unit
+    qualifier = draw(st.sampled_from([None] + list(WEIGHT_QUALIFIERS)))
+    if qualifier is None:
+        return weight, WeightCondition("weightrating", value, unit, value_string)
+    string = f"{qualifier} {weight}" if draw(st.booleans()) else f"{weight} {qualifier}"
+    return string, WeightCondition(WEIGHT_QUALIFIERS[qualifier], value, unit, value_string)
+
+
+@st.composite
+def lengths(draw):
+    value = draw(st.integers(1, 99))
+    unit = draw(st.sampled_from(["m", "ft"]))
+    return f"{value}{draw(OPTIONAL_SPACE)}{unit}", LengthCondition(value, unit)
+
+
+@st.composite
+def min_counts(draw):
+    value = draw(st.integers(1, 99))
+    key = draw(st.sampled_from(["seats", "axles", "trailers", "wheels"]))
+    return f"{value} {key}", MinCountCondition(key, value)
+
+
+named_conditions = st.sampled_from(RESTRICTION_CONDITIONALS).map(lambda name: (name, NamedCondition(name)))
+
+
+@st.composite
+def times(draw):
+    kind = draw(st.sampled_from(["time", "event", "event with offset"]))
+    time_string = f"{draw(st.integers(0, 23)):02}:{draw(st.integers(0, 59)):02}"
+    if kind == "time":
+        return time_string, Time(time_string, None, None)
+    event = draw(st.sampled_from(EVENTS))
+    if kind == "event":
+        return event, Time(None, event, None)
+    sign = draw(st.sampled_from(["+", "-"]))
+    return f"({event}{sign}{time_string})", Time(None, event, sign + time_string)
+
+
+@st.composite
+def spans(draw, elements):
+    start_string, start = draw(elements)
+    end_string, end = draw(elements)
+    return f"{start_string}{draw(OPTIONAL_SPACE)}-{draw(OPTIONAL_SPACE)}{end_string}", Span(start, end)
+
+
+weekday_strings = st.sampled_from(WEEKDAYS).map(lambda weekday: (weekday, weekday))
+weekday_items = st.one_of(weekday_strings, spans(weekday_strings))
+month_spans = spans(st.sampled_from(MONTHS).map(lambda month: (month, month)))
+
+
+@st.composite
+def date_intervals(draw, max_weekdays: int = 4):
+    parts = []
+    months = weekdays = time_span = None
+    if draw(st.booleans()):
+        string, months = draw(month_spans)
+        parts.append(string)
+    if draw(st.booleans()):
+        items = draw(st.lists(weekday_items, min_size=1, max_size=max_weekdays))
+        parts.append(",".join(string for string, _ in items))
+        weekdays = [weekday for _, weekday in items]
+    if draw(st.booleans()) or not parts:
+        string, time_span = draw(spans(times()))
+        parts.append(string)
+    off = draw(st.booleans())
+    if off:
+        parts.append("off")
+    return " ".join(parts), DateInterval(months, tuple(weekdays or ()), time_span, off)
+
+
+@st.composite
+def time_conditions(draw, max_intervals: int = 4):
+    intervals = draw(st.lists(date_intervals(), min_size=1, max_size=max_intervals))
+    separator = draw(OPTIONAL_SPACE) + ";" + draw(OPTIONAL_SPACE)
+    time_condition = TimeCondition(tuple(interval for _, interval in intervals))
+    return separator.join(string for string, _ in intervals), time_condition
+
+
+conditions = st.one_of(weights(), lengths(), min_counts(), named_conditions)
+
+
+@st.composite
+def speed_limits(draw, max_conditions: int = 4):
+    prefix = draw(st.sampled_from(list(SPEED_KEYS)))
+    speed_string, speed = draw(speeds())
+    restrictions = draw(st.lists(conditions, max_size=max_conditions))
+    # "Mo, Tu" would be one list of weekdays, so there is at most one time condition, and it is last
+    if draw(st.booleans()):
+        restrictions.append(draw(time_conditions()))
+    if not restrictions:
+        return prefix + speed_string, SpeedLimit(SPEED_KEYS[prefix], speed, ())
+    separator = draw(OPTIONAL_SPACE) + "," + draw(OPTIONAL_SPACE)
+    string = f"{prefix}{speed_string}{draw(OPTIONAL_SPACE)}({separator.join(s for s, _ in restrictions)})"
+    return string, SpeedLimit(SPEED_KEYS[prefix], speed, tuple(condition for _, condition in restrictions))
+
+
+@st.composite
+def lane_speed_limits(draw, max_lanes: int = 4):
+    lanes = draw(st.lists(speed_limits(2), min_size=2, max_size=max_lanes))
+    return "|".join(string for string, _ in lanes), LaneSpeedLimits(tuple(lane for _, lane in lanes))
+
+
+@st.composite
+def speed_definition_strings(draw, max_definitions: int = 4):
+    definitions = draw(st.lists(
+        st.one_of(speed_limits(), lane_speed_limits(), st.just(("X", AccessProhibited()))),
+        min_size=1, max_size=max_definitions
+    ))
+    separator = draw(OPTIONAL_SPACE) + "," + draw(OPTIONAL_SPACE)
+    return separator.join(string for string, _ in definitions), [definition for _, definition in definitions]
+
+
+@settings(max_examples=300, deadline=None)
+@given(speed_definition_strings())
+def test_parse_speed_definitions_round_trip(data):
+    string, expected = data
+    assert parse_speed_definitions(string) == expected
+    assert parse_speeds(string) == osm_tags(expected)
+
+
+earley_parser = Lark(SPEED_GRAMMAR)
+
+
+# the Earley parser takes far more than linear time for long lists of date intervals or weekdays, so
+# only short strings
+@settings(max_examples=50, deadline=None)
+@given(speed_definition_strings(max_definitions=2))
+def test_reference_grammar_gives_same_speed_definitions(data):
+    string, expected = data
+    assert speed_definitions(earley_parser.parse(string)) == expected
+
+
+# strings that are made longer by repeating a part, the number of repetitions grows 8 times
+GROWING_STRINGS = {
+    "lanes": lambda n: "|".join(["80 (3.5t)"] * n),
+    "conditions": lambda n: "80 (" + ", ".join(["3.5t", "wet", "trailer", "12 m", "empty 3t", "3 axles"] * n) + ")",
+    "date intervals": lambda n: "50 (" + "; ".join(
+        ["Mo-Fr 07:00-17:00", "Sa,Su,PH off", "Jan-Mar (dusk+01:00)-dawn"] * n
+    ) + ")",
+    "weekdays": lambda n: "50 (" + ",".join(["Mo", "Tu-We", "PH"] * n) + " 07:00-08:00)",
+    "speed definitions": lambda n: ", ".join(["100", "80 (wet)", "advisory:60", "min:40 (Mo-Fr)"] * n),
+}
+GROWTH = 8
+# parsing in linear time, the time grows about as much as the string. Generous, so that a busy
+# machine does not fail the test, but a quadratic blow-up (64 times) does
+MAX_TIME_GROWTH = 3 * GROWTH
+
+
+def parse_seconds(string: str) -> float:
+    """The best of a few runs, to not count the time the machine was busy otherwise"""
+    result = []
+    for _ in range(5):
+        start_time = time.perf_counter()
+        parse_speeds(string)
+        result.append(time.perf_counter() - start_time)
+    return min(result)
+
+
+@pytest.mark.parametrize("name", list(GROWING_STRINGS))
+def test_parse_time_is_linear(name):
+    short_string = GROWING_STRINGS[name](4)
+    long_string = GROWING_STRINGS[name](4 * GROWTH)
+    parse_speeds(short_string)
+    assert parse_seconds(long_string) < MAX_TIME_GROWTH * parse_seconds(short_string)
@@ -1,8 +1,37 @@
+import copy
+import os
+
 import pytest
+from bs4 import BeautifulSoup
+from lark import Lark
 
+from parsers import SPEED_GRAMMAR, SPEED_GRAMMAR_LALR
+from parsers.osm_restrictions import osm_speed_tags
+from parsers.osm_restrictions import parse_speed_definitions
 from parsers.osm_restrictions import parse_speeds
+from parsers.parse_utils import get_country_code
+from parsers.parse_utils import map_speed_table_rows
+from parsers.parse_utils import parse_road_types_table
+from parsers.parse_utils import parse_speed_table
 from parsers.parse_utils import validate_road_types
 from parsers.parse_utils import validate_road_types_in_speed_table
+from parsers.speed_model import DateInterval
+from parsers.speed_model import LaneSpeedLimits
+from parsers.speed_model import MinCountCondition
+from parsers.speed_model import NamedCondition
+from parsers.speed_model import Span
+from parsers.speed_model import Speed
+from parsers.speed_model import SpeedLimit
+from parsers.speed_model import Time
+from parsers.speed_model import TimeCondition
+from parsers.speed_model import WeightCondition
+from parsers.speed_model import from_json
+from parsers.speed_model import to_json
+from parsers.validation import UNKNOWN_ROAD_TYPE
+from parsers.validation import UNPARSABLE_SPEEDS
+from parsers.validation import UNUSED_ROAD_TYPE
+from parsers.validation import Validation
+from parsers.validation import ValidationWarning
 
 @pytest.mark.parametrize(
     "data,expected",
@@ -83,6 +112,7 @@ from parsers.parse_utils import validate_road_types_in_speed_table
         ("40 (Mo-Fr)", {"maxspeed:conditional": "40 @ (Mo-Fr)"}),
         ("30 (Mo-Fr 08:00-17:00; PH,SH off)", {"maxspeed:conditional": "30 @ (Mo-Fr 08:00-17:00; PH,SH off)"}),
         ("30 (Oct-May Sa,Su off)", {"maxspeed:conditional": "30 @ (Oct-May Sa,Su off)"}),
+        ("40 (Mo,Tu,We 08:00-12:00, trailer)", {"maxspeed:conditional": "40 @ (Mo,Tu,We 08:00-12:00 AND trailer)"}),
         
         # Advisory speed
         ("advisory: 130", {"maxspeed:advisory": "130"}),
@@ -108,6 +138,184 @@ def test_parser(data, expected):
         if expected is not None:
             raise
 
+def read_wiki_snapshot():
+    with open(os.path.join(os.path.dirname(__file__), "test_data", "default_speed_limits.html"), encoding="utf8") as fp:
+        return BeautifulSoup(fp.read().replace("&#160;", " "), "html.parser")
+
+def speed_table_cells():
+    speed_table = read_wiki_snapshot().find_all("table")[0]
+    for junk_tag in speed_table.find_all(["sup", "img"]):
+        junk_tag.decompose()
+    return sorted({td.get_text(strip=True) for td in speed_table.find_all("td")} - {""})
+
+earley_parser = Lark(SPEED_GRAMMAR)
+lalr_parser = Lark(SPEED_GRAMMAR_LALR, parser="lalr")
+
+def parse_speeds_with(speed_parser, s):
+    try:
+        return osm_speed_tags(speed_parser.parse(s))
+    except Exception:
+        return None
+
+@pytest.mark.parametrize("data", speed_table_cells() + [
+    "40 (Mo-Fr, Sa)", "40 (Mo, 2t)", "40 (2t, Mo-Fr)", "40 (trailer, 2t)", "40 (2t trailer, wet)",
+    "40 (1.270t empty)", "80|60 (trailer)|50",
+    "X, 50", "40 (2trailers)", "40 (10 m)", "40 (3 wheels)", "40 (Jan)", "40 ((2t)", "40 km/h",
+])
+def test_lalr_parser_is_equivalent_to_earley_parser(data):
+    assert parse_speeds_with(lalr_parser, data) == parse_speeds_with(earley_parser, data)
+
+def test_standalone_parser_is_equivalent_to_earley_parser():
+    speed_grammar_standalone = pytest.importorskip("parsers.speed_grammar_standalone")
+    standalone_parser = speed_grammar_standalone.Lark_StandAlone()
+    for data in speed_table_cells():
+        assert parse_speeds_with(standalone_parser, data) == parse_speeds_with(earley_parser, data)
+
+@pytest.mark.parametrize(
+    "data,expected",
+    [
+        ("walk", [SpeedLimit("maxspeed", Speed(None, "walk"), ())]),
+        ("min:40 mph", [SpeedLimit("minspeed", Speed(40, "mph"), ())]),
+        ("80|60 (trailer)", [LaneSpeedLimits((
+            SpeedLimit("maxspeed", Speed(80, "km/h"), ()),
+            SpeedLimit("maxspeed", Speed(60, "km/h"), (NamedCondition("trailer"),)),
+        ))]),
+        ("70 (3.5t, 3 axles)", [SpeedLimit("maxspeed", Speed(70, "km/h"), (
+            WeightCondition("weightrating", 3.5, "t", "3.5"), MinCountCondition("axles", 3)
+        ))]),
+        ("30 (Mo,We-Fr (sunrise+01:00)-18:00; Jan-Feb off)", [SpeedLimit("maxspeed", Speed(30, "km/h"), (
+            TimeCondition((
+                DateInterval(
+                    None,
+                    ("Mo", Span("We", "Fr")),
+                    Span(Time(None, "sunrise", "+01:00"), Time("18:00", None, None)),
+                    False
+                ),
+                DateInterval(Span("Jan", "Feb"), (), None, True),
+            )),
+        ))]),
+    ]
+)
+def test_parse_speed_definitions(data, expected):
+    assert parse_speed_definitions(data) == expected
+
+def test_speed_definitions_as_json():
+    assert to_json(parse_speed_definitions("20 mph (2st trailer)")) == [{
+        "type": "SpeedLimit",
+        "key": "maxspeed",
+        "speed": {"type": "Speed", "value": 20, "unit": "mph"},
+        "conditions": [
+            {"type": "WeightCondition", "qualifier": "trailerweight", "value": 2, "unit": "st", "text": "2"}
+        ],
+    }]
+
+def test_speed_definitions_from_json():
+    speed_definitions = parse_speed_definitions("80 (3.50t, Mo-Fr (sunset-00:30)-dawn), 60|50, X")
+    assert from_json(to_json(speed_definitions)) == speed_definitions
+
+def test_speed_definitions_are_immutable():
+    speed_definitions = parse_speed_definitions("80 (3.50t, Mo,Tu 07:00-17:00), 60|50")
+    assert hash(tuple(speed_definitions)) == hash(tuple(from_json(to_json(speed_definitions))))
+
+@pytest.mark.parametrize("data,expected", [
+    ("80 (3.50t)", {"maxspeed:conditional": "80 @ (weightrating>3.50)"}),
+    ("80 (12.000 lb empty)", {"maxspeed:conditional": "80 @ (emptyweight>12.000 lb)"}),
+])
+def test_weights_are_rendered_as_written(data, expected):
+    assert parse_speeds(data) == expected
+
+def test_parse_structured_speed_table():
+    table = read_wiki_snapshot().find_all("table")[0]
+    result = {}
+    speeds_by_country_code = parse_speed_table(
+        table, parse_speed_definitions, speeds_by_country_code=result
+    )["speedLimitsByCountryCode"]
+    assert speeds_by_country_code == parse_speed_table(table, parse_speed_definitions)["speedLimitsByCountryCode"]
+    assert list(result) == list(speeds_by_country_code)
+    for country_code, road_classes in result.items():
+        names = [road_class.get("name") for road_class in road_classes]
+        assert names == [road_class.get("name") for road_class in speeds_by_country_code[country_code]]
+    assert result["FR"][2]["speedsByVehicleType"]["(default)"][1] == {
+        "type": "SpeedLimit",
+        "key": "maxspeed",
+        "speed": {"type": "Speed", "value": 110, "unit": "km/h"},
+        "conditions": [{"type": "NamedCondition", "name": "wet"}],
+    }
+
+    parallel_result = {}
+    parse_speed_table(table, parse_speed_definitions, workers=2, speeds_by_country_code=parallel_result)
+    assert parallel_result == result
+
+    previous_road_classes = map_speed_table_rows(table, speeds_by_country_code, [])
+    incremental_result = {}
+    parse_speed_table(table, parse_speed_definitions, previous_road_classes, speeds_by_country_code=incremental_result)
+    assert incremental_result == result
+
+def test_parse_speed_table_with_tags_parse_func():
+    table = read_wiki_snapshot().find_all("table")[0]
+    assert parse_speed_table(table, parse_speeds) == parse_speed_table(table, parse_speed_definitions)
+    with pytest.raises(TypeError):
+        parse_speed_table(table, parse_speeds, speeds_by_country_code={})
+
+def test_parse_speed_table_only_parses_changed_rows():
+    previous_result = parse_speed_table(read_wiki_snapshot().find_all("table")[0], parse_speed_definitions)
+    previous_road_classes = map_speed_table_rows(
+        read_wiki_snapshot().find_all("table")[0],
+        previous_result["speedLimitsByCountryCode"],
+        previous_result["warnings"]
+    )
+
+    changed_soup = read_wiki_snapshot()
+    changed_soup.find("td", string="130, 110 (wet), 90 (3.5t)").string = "130, 110 (wet), 80 (3.5t)"
+    parsed_strings = []
+
+    def speed_parse_func(s):
+        parsed_strings.append(s)
+        return parse_speed_definitions(s)
+
+    result = parse_speed_table(changed_soup.find_all("table")[0], speed_parse_func, previous_road_classes)
+    assert result == parse_speed_table(changed_soup.find_all("table")[0], parse_speed_definitions)
+    motorway_tags = result["speedLimitsByCountryCode"]["FR"][2]["tags"]
+    assert motorway_tags["maxspeed:conditional"] == "110 @ (wet); 80 @ (weightrating>3.5)"
+    assert parsed_strings == ["130, 110 (wet), 80 (3.5t)", "100, 110 (3.5t), 90 (10t)", "100", "90", "80 (12t)"]
+
+def test_parse_speed_table_in_parallel():
+    expected = parse_speed_table(read_wiki_snapshot().find_all("table")[0], parse_speed_definitions)
+    assert parse_speed_table(read_wiki_snapshot().find_all("table")[0], parse_speed_definitions, workers=2) == expected
+
+def test_parse_speed_table_in_parallel_keeps_order_of_warnings():
+    soup = read_wiki_snapshot()
+    soup.find("td", string="130, 110 (wet), 90 (3.5t)").string = "130 km/h"
+    soup.find("td", string="50, 30 (Mo-Fr 07:00-17:00; Sa,Su off)").string = "50 km/h"
+    expected = parse_speed_table(copy.copy(soup).find_all("table")[0], parse_speed_definitions)
+    result = parse_speed_table(soup.find_all("table")[0], parse_speed_definitions, workers=3)
+    assert result == expected
+    assert result["warnings"][:2] == [
+        "France: Unable to parse '(default)' for 'motorway'",
+        "Sweden: Unable to parse '(default)' for 'urban'",
+    ]
+
+@pytest.mark.parametrize(
+    "name,loose,expected",
+    [
+        ("Germany", False, "DE"),
+        ("germany", False, "DE"),
+        ("DEU", False, "DE"),
+        ("Federal Republic of Germany", False, "DE"),
+        ("Russia", False, "RU"),
+        ("United States:California", False, "US-CA"),
+        ("United States : California", False, "US-CA"),
+        ("United States:california", False, None),
+        ("United States:california", True, "US-CA"),
+        ("Cote d'Ivoire", False, None),
+        ("Cote d'Ivoire", True, "CI"),
+        ("Germany:Atlantis", False, None),
+        ("Atlantis", False, None),
+    ]
+)
+def test_get_country_code(name, loose, expected):
+    assert get_country_code(name, loose) == expected
+
 @pytest.mark.parametrize(
     "data,expected",
     [
@@ -139,11 +347,46 @@ def test_parser(data, expected):
             {"urban": {"filter": "{lit}"}, "rural": { "filter": "!{lit}" }},
             ["urban: Unable to map 'lit'", "rural: Unable to map 'lit'"]
         ),
+        (
+            {"alley": {"filter": "highway=service and"}},
+            ["alley: Invalid filter: At position 19: Expected a whitespace or bracket before the tag"]
+        ),
+        (
+            {"alley": {"filter": "{urban} or {urban}"}},
+            ["alley: Unable to map 'urban'"]
+        ),
+        (
+            {"a": {"filter": "{b}"}, "b": {"filter": "{c} and {a}"}, "c": {"fuzzyFilter": "{c}"}},
+            ["a: Circular placeholders a -> b -> a", "c: Circular placeholders c -> c"]
+        ),
     ]
 )
 def test_validate_road_types(data, expected):
     assert validate_road_types(data) == expected
 
+def test_validation_while_parsing_speed_table():
+    soup = read_wiki_snapshot()
+    soup.find("td", string="130, 110 (wet), 90 (3.5t)").string = "130 km/h"
+    tables = soup.find_all("table")
+    validation = Validation()
+    result = parse_speed_table(tables[0], parse_speed_definitions, validation=validation)
+    road_types = parse_road_types_table(tables[1])
+    del road_types["California: alley"]
+    road_types["unused road"] = {"filter": "highway=track"}
+    validation.validate_road_types(road_types)
+
+    assert validation.warnings[0] == ValidationWarning(UNPARSABLE_SPEEDS, "France", "motorway", "(default)")
+    assert validation.warnings[len(result["warnings"]):] == [
+        ValidationWarning(UNUSED_ROAD_TYPE, road_type="unused road"),
+        ValidationWarning(UNKNOWN_ROAD_TYPE, "US-CA", "California: alley"),
+    ]
+    assert result["warnings"][0] == "France: Unable to parse '(default)' for 'motorway'"
+    assert validation.messages()[len(result["warnings"]):] == [
+        "unused road: Not used in any country", "US-CA: Unable to map 'California: alley'"
+    ]
+    # road types only used via placeholders are used
+    assert "built-up area" not in {warning.road_type for warning in validation.warnings}
+
 @pytest.mark.parametrize(
     "speeds_by_country_code,road_types,expected",
     [
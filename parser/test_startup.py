@@ -0,0 +1,51 @@
+"""Import time of the modules that short-lived processes (CLI invocations, worker processes) import,
+measured with python -X importtime in a fresh interpreter. The heavy dependencies must only be
+imported when they are used."""
+import os
+import subprocess
+import sys
+
+import pytest
+
+# generous, so that slower machines pass too. Measured on a laptop: 30 ms, 85 ms
+STARTUP_BUDGETS_MS = {
+    "parsers.osm_restrictions": 150,
+    "main": 300,
+}
+HEAVY_MODULES = {"bs4", "lark", "pycountry", "requests"}
+
+
+def import_times_ms(module: str) -> dict:
+    """Returns the cumulative import time of each module imported by importing the given module"""
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), stderr=subprocess.PIPE, universal_newlines=True, check=True
+    )
+    result = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        result[name.strip()] = int(cumulative_us) / 1000
+    return result
+
+
+@pytest.mark.parametrize("module", list(STARTUP_BUDGETS_MS))
+def test_startup_time(module):
+    times = import_times_ms(module)
+    assert not HEAVY_MODULES & set(times)
+    # the best of a few runs, to not fail just because the machine was busy once
+    best_ms = min([times[module]] + [import_times_ms(module)[module] for _ in range(2)])
+    assert best_ms < STARTUP_BUDGETS_MS[module]
+
+
+def test_parser_is_created_on_first_use():
+    process = subprocess.run(
+        [sys.executable, "-c", "from parsers.osm_restrictions import parse_speeds; "
+                               "from parsers.parse_utils import get_parser; "
+                               "assert get_parser.cache_info().currsize == 0; "
+                               "parse_speeds('50'); "
+                               "assert get_parser.cache_info().currsize == 1"],
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    assert process.returncode == 0
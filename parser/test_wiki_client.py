@@ -0,0 +1,87 @@
+import json
+import os
+
+from parsers.wiki_client import WikiClient
+from parsers.wiki_client import read_snapshot
+
+SNAPSHOT_FILE_NAME = os.path.join(os.path.dirname(__file__), "test_data", "default_speed_limits.html")
+
+
+class FakeResponse:
+    def __init__(self, data: dict):
+        self.data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self) -> dict:
+        return self.data
+
+
+class FakeSession:
+    """Answers like the MediaWiki API for a page whose latest revision is 2"""
+
+    def __init__(self):
+        self.queries = []
+
+    def mount(self, prefix, adapter):
+        pass
+
+    def get(self, url, params, timeout):
+        self.queries.append(dict(params))
+        if params["action"] == "query" and "rvlimit" in params:
+            # the revisions 1 to 5, two per response
+            first_id = int(params.get("rvcontinue", params.get("rvstartid", 1)))
+            last_id = min(int(params.get("rvendid", 5)), first_id + 1)
+            response = {"query": {"pages": [{"revisions": [{"revid": i} for i in range(first_id, last_id + 1)]}]}}
+            if last_id < int(params.get("rvendid", 5)):
+                response["continue"] = {"rvcontinue": str(last_id + 1), "continue": "||"}
+            return FakeResponse(response)
+        if params["action"] == "query":
+            return FakeResponse({"query": {"pages": [{"revisions": [{"revid": 2}]}]}})
+        revision_id = int(params.get("oldid", 2))
+        return FakeResponse({"parse": {"text": {"*": f"<p>revision {revision_id}</p>"}, "revid": revision_id}})
+
+
+def test_fetch_parsed_page_without_cache():
+    session = FakeSession()
+    client = WikiClient("Page", session=session)
+    assert client.fetch_parsed_page() == {"text": {"*": "<p>revision 2</p>"}, "revid": 2}
+    assert client.fetch_parsed_page("1")["revid"] == 1
+    assert [query.get("oldid") for query in session.queries] == [None, "1"]
+
+
+def test_fetch_parsed_page_from_cache(tmp_path):
+    session = FakeSession()
+    client = WikiClient("Page", str(tmp_path), session=session)
+    parsed = client.fetch_parsed_page()
+    assert [query["action"] for query in session.queries] == ["query", "parse"]
+
+    session.queries.clear()
+    assert WikiClient("Page", str(tmp_path), session=session).fetch_parsed_page() == parsed
+    assert [query["action"] for query in session.queries] == ["query"]
+
+    session.queries.clear()
+    client.fetch_parsed_page("1")
+    client.fetch_parsed_page("1")
+    assert [query["action"] for query in session.queries] == ["parse"]
+    assert sorted(os.listdir(tmp_path)) == ["Page-1.json", "Page-2.json"]
+
+
+def test_fetch_revision_ids():
+    session = FakeSession()
+    client = WikiClient("Page", session=session)
+    assert client.fetch_revision_ids() == ["1", "2", "3", "4", "5"]
+    assert len(session.queries) == 3
+    assert client.fetch_revision_ids("2", "4") == ["2", "3", "4"]
+
+
+def test_read_snapshot(tmp_path):
+    parsed = read_snapshot(SNAPSHOT_FILE_NAME)
+    assert parsed["revid"] is None
+    assert parsed["text"]["*"].startswith("<")
+
+    file_name = str(tmp_path / "api_response.json")
+    with open(file_name, "w", encoding="utf8") as file:
+        json.dump({"parse": {"text": {"*": "<p></p>"}, "revid": 3}}, file)
+    assert read_snapshot(file_name) == {"text": {"*": "<p></p>"}, "revid": 3}